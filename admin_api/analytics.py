@@ -0,0 +1,106 @@
+# admin_api/analytics.py
+"""
+طبقة استعلامات التحليلات حسب الفترات الزمنية
+Time-bucketed analytics: one GROUP BY query per metric family, with
+Count(filter=...) for each metric and zero-filled buckets.
+
+granularity: hour / day / week / month (بالتوقيت المحلي TIME_ZONE)
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+
+def local_midnight(day):
+    """بداية اليوم المحلي (aware)"""
+    return timezone.make_aware(datetime(day.year, day.month, day.day), timezone.get_current_timezone())
+
+
+def truncate(moment, granularity):
+    """بداية الفترة التي تحتوي moment"""
+    local = timezone.localtime(moment)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    elif granularity == 'month':
+        day = day.replace(day=1)
+    return local_midnight(day)
+
+
+def next_bucket(bucket, granularity):
+    if granularity == 'hour':
+        return timezone.localtime(bucket + timedelta(hours=1))
+    day = timezone.localtime(bucket).date()
+    if granularity == 'day':
+        return local_midnight(day + timedelta(days=1))
+    if granularity == 'week':
+        return local_midnight(day + timedelta(days=7))
+    return local_midnight(date(day.year + day.month // 12, day.month % 12 + 1, 1))
+
+
+def bucket_range(start, end, granularity):
+    """كل بدايات الفترات من start حتى end (غير شامل)"""
+    buckets = []
+    bucket = truncate(start, granularity)
+    while bucket < end:
+        buckets.append(bucket)
+        bucket = next_bucket(bucket, granularity)
+    return buckets
+
+
+def bucketed_counts(queryset, field, start, end=None, granularity='day', counts=None):
+    """
+    Counts per time bucket in a single query
+
+    counts = {name: Q or None}  (None = كل الصفوف)
+    يعيد [(bucket_start, {name: count}), ...] مرتبة ومكتملة (الفترات الفارغة = 0)
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    counts = counts or {'count': None}
+    end = end or timezone.now()
+    start = truncate(start, granularity)
+
+    rows = queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end}).annotate(
+        bucket=Trunc(field, granularity, tzinfo=timezone.get_current_timezone())
+    ).values('bucket').annotate(**{
+        name: Count('pk', filter=condition) for name, condition in counts.items()
+    }).order_by()
+
+    found = {row['bucket']: row for row in rows}
+    return [
+        (bucket, {name: found[bucket][name] if bucket in found else 0 for name in counts})
+        for bucket in bucket_range(start, end, granularity)
+    ]
+
+
+def parse_range(params, default_days=7, default_granularity='day', default_start=None):
+    """
+    ?days=N أو ?start=YYYY-MM-DD&end=YYYY-MM-DD و ?granularity=day|week|month
+    يعيد (start, end, granularity) - end غير شامل
+    """
+    granularity = params.get('granularity', default_granularity)
+    if granularity not in GRANULARITIES or granularity == 'hour':
+        raise ValueError('granularity must be day, week or month')
+
+    today = timezone.localdate()
+    end_day = date.fromisoformat(params['end']) if params.get('end') else today
+    if params.get('start'):
+        start_day = date.fromisoformat(params['start'])
+    elif params.get('days') or default_start is None:
+        days = int(params.get('days', default_days))
+        if not 1 <= days <= 366 * 3:
+            raise ValueError('days must be between 1 and 1098')
+        start_day = end_day - timedelta(days=days - 1)
+    else:
+        start_day = default_start
+
+    if start_day > end_day:
+        raise ValueError('start must be before end')
+    return local_midnight(start_day), local_midnight(end_day + timedelta(days=1)), granularity
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AdminApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_api'
+
+    def ready(self):
+        # ✅ تحديث الإحصائيات المجمّعة (MetricRollup)
+        import admin_api.signals
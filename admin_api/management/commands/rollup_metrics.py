@@ -0,0 +1,29 @@
+# admin_api/management/commands/rollup_metrics.py
+from django.core.management.base import BaseCommand
+
+from admin_api.metrics import run_rollup, metrics_config
+
+
+class Command(BaseCommand):
+    """
+    تحديث جدول الإحصائيات المجمّعة (MetricRollup) للوحة التحكم
+    Recompute recent daily/hourly flow metrics and refresh the totals snapshot
+    (cron كل بضع دقائق، أو Celery beat)
+    """
+    help = 'Roll up dashboard metrics into MetricRollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Days of daily rows to recompute (default RECONCILE_DAYS)')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Recompute BACKFILL_DAYS days (first deployment)')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if options['backfill']:
+            days = metrics_config()['BACKFILL_DAYS']
+        stats = run_rollup(days)
+        if stats is None:
+            self.stdout.write('⏭️ Another rollup is running, skipped')
+            return
+        self.stdout.write(f"✅ {stats['flow_rows']} flow row(s), snapshot refreshed in {stats['seconds']}s")
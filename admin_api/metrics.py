@@ -0,0 +1,368 @@
+# admin_api/metrics.py
+"""
+طبقة الإحصائيات المجمّعة للوحة التحكم (MetricRollup)
+Dashboard metrics rollup:
+
+- أحداث (flows): عدد لكل يوم + لكل ساعة لليوم الحالي.
+  تُحدّث فوراً عبر signals (admin_api/signals.py) وتُصحّح دورياً من الجداول الأصلية
+  (manage.py rollup_metrics أو Celery beat).
+- إجماليات (snapshot): لقطة تُحسب بعدد قليل من الاستعلامات المجمّعة.
+  عند تجاوز SNAPSHOT_MAX_AGE_SECONDS تُعرض اللقطة القديمة ويُجدول التحديث
+  في الخلفية (celery / thread) - طلبات لوحة التحكم لا تمسح الجداول الأصلية.
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from core.background import BackgroundWorker
+
+from .analytics import bucketed_counts, truncate
+from .models import MetricRollup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADMIN_METRICS = {
+    'DISPATCH': 'thread',
+    'SNAPSHOT_MAX_AGE_SECONDS': 300,
+    'ROLLUP_LOCK_SECONDS': 600,
+    'RECONCILE_DAYS': 2,
+    'BACKFILL_DAYS': 62,
+    'HOURLY_RETENTION_DAYS': 2,
+    'REPORT_CACHE_SECONDS': 60,
+}
+
+
+def metrics_config():
+    return {**DEFAULT_ADMIN_METRICS, **getattr(settings, 'ADMIN_METRICS', {})}
+
+
+# ========================================
+# Buckets
+# ========================================
+
+def day_bucket(moment):
+    """بداية اليوم المحلي (aware)"""
+    return truncate(moment, 'day')
+
+
+def hour_bucket(moment):
+    return truncate(moment, 'hour')
+
+
+# ========================================
+# Flow metrics - الأحداث
+# ========================================
+
+def _flow_families():
+    """
+    مجموعات الأحداث: (queryset, timestamp field, {metric: Q}) - استعلام واحد لكل مجموعة
+    tasks_accepted / tasks_cancelled: المهام بهذه الحالة حسب updated_at (نفس تعريف platform_activity)
+    """
+    from users.models import User
+    from tasks.models import ServiceRequest
+    from payments.models import TaskBundle
+
+    return [
+        (User.objects.all(), 'date_joined', {
+            'users_joined.client': Q(role='client'),
+            'users_joined.worker': Q(role='worker'),
+        }),
+        (ServiceRequest.objects.all(), 'created_at', {
+            'tasks_created': None,
+        }),
+        (ServiceRequest.objects.filter(status__in=['active', 'cancelled']), 'updated_at', {
+            'tasks_accepted': Q(status='active'),
+            'tasks_cancelled': Q(status='cancelled'),
+        }),
+        (TaskBundle.objects.filter(moosyl_payment_status='completed'), 'purchased_at', {
+            'bundles_sold': None,
+        }),
+    ]
+
+
+FLOW_METRICS = (
+    'users_joined.client', 'users_joined.worker',
+    'tasks_created', 'tasks_accepted', 'tasks_cancelled',
+    'bundles_sold',
+)
+
+TASK_STATUS_METRICS = {
+    'active': 'tasks_accepted',
+    'cancelled': 'tasks_cancelled',
+}
+
+
+def _add(granularity, metric, bucket, delta):
+    updated = MetricRollup.objects.filter(
+        granularity=granularity, metric=metric, bucket=bucket
+    ).update(value=F('value') + delta, updated_at=timezone.now())
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MetricRollup.objects.create(granularity=granularity, metric=metric, bucket=bucket, value=delta)
+    except IntegrityError:
+        # أُنشئ الصف بالتوازي → نعيد التحديث
+        MetricRollup.objects.filter(
+            granularity=granularity, metric=metric, bucket=bucket
+        ).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def record_event(metric, moment, delta=1):
+    """
+    Increment a flow metric for the day (and hour, if recent) of `moment`
+    يُستدعى من signals
+    """
+    if moment is None or not delta:
+        return
+    _add('day', metric, day_bucket(moment), delta)
+    hourly_since = day_bucket(timezone.now()) - timedelta(days=metrics_config()['HOURLY_RETENTION_DAYS'] - 1)
+    if moment >= hourly_since:
+        _add('hour', metric, hour_bucket(moment), delta)
+
+
+def reconcile_flows(days=None):
+    """
+    Recompute day rows for the last `days` days (and hour rows for the recent ones)
+    from the source tables - يصحح أي انحراف (update() بالجملة، أخطاء signals...)
+    """
+    config = metrics_config()
+    days = days or config['RECONCILE_DAYS']
+    now = timezone.now()
+    start = day_bucket(now) - timedelta(days=days - 1)
+    hourly_since = day_bucket(now) - timedelta(days=config['HOURLY_RETENTION_DAYS'] - 1)
+
+    rows = []
+    for queryset, field, counts in _flow_families():
+        per_day = defaultdict(lambda: defaultdict(int))
+        for bucket, values in bucketed_counts(
+            queryset, field, min(start, hourly_since), now, granularity='hour', counts=counts
+        ):
+            for metric, count in values.items():
+                if not count:
+                    continue
+                per_day[metric][day_bucket(bucket)] += count
+                if bucket >= hourly_since:
+                    rows.append(MetricRollup(granularity='hour', metric=metric, bucket=bucket, value=count))
+        rows.extend(
+            MetricRollup(granularity='day', metric=metric, bucket=bucket, value=count)
+            for metric, days_counts in per_day.items()
+            for bucket, count in days_counts.items() if bucket >= start
+        )
+
+    with transaction.atomic():
+        MetricRollup.objects.filter(
+            metric__in=FLOW_METRICS, granularity='day', bucket__gte=start
+        ).delete()
+        # صفوف الساعات: تُعاد كلها (وتُحذف الأقدم من HOURLY_RETENTION_DAYS)
+        MetricRollup.objects.filter(metric__in=FLOW_METRICS, granularity='hour').delete()
+        MetricRollup.objects.bulk_create(rows, batch_size=500)
+
+    return len(rows)
+
+
+def flow_totals(windows, metrics=FLOW_METRICS):
+    """
+    مجموع كل metric في كل نافذة زمنية، من صفوف day في استعلام واحد
+    windows = {name: (start, end or None)} - الحدود بداية أيام محلية
+    يعيد {name: {metric: total}}
+    """
+    earliest = min(start for start, _ in windows.values())
+    totals = {name: defaultdict(int) for name in windows}
+    for metric, bucket, value in MetricRollup.objects.filter(
+        granularity='day', metric__in=metrics, bucket__gte=earliest
+    ).values_list('metric', 'bucket', 'value'):
+        for name, (start, end) in windows.items():
+            if bucket >= start and (end is None or bucket < end):
+                totals[name][metric] += value
+    return totals
+
+
+# ========================================
+# Snapshot metrics - الإجماليات الحالية
+# ========================================
+
+def compute_snapshot():
+    """كل الإجماليات في استعلام مجمّع واحد لكل جدول"""
+    from users.models import User
+    from tasks.models import ServiceRequest
+    from payments.models import TaskBundle
+    from payments.segments import segment_counts
+    from chat.models import Report
+    from complaints.models import Complaint
+
+    values = {}
+    values.update(User.objects.aggregate(
+        total_users=Count('id', filter=Q(role__in=['client', 'worker'])),
+        total_clients=Count('id', filter=Q(role='client')),
+        total_workers=Count('id', filter=Q(role='worker')),
+    ))
+    values.update(ServiceRequest.objects.aggregate(
+        total_tasks=Count('id'),
+        active_tasks=Count('id', filter=Q(status='active')),
+        completed_tasks=Count('id', filter=Q(status='completed')),
+        cancelled_tasks=Count('id', filter=Q(status='cancelled')),
+    ))
+
+    paid = Q(moosyl_payment_status='completed')
+    active = paid & Q(is_active=True)
+    values.update(TaskBundle.objects.aggregate(
+        total_bundles_sold=Count('id', filter=paid),
+        active_bundles=Count('id', filter=active),
+        premium_users=Count('user', filter=active, distinct=True),
+        premium_clients=Count('user', filter=active & Q(user__role='client'), distinct=True),
+        premium_workers=Count('user', filter=active & Q(user__role='worker'), distinct=True),
+    ))
+
+    segments = segment_counts(
+        users_purchased_once=Count('id', filter=Q(total_subscriptions__gte=1)),
+        users_purchased_multiple=Count('id', filter=Q(total_subscriptions__gte=2)),
+        task_counters=Count('id'),
+        total_subscriptions=Sum('total_subscriptions'),
+    )
+    segments.pop('premium')  # premium_users من جدول الحزم (يشمل من ليس له عداد)
+    values['free_users'] = segments.pop('free') + segments['close_to_limit']
+    values['users_at_4_tasks'] = segments.pop('close_to_limit')
+    values['users_at_5_tasks'] = segments.pop('limit_reached')
+    values.update(segments)
+
+    values.update(Report.objects.aggregate(
+        pending_reports=Count('id', filter=Q(status='pending')),
+        resolved_reports=Count('id', filter=Q(status='resolved')),
+    ))
+    values.update(Complaint.objects.aggregate(
+        total_complaints=Count('id'),
+        new_complaints=Count('id', filter=Q(status='new')),
+        pending_complaints=Count('id', filter=Q(status__in=['new', 'under_review'])),
+    ))
+    return {metric: value or 0 for metric, value in values.items()}
+
+
+def refresh_snapshot():
+    values = compute_snapshot()
+    bucket = hour_bucket(timezone.now())
+    with transaction.atomic():
+        # لقطة واحدة فقط في الجدول: الأقدم تُحذف مع الحالية
+        MetricRollup.objects.filter(granularity='snapshot').delete()
+        MetricRollup.objects.bulk_create([
+            MetricRollup(granularity='snapshot', metric=metric, bucket=bucket, value=value)
+            for metric, value in values.items()
+        ])
+    return values
+
+
+def latest_snapshot():
+    """(values, updated_at) لآخر لقطة، أو ({}, None)"""
+    latest = MetricRollup.objects.filter(granularity='snapshot').order_by('-bucket').values_list(
+        'bucket', flat=True
+    ).first()
+    if latest is None:
+        return {}, None
+    rows = MetricRollup.objects.filter(granularity='snapshot', bucket=latest)
+    values, updated_at = {}, None
+    for metric, value, row_updated_at in rows.values_list('metric', 'value', 'updated_at'):
+        values[metric] = value
+        updated_at = max(updated_at, row_updated_at) if updated_at else row_updated_at
+    return values, updated_at
+
+
+ROLLUP_LOCK_KEY = 'admin_api:metrics:rollup'
+
+
+@contextmanager
+def rollup_lock():
+    """
+    True إذا حصلت هذه العملية على القفل - تحديثان متزامنان لا يكتبان نفس الصفوف
+    (delete + bulk_create على unique_metric_rollup_bucket)
+    """
+    acquired = cache.add(ROLLUP_LOCK_KEY, True, metrics_config()['ROLLUP_LOCK_SECONDS'])
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(ROLLUP_LOCK_KEY)
+
+
+def run_rollup(days=None):
+    """
+    Periodic job: reconcile recent flows + refresh the snapshot
+    يعيد None إذا كان تحديث آخر قيد التنفيذ
+    """
+    with rollup_lock() as acquired:
+        if not acquired:
+            logger.info("Metrics rollup skipped: another rollup is running")
+            return None
+        started = time.monotonic()
+        try:
+            rows = reconcile_flows(days)
+            refresh_snapshot()
+        except IntegrityError:
+            # عملية أخرى (كاش محلي = قفل لكل عملية) كتبت نفس الصفوف للتو
+            logger.warning("Metrics rollup skipped: concurrent rollup wrote the same buckets")
+            return None
+    seconds = round(time.monotonic() - started, 3)
+    logger.info(f"Metrics rollup: {rows} flow rows, snapshot refreshed ({seconds}s)")
+    return {'flow_rows': rows, 'seconds': seconds}
+
+
+def snapshot_is_stale(updated_at):
+    return (
+        updated_at is None or
+        (timezone.now() - updated_at).total_seconds() > metrics_config()['SNAPSHOT_MAX_AGE_SECONDS']
+    )
+
+
+def refresh_stale_snapshot():
+    """Background refresh: rollup فقط إذا كانت اللقطة ما زالت قديمة"""
+    _, updated_at = latest_snapshot()
+    if not snapshot_is_stale(updated_at):
+        return None
+    return run_rollup(metrics_config()['BACKFILL_DAYS'] if updated_at is None else None)
+
+
+def _refresh_step():
+    refresh_stale_snapshot()
+    return False
+
+
+_background_refresher = BackgroundWorker(
+    'admin-metrics-refresher',
+    step=_refresh_step,
+    idle_timeout=lambda: metrics_config()['SNAPSHOT_MAX_AGE_SECONDS'],
+)
+
+
+def schedule_refresh():
+    """Refresh the snapshot outside the request (celery task / background thread)"""
+    mode = metrics_config()['DISPATCH']
+    if mode == 'celery':
+        from .tasks import refresh_stale_metrics
+        refresh_stale_metrics.delay()
+    elif mode == 'thread':
+        _background_refresher.wake()
+    # 'command': manage.py rollup_metrics (cron) فقط
+
+
+def get_snapshot():
+    """
+    Snapshot for the dashboard endpoints
+    - لم تُحسب من قبل → backfill كامل (مرة واحدة، تحت القفل)
+    - قديمة → تُعرض كما هي ويُجدول التحديث في الخلفية
+    """
+    values, updated_at = latest_snapshot()
+    if updated_at is None:
+        if run_rollup(metrics_config()['BACKFILL_DAYS']) is not None:
+            return latest_snapshot()[0]
+        # backfill آخر قيد التنفيذ → إجماليات مباشرة بدون كتابة
+        return compute_snapshot()
+    if snapshot_is_stale(updated_at):
+        schedule_refresh()
+    return values
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=64)),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('snapshot', 'Snapshot')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='بداية الساعة/اليوم، أو وقت اللقطة')),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Metric rollup',
+                'verbose_name_plural': 'Metric rollups',
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='admin_api_m_granula_528cc5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'metric', 'bucket'), name='unique_metric_rollup_bucket')],
+            },
+        ),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
 
-# Create your models here.
+
+class MetricRollup(models.Model):
+    """
+    جدول الإحصائيات المجمّعة للوحة التحكم
+    Pre-aggregated dashboard metrics:
+    - hour / day: أحداث (تسجيلات، مهام منشورة...) لكل ساعة أو يوم بالتوقيت المحلي
+    - snapshot: لقطة للإجماليات الحالية (عدد المستخدمين، المهام النشطة...)
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+        ('snapshot', 'Snapshot'),
+    ]
+
+    metric = models.CharField(max_length=64)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField(help_text="بداية الساعة/اليوم، أو وقت اللقطة")
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Metric rollup"
+        verbose_name_plural = "Metric rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'metric', 'bucket'],
+                name='unique_metric_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} [{self.granularity} {self.bucket:%Y-%m-%d %H:%M}] = {self.value}"
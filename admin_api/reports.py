@@ -0,0 +1,65 @@
+# admin_api/reports.py
+"""
+تقارير لوحة التحكم المجمّعة
+Grouped admin reports: every metric comes from a GROUP BY query instead of
+per-row counts, sorting/limiting happen in SQL, and results are cached
+for REPORT_CACHE_SECONDS.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .analytics import local_midnight
+from .metrics import metrics_config
+
+
+def category_report(limit=10):
+    """
+    أكثر فئات الخدمات طلباً
+    [{category_id, category_name, total_tasks, tasks_this_month, total_workers}] مرتبة حسب total_tasks
+    """
+    limit = max(limit, 0)
+    month_start = local_midnight(timezone.localdate().replace(day=1))
+    cache_key = f'admin:category_report:{limit}:{month_start:%Y-%m}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = _compute_category_report(limit, month_start)
+        cache.set(cache_key, data, metrics_config()['REPORT_CACHE_SECONDS'])
+    return data
+
+
+def _compute_category_report(limit, month_start):
+    from services.models import ServiceCategory
+    from users.models import WorkerProfile
+
+    # 1. المهام: استعلام واحد مع ORDER BY ... LIMIT
+    # (ترتيب الفئة الافتراضي يحسم التعادل كما كان الترتيب في Python)
+    categories = list(
+        ServiceCategory.objects.annotate(
+            total_tasks=Count('service_requests'),
+            tasks_this_month=Count(
+                'service_requests', filter=Q(service_requests__created_at__gte=month_start)
+            ),
+        ).order_by('-total_tasks', *ServiceCategory._meta.ordering, 'id')
+        .values('id', 'name', 'total_tasks', 'tasks_this_month')[:limit]
+    )
+
+    # 2. العمال: WorkerProfile.service_category يخزن اسم الفئة → استعلام مجمّع واحد
+    workers = dict(
+        WorkerProfile.objects.filter(
+            user__role='worker',
+            service_category__in={category['name'] for category in categories}
+        ).values('service_category').annotate(count=Count('id')).order_by()
+        .values_list('service_category', 'count')
+    )
+
+    return [
+        {
+            'category_id': category['id'],
+            'category_name': category['name'],
+            'total_tasks': category['total_tasks'],
+            'tasks_this_month': category['tasks_this_month'],
+            'total_workers': workers.get(category['name'], 0),
+        }
+        for category in categories
+    ]
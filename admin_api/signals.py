@@ -0,0 +1,87 @@
+# admin_api/signals.py
+"""
+تحديث جدول MetricRollup فوراً عند إنشاء/تعديل/حذف السجلات
+(reconcile_flows يصحح دورياً أي تحديث تم بدون signals)
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from users.models import User
+from tasks.models import ServiceRequest
+from payments.models import TaskBundle
+
+from .metrics import record_event, TASK_STATUS_METRICS
+
+
+# ============================================
+# Users
+# ============================================
+@receiver(post_save, sender=User)
+def rollup_user_joined(sender, instance, created, **kwargs):
+    if created and instance.role in ('client', 'worker'):
+        record_event(f'users_joined.{instance.role}', instance.date_joined)
+
+
+@receiver(post_delete, sender=User)
+def rollup_user_deleted(sender, instance, **kwargs):
+    if instance.role in ('client', 'worker'):
+        record_event(f'users_joined.{instance.role}', instance.date_joined, -1)
+
+
+# ============================================
+# Tasks - الحالة تُحسب حسب updated_at
+# ============================================
+@receiver(pre_save, sender=ServiceRequest)
+def rollup_task_remember_state(sender, instance, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk:
+        instance._rollup_previous = ServiceRequest.objects.filter(pk=instance.pk).values_list(
+            'status', 'updated_at'
+        ).first()
+
+
+@receiver(post_save, sender=ServiceRequest)
+def rollup_task_saved(sender, instance, created, **kwargs):
+    if created:
+        record_event('tasks_created', instance.created_at)
+
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        previous_status, previous_updated_at = previous
+        if previous_status in TASK_STATUS_METRICS:
+            record_event(TASK_STATUS_METRICS[previous_status], previous_updated_at, -1)
+    if instance.status in TASK_STATUS_METRICS:
+        record_event(TASK_STATUS_METRICS[instance.status], instance.updated_at)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def rollup_task_deleted(sender, instance, **kwargs):
+    record_event('tasks_created', instance.created_at, -1)
+    if instance.status in TASK_STATUS_METRICS:
+        record_event(TASK_STATUS_METRICS[instance.status], instance.updated_at, -1)
+
+
+# ============================================
+# Bundles - عند اكتمال الدفع
+# ============================================
+@receiver(pre_save, sender=TaskBundle)
+def rollup_bundle_remember_status(sender, instance, **kwargs):
+    instance._rollup_previous_status = None
+    if instance.pk:
+        instance._rollup_previous_status = TaskBundle.objects.filter(pk=instance.pk).values_list(
+            'moosyl_payment_status', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=TaskBundle)
+def rollup_bundle_saved(sender, instance, created, **kwargs):
+    was_completed = getattr(instance, '_rollup_previous_status', None) == 'completed'
+    is_completed = instance.moosyl_payment_status == 'completed'
+    if is_completed != was_completed:
+        record_event('bundles_sold', instance.purchased_at, 1 if is_completed else -1)
+
+
+@receiver(post_delete, sender=TaskBundle)
+def rollup_bundle_deleted(sender, instance, **kwargs):
+    if instance.moosyl_payment_status == 'completed':
+        record_event('bundles_sold', instance.purchased_at, -1)
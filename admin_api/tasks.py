@@ -0,0 +1,19 @@
+# admin_api/tasks.py
+"""
+Celery tasks for the admin dashboard
+"""
+from celery import shared_task
+
+from .metrics import refresh_stale_snapshot, run_rollup
+
+
+@shared_task(ignore_result=True)
+def rollup_metrics():
+    """تصحيح الأحداث الأخيرة وتحديث لقطة الإجماليات"""
+    return run_rollup()
+
+
+@shared_task(ignore_result=True)
+def refresh_stale_metrics():
+    """تحديث اللقطة عند الطلب (من get_snapshot) إذا كانت ما زالت قديمة"""
+    return refresh_stale_snapshot()
@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework import status, permissions, generics
 from django.db.models import Count, Sum, Avg, Q, Max
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.shortcuts import get_object_or_404
 from users.models import User, WorkerProfile, ClientProfile,AdminProfile
 from tasks.models import ServiceRequest, TaskApplication, TaskReview
@@ -14,7 +14,6 @@ from services.models import ServiceCategory, NouakchottArea
 from notifications.models import Notification,NotificationSettings
 from notifications.serializers import NotificationListSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from complaints.models import Complaint
 from .email_service import (
     generate_otp, 
     send_password_reset_email, 
@@ -39,7 +38,10 @@ from .serializers import (
     AdminPasswordResetConfirmSerializer
 )
 from workers.models import WorkerService 
-from payments.models import UserTaskCounter  
+from .metrics import get_snapshot, flow_totals
+from .analytics import bucketed_counts, parse_range, local_midnight
+from .reports import category_report
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, streaming_export
  
 
 # ==================== Admin Authentication ====================
@@ -108,72 +110,55 @@ class AdminLoginView(APIView):
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def dashboard_stats(request):
-    """إحصائيات Dashboard الرئيسية - محدّثة للنظام الجديد"""
+    """إحصائيات Dashboard الرئيسية - من جدول الإحصائيات المجمّعة"""
     
-    from payments.models import UserTaskCounter, TaskBundle
+    now = timezone.localtime()
+    month_start = local_midnight(now.date().replace(day=1))
+    last_month_start = local_midnight((month_start.date() - timedelta(days=1)).replace(day=1))
     
-    now = timezone.now()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    # ✅ الإجماليات من آخر لقطة، والأحداث الشهرية من صفوف الأيام
+    snapshot = get_snapshot()
+    flows = flow_totals({
+        'this_month': (month_start, None),
+        'last_month': (last_month_start, month_start),
+    }, metrics=['users_joined.client', 'users_joined.worker', 'bundles_sold'])
     
     # Users Stats
-    total_users = User.objects.filter(role__in=['client', 'worker']).count()
-    total_clients = User.objects.filter(role='client').count()
-    total_workers = User.objects.filter(role='worker').count()
-    new_users_this_month = User.objects.filter(
-        role__in=['client', 'worker'],
-        date_joined__gte=month_start
-    ).count()
+    total_users = snapshot['total_users']
+    total_clients = snapshot['total_clients']
+    total_workers = snapshot['total_workers']
+    new_users_this_month = (
+        flows['this_month']['users_joined.client'] + flows['this_month']['users_joined.worker']
+    )
     
     # Tasks Stats
-    total_tasks = ServiceRequest.objects.count()
-    active_tasks = ServiceRequest.objects.filter(status='active').count()
-    completed_tasks = ServiceRequest.objects.filter(status='completed').count()
-    cancelled_tasks = ServiceRequest.objects.filter(status='cancelled').count()
+    total_tasks = snapshot['total_tasks']
+    active_tasks = snapshot['active_tasks']
+    completed_tasks = snapshot['completed_tasks']
+    cancelled_tasks = snapshot['cancelled_tasks']
     
     # ✅ Subscription Stats - النظام الجديد
-    # عدد المستخدمين الذين لديهم حزمة نشطة (Premium)
-    premium_users_count = TaskBundle.objects.filter(
-        is_active=True,
-        moosyl_payment_status='completed'
-    ).values('user').distinct().count()
-    
-    # عدد الحزم المباعة (مكتملة الدفع)
-    total_bundles_sold = TaskBundle.objects.filter(
-        moosyl_payment_status='completed'
-    ).count()
-    
-    # الحزم النشطة حالياً
-    active_bundles = TaskBundle.objects.filter(
-        is_active=True,
-        moosyl_payment_status='completed'
-    ).count()
+    premium_users_count = snapshot['premium_users']
+    total_bundles_sold = snapshot['total_bundles_sold']
+    active_bundles = snapshot['active_bundles']
     
     # إجمالي الإيرادات (عدد الحزم × 5 MRU)
     total_revenue = total_bundles_sold * 5
     
     # الإيرادات هذا الشهر
-    bundles_this_month = TaskBundle.objects.filter(
-        moosyl_payment_status='completed',
-        purchased_at__gte=month_start
-    ).count()
-    revenue_this_month = bundles_this_month * 5
+    revenue_this_month = flows['this_month']['bundles_sold'] * 5
     
     # Reports Stats
-    pending_reports = Report.objects.filter(status='pending').count()
-    resolved_reports = Report.objects.filter(status='resolved').count()
-    total_complaints = Complaint.objects.count()
-    new_complaints_count = Complaint.objects.filter(status='new').count()
-    pending_complaints_count = Complaint.objects.filter(
-        status__in=['new', 'under_review']
-    ).count()
+    pending_reports = snapshot['pending_reports']
+    resolved_reports = snapshot['resolved_reports']
+    total_complaints = snapshot['total_complaints']
+    new_complaints_count = snapshot['new_complaints']
+    pending_complaints_count = snapshot['pending_complaints']
     
     # Growth Rates
-    last_month_users = User.objects.filter(
-        role__in=['client', 'worker'],
-        date_joined__gte=last_month_start,
-        date_joined__lt=month_start
-    ).count()
+    last_month_users = (
+        flows['last_month']['users_joined.client'] + flows['last_month']['users_joined.worker']
+    )
     
     user_growth_rate = 0
     if last_month_users > 0:
@@ -1021,42 +1006,17 @@ def subscription_analytics(request):
         }, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        from payments.models import UserTaskCounter, TaskBundle
-        from django.db.models import Count, Sum
+        # ✅ كل الأرقام من آخر لقطة في جدول الإحصائيات المجمّعة
+        snapshot = get_snapshot()
         
         # ✅ 1. إجمالي المستخدمين
-        total_users = User.objects.filter(role__in=['client', 'worker']).count()
-        
-        # ✅ 2. عدد المستخدمين في الفترة المجانية (0-4 مهام مستخدمة)
-        free_users = UserTaskCounter.objects.filter(
-            free_tasks_used__lt=5  # لم يستنفدوا المجاني بعد
-        ).exclude(
-            # استبعاد من لديهم حزمة نشطة
-            user__task_bundles__is_active=True,
-            user__task_bundles__moosyl_payment_status='completed'
-        ).count()
-        
-        # ✅ 3. عدد المستخدمين الذين لديهم حزمة نشطة (Premium)
-        premium_users = TaskBundle.objects.filter(
-            is_active=True,
-            moosyl_payment_status='completed'
-        ).values('user').distinct().count()
-        
-        # ✅ 4. المستخدمين عند 4 مهام مجانية (على وشك النفاد)
-        users_at_4_tasks = UserTaskCounter.objects.filter(
-            free_tasks_used=4
-        ).exclude(
-            user__task_bundles__is_active=True,
-            user__task_bundles__moosyl_payment_status='completed'
-        ).count()
-        
-        # ✅ 5. المستخدمين عند 5 مهام (استنفدوا المجاني)
-        users_at_5_tasks = UserTaskCounter.objects.filter(
-            free_tasks_used__gte=5
-        ).exclude(
-            user__task_bundles__is_active=True,
-            user__task_bundles__moosyl_payment_status='completed'
-        ).count()
+        total_users = snapshot['total_users']
+        
+        # ✅ 2-5. المجاني / Premium / على وشك النفاد / استنفدوا المجاني
+        free_users = snapshot['free_users']
+        premium_users = snapshot['premium_users']
+        users_at_4_tasks = snapshot['users_at_4_tasks']
+        users_at_5_tasks = snapshot['users_at_5_tasks']
         
         # ✅ 6. معدل التحويل (Conversion Rate)
         conversion_rate = 0.0
@@ -1064,54 +1024,25 @@ def subscription_analytics(request):
             conversion_rate = round((premium_users / total_users) * 100, 2)
         
         # ✅ 7. الإيرادات الفعلية (عدد الحزم المباعة × 5 MRU)
-        total_bundles_sold = TaskBundle.objects.filter(
-            moosyl_payment_status='completed'
-        ).count()
-        
+        total_bundles_sold = snapshot['total_bundles_sold']
         total_revenue = total_bundles_sold * 5
         
         # ✅ 8. الإيرادات الشهرية المحتملة (الحزم النشطة × 5 MRU)
-        active_bundles = TaskBundle.objects.filter(
-            is_active=True,
-            moosyl_payment_status='completed'
-        ).count()
-        
+        active_bundles = snapshot['active_bundles']
         monthly_revenue_potential = active_bundles * 5
         
         # ✅ 9. تفصيل Premium vs Free حسب الدور
-        premium_clients = TaskBundle.objects.filter(
-            is_active=True,
-            moosyl_payment_status='completed',
-            user__role='client'
-        ).values('user').distinct().count()
-        
-        premium_workers = TaskBundle.objects.filter(
-            is_active=True,
-            moosyl_payment_status='completed',
-            user__role='worker'
-        ).values('user').distinct().count()
-        
-        total_clients = User.objects.filter(role='client').count()
-        total_workers = User.objects.filter(role='worker').count()
-        
-        free_clients = total_clients - premium_clients
-        free_workers = total_workers - premium_workers
+        premium_clients = snapshot['premium_clients']
+        premium_workers = snapshot['premium_workers']
+        free_clients = snapshot['total_clients'] - premium_clients
+        free_workers = snapshot['total_workers'] - premium_workers
         
         # ✅ 10. إحصائيات إضافية
-        # المستخدمين الذين اشتروا حزمة واحدة على الأقل
-        users_purchased_once = UserTaskCounter.objects.filter(
-            total_subscriptions__gte=1
-        ).count()
-        
-        # المستخدمين الذين اشتروا أكثر من حزمة
-        users_purchased_multiple = UserTaskCounter.objects.filter(
-            total_subscriptions__gte=2
-        ).count()
-        
-        # متوسط عدد الحزم لكل مستخدم
-        avg_bundles = UserTaskCounter.objects.aggregate(
-            avg=Avg('total_subscriptions')
-        )['avg'] or 0
+        users_purchased_once = snapshot['users_purchased_once']
+        users_purchased_multiple = snapshot['users_purchased_multiple']
+        avg_bundles = 0
+        if snapshot['task_counters']:
+            avg_bundles = snapshot['total_subscriptions'] / snapshot['task_counters']
         
         return Response({
             'success': True,
@@ -1165,29 +1096,28 @@ def platform_activity(request):
     """
     from .serializers import PlatformActivitySerializer
     
-    now = timezone.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    now = timezone.localtime()
+    today_start = local_midnight(now.date())
     week_start = today_start - timedelta(days=now.weekday())
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_start = local_midnight(now.date().replace(day=1))
+    
+    # ✅ كل الأحداث من صفوف الأيام في جدول الإحصائيات (استعلام واحد)
+    get_snapshot()  # backfill / تصحيح دوري إذا كانت الإحصائيات قديمة
+    flows = flow_totals({
+        'today': (today_start, None),
+        'week': (week_start, None),
+        'month': (month_start, None),
+    }, metrics=['tasks_created', 'tasks_accepted', 'tasks_cancelled'])
     
     # المهام المنشورة
-    tasks_today = ServiceRequest.objects.filter(created_at__gte=today_start).count()
-    tasks_week = ServiceRequest.objects.filter(created_at__gte=week_start).count()
-    tasks_month = ServiceRequest.objects.filter(created_at__gte=month_start).count()
+    tasks_today = flows['today']['tasks_created']
+    tasks_week = flows['week']['tasks_created']
+    tasks_month = flows['month']['tasks_created']
     
     # المهام المقبولة (active)
-    accepted_today = ServiceRequest.objects.filter(
-        status='active',
-        updated_at__gte=today_start
-    ).count()
-    accepted_week = ServiceRequest.objects.filter(
-        status='active',
-        updated_at__gte=week_start
-    ).count()
-    accepted_month = ServiceRequest.objects.filter(
-        status='active',
-        updated_at__gte=month_start
-    ).count()
+    accepted_today = flows['today']['tasks_accepted']
+    accepted_week = flows['week']['tasks_accepted']
+    accepted_month = flows['month']['tasks_accepted']
     
     # معدل القبول
     acceptance_rate = 0
@@ -1195,36 +1125,26 @@ def platform_activity(request):
         acceptance_rate = (accepted_month / tasks_month) * 100
     
     # المهام الملغاة
-    cancelled_today = ServiceRequest.objects.filter(
-        status='cancelled',
-        updated_at__gte=today_start
-    ).count()
-    cancelled_week = ServiceRequest.objects.filter(
-        status='cancelled',
-        updated_at__gte=week_start
-    ).count()
-    cancelled_month = ServiceRequest.objects.filter(
-        status='cancelled',
-        updated_at__gte=month_start
-    ).count()
+    cancelled_today = flows['today']['tasks_cancelled']
+    cancelled_week = flows['week']['tasks_cancelled']
+    cancelled_month = flows['month']['tasks_cancelled']
     
     # معدل الإلغاء
     cancellation_rate = 0
     if tasks_month > 0:
         cancellation_rate = (cancelled_month / tasks_month) * 100
     
-    # العمال النشطين
-    workers_online = User.objects.filter(
-        role='worker',
-        worker_profile__is_online=True
-    ).count()
-    
-    workers_with_location = User.objects.filter(
-        role='worker',
-        worker_profile__location_sharing_enabled=True,
-        worker_profile__current_latitude__isnull=False,
-        worker_profile__current_longitude__isnull=False
-    ).count()
+    # العمال النشطين (لحظي - لا يُخزّن في الجدول)
+    workers = WorkerProfile.objects.filter(user__role='worker').aggregate(
+        online=Count('id', filter=Q(is_online=True)),
+        with_location=Count('id', filter=Q(
+            location_sharing_enabled=True,
+            current_latitude__isnull=False,
+            current_longitude__isnull=False
+        ))
+    )
+    workers_online = workers['online']
+    workers_with_location = workers['with_location']
     
     data = {
         'tasks_published_today': tasks_today,
@@ -1265,41 +1185,8 @@ def top_service_categories(request):
     try:
         limit = int(request.GET.get('limit', 10))
         
-        categories = ServiceCategory.objects.all()
-        
-        categories_data = []
-        now = timezone.now()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        for category in categories:
-            # ✅ إجمالي المهام
-            total_tasks = ServiceRequest.objects.filter(
-                service_category=category
-            ).count()
-            
-            # ✅ المهام هذا الشهر
-            tasks_this_month = ServiceRequest.objects.filter(
-                service_category=category,
-                created_at__gte=month_start
-            ).count()
-            
-            # ✅ عدد العمال من WorkerProfile (لأن WorkerService فارغ)
-            total_workers = User.objects.filter(
-                role='worker',
-                worker_profile__service_category=category.name
-            ).count()
-            
-            categories_data.append({
-                'category_id': category.id,
-                'category_name': category.name,  
-                'total_tasks': total_tasks,
-                'tasks_this_month': tasks_this_month,
-                'total_workers': total_workers
-            })
-        
-        # ✅ ترتيب حسب إجمالي المهام
-        categories_data.sort(key=lambda x: x['total_tasks'], reverse=True)
-        categories_data = categories_data[:limit]
+        # ✅ استعلامات مجمّعة + كاش قصير (admin_api/reports.py)
+        categories_data = category_report(limit)
         
         return Response({
             'success': True,
@@ -1490,18 +1377,19 @@ def user_growth_chart(request):
     Returns count of new users registered each month
     """
     try:
-        from django.db.models import Count
-        from django.db.models.functions import TruncMonth
-        from datetime import datetime
+        from datetime import date
         
-        # Get users grouped by month from September 2025
-        users_by_month = User.objects.filter(
-            created_at__gte=datetime(2025, 9, 1)  # من سبتمبر 2025
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
+        # من سبتمبر 2025 (افتراضياً) - ?start=&end=&granularity=day|week|month
+        try:
+            start, end, granularity = parse_range(
+                request.GET, default_granularity='month', default_start=date(2025, 9, 1)
+            )
+        except ValueError as e:
+            return Response({'success': False, 'error': str(e)}, status=400)
+        
+        users_by_bucket = bucketed_counts(
+            User.objects.all(), 'created_at', start, end, granularity=granularity
+        )
         
         # Format data for frontend
         months_fr = {
@@ -1513,14 +1401,13 @@ def user_growth_chart(request):
         growth_data = []
         cumulative = 0
         
-        for entry in users_by_month:
-            month_num = entry['month'].month
-            cumulative += entry['count']
+        for bucket, counts in users_by_bucket:
+            cumulative += counts['count']
             growth_data.append({
-                'month': months_fr[month_num],
-                'new_users': entry['count'],
+                'month': months_fr[bucket.month] if granularity == 'month' else bucket.date().isoformat(),
+                'new_users': counts['count'],
                 'total_users': cumulative,
-                'date': entry['month'].strftime('%Y-%m')
+                'date': bucket.strftime('%Y-%m') if granularity == 'month' else bucket.date().isoformat()
             })
         
         return Response({
@@ -1533,21 +1420,60 @@ def user_growth_chart(request):
             'success': False,
             'error': str(e)
         }, status=500)
-    
+
+
+# ========================================
+# Tasks list / export
+# ========================================
+
+TASK_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+TASK_EXPORT_FIELDS = [
+    'id', 'title', 'description', 'status', 'budget', 'location',
+    'client_name', 'client_phone', 'category_name', 'category_icon',
+    'created_at', 'applications_count', 'accepted_worker_name',
+]
+
+
+def _admin_task_row(task):
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'budget': task.budget,
+        'location': task.location,
+        'client_name': task.client.get_full_name() if task.client else 'N/A',
+        'client_phone': task.client.phone if task.client else 'N/A',
+        'category_name': task.service_category.name if task.service_category else None,
+        'category_icon': task.service_category.icon if task.service_category else None,
+        'created_at': task.created_at.isoformat(),
+        'applications_count': task.total_applications,
+        'accepted_worker_name': task.assigned_worker.get_full_name() if task.assigned_worker else None,
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def get_all_tasks(request):
     """
     Get all tasks with optional filters
+    
+    - بدون ترقيم: القائمة كاملة (كما كانت)
+    - ?page_size=N&cursor=<next_cursor>: ترقيم keyset حسب (created_at, id)
+    - ?export=csv|ndjson: تصدير كامل كتدفق (StreamingHttpResponse)
     """
     try:
         from tasks.models import ServiceRequest
         from django.db.models import Q
         
-        # ✅ صحيح
+        # ✅ عدد الطلبات محسوب في نفس الاستعلام
         tasks = ServiceRequest.objects.select_related(
             'client', 'service_category', 'assigned_worker'
-        ).all()
+        ).annotate(
+            # (applications_count خاصية في الموديل تحسب الطلبات النشطة فقط)
+            total_applications=Count('applications')
+        )
         
         # Apply filters
         status = request.GET.get('status')
@@ -1566,34 +1492,64 @@ def get_all_tasks(request):
                 Q(description__icontains=search)
             )
         
-        tasks_data = []
-        for task in tasks.order_by('-created_at'):
-            # Handle applications count safely
-            try:
-                applications_count = task.applications.count()
-            except:
-                applications_count = 0
-            
-            tasks_data.append({
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'status': task.status,
-                'budget': task.budget,
-                'location': task.location,
-                'client_name': task.client.get_full_name() if task.client else 'N/A',
-                'client_phone': task.client.phone if task.client else 'N/A',
-                'category_name': task.service_category.name if task.service_category else None,
-                'category_icon': task.service_category.icon if task.service_category else None,
-                'created_at': task.created_at.isoformat(),
-                'applications_count': applications_count,
-                'accepted_worker_name': task.assigned_worker.get_full_name() if task.assigned_worker else None,
+        tasks = tasks.order_by('-created_at', '-id')
+        
+        export_format = request.GET.get('export')
+        if export_format:
+            if export_format not in EXPORT_FORMATS:
+                return Response({
+                    'success': False,
+                    'error': f"export must be one of: {', '.join(EXPORT_FORMATS)}"
+                }, status=400)
+            rows = (_admin_task_row(task) for task in tasks.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+            filename = f"tasks-{timezone.localdate():%Y%m%d}"
+            return streaming_export(rows, TASK_EXPORT_FIELDS, export_format, filename)
+        
+        cursor = request.GET.get('cursor')
+        if not cursor and 'page_size' not in request.GET:
+            tasks_data = [_admin_task_row(task) for task in tasks]
+            return Response({
+                'success': True,
+                'data': tasks_data,
+                'total': len(tasks_data)
             })
         
+        # ✅ ترقيم keyset
+        try:
+            page_size = min(max(int(request.GET.get('page_size', 50)), 1), 500)
+        except ValueError:
+            page_size = 50
+        
+        total = tasks.count()
+        if cursor:
+            try:
+                after_micros, after_id = cursor.split(':')
+                after_created = TASK_EPOCH + timedelta(microseconds=int(after_micros))
+                after_id = int(after_id)
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'Invalid cursor',
+                    'message': 'cursor must be the next_cursor value of the previous page'
+                }, status=400)
+            tasks = tasks.filter(
+                Q(created_at__lt=after_created) |
+                Q(created_at=after_created, id__lt=after_id)
+            )
+        
+        page = list(tasks[:page_size + 1])
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            # cursor = created_at بالميكروثانية:id (آمن داخل الرابط)
+            last = page[-1]
+            next_cursor = f"{(last.created_at - TASK_EPOCH) // timedelta(microseconds=1)}:{last.id}"
+        
         return Response({
             'success': True,
-            'data': tasks_data,
-            'total': len(tasks_data)
+            'data': [_admin_task_row(task) for task in page],
+            'total': total,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -1679,48 +1635,47 @@ def users_at_limit(request):
     يعرض:
     - المستخدمين عند 4 مهام مجانية (قريب من النفاد)
     - المستخدمين عند 5 مهام (استنفدوا المجاني ولا حزمة)
+    
+    ?page=N&page_size=M للترقيم (payments/segments.py)
     """
     try:
-        from payments.models import UserTaskCounter, TaskBundle
-        
-        # ✅ 1. جلب المستخدمين عند 4 مهام مجانية (على وشك النفاد)
-        users_at_4 = UserTaskCounter.objects.filter(
-            free_tasks_used=4
-        ).exclude(
-            # استبعاد من لديهم حزمة نشطة
-            user__task_bundles__is_active=True,
-            user__task_bundles__moosyl_payment_status='completed'
-        ).select_related('user')
-        
-        # ✅ 2. جلب المستخدمين عند 5+ مهام (استنفدوا المجاني بدون حزمة)
-        users_at_5_plus = UserTaskCounter.objects.filter(
-            free_tasks_used__gte=5
-        ).exclude(
-            user__task_bundles__is_active=True,
-            user__task_bundles__moosyl_payment_status='completed'
-        ).select_related('user')
-        
-        # ✅ 3. دمج النتائج
-        users_data = []
+        from payments.segments import segmented_counters, segment_counts
         
-        # إضافة المستخدمين عند 4 مهام
-        for counter in users_at_4:
-            user = counter.user
-            users_data.append({
-                'user_id': user.id,
-                'user_name': user.get_full_name() or user.phone,
-                'phone': user.phone,
-                'role': user.role,
-                'free_tasks_used': counter.free_tasks_used,
-                'tasks_count': counter.free_tasks_used,  # للتوافق مع React
-                'status': 'close_to_limit',
-                'status_message': '⚠️ 1 tâche restante',
-                'has_active_bundle': False,
-                'date_joined': user.date_joined.isoformat()
-            })
+        status_messages = {
+            'close_to_limit': '⚠️ 1 tâche restante',
+            'limit_reached': '🔴 Limite atteinte',
+        }
+        
+        # ✅ 1. الأعداد لكل تصنيف (استعلام واحد)
+        segments = segment_counts()
+        total = segments['close_to_limit'] + segments['limit_reached']
         
-        # إضافة المستخدمين عند 5+ مهام
-        for counter in users_at_5_plus:
+        # ✅ 2. القائمة: تصنيف في SQL (Exists) + ترتيب حسب عدد المهام (تنازلياً)
+        counters = segmented_counters().filter(
+            segment__in=list(status_messages)
+        ).select_related('user').order_by('-free_tasks_used', '-created_at', '-id')
+        
+        # ✅ 3. ترقيم اختياري (?page=N&page_size=M) - بدونه القائمة كاملة
+        pagination = None
+        if 'page' in request.GET or 'page_size' in request.GET:
+            try:
+                page = max(int(request.GET.get('page', 1)), 1)
+                page_size = min(max(int(request.GET.get('page_size', 50)), 1), 500)
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'page and page_size must be integers'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            offset = (page - 1) * page_size
+            counters = counters[offset:offset + page_size]
+            pagination = {
+                'page': page,
+                'page_size': page_size,
+                'has_next': offset + page_size < total
+            }
+        
+        users_data = []
+        for counter in counters:
             user = counter.user
             users_data.append({
                 'user_id': user.id,
@@ -1729,24 +1684,24 @@ def users_at_limit(request):
                 'role': user.role,
                 'free_tasks_used': counter.free_tasks_used,
                 'tasks_count': counter.free_tasks_used,  # للتوافق مع React
-                'status': 'limit_reached',
-                'status_message': '🔴 Limite atteinte',
+                'status': counter.segment,
+                'status_message': status_messages[counter.segment],
                 'has_active_bundle': False,
                 'date_joined': user.date_joined.isoformat()
             })
         
-        # ✅ 4. ترتيب حسب عدد المهام (تنازلياً)
-        users_data.sort(key=lambda x: x['free_tasks_used'], reverse=True)
-        
-        return Response({
+        response = {
             'success': True,
             'data': users_data,
-            'count': len(users_data),
+            'count': total,
             'breakdown': {
-                'at_4_tasks': len([u for u in users_data if u['free_tasks_used'] == 4]),
-                'at_5_plus_tasks': len([u for u in users_data if u['free_tasks_used'] >= 5])
+                'at_4_tasks': segments['close_to_limit'],
+                'at_5_plus_tasks': segments['limit_reached']
             }
-        }, status=status.HTTP_200_OK)
+        }
+        if pagination:
+            response['pagination'] = pagination
+        return Response(response, status=status.HTTP_200_OK)
         
     except Exception as e:
         import traceback
@@ -1763,22 +1718,23 @@ def users_at_limit(request):
 def daily_tasks_chart(request):
     """
     عدد المهام المنشورة يومياً آخر 7 أيام
+    ?days=N أو ?start=&end= و ?granularity=day|week|month (استعلام واحد)
     """
-    from datetime import timedelta
+    try:
+        start, end, granularity = parse_range(request.GET, default_days=7)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    today = timezone.now().date()
-    data = []
     days_fr = ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim']
     
-    for i in range(6, -1, -1):  
-        day = today - timedelta(days=i)
-        count = ServiceRequest.objects.filter(
-            created_at__date=day
-        ).count()
-        
+    data = []
+    for bucket, counts in bucketed_counts(
+        ServiceRequest.objects.all(), 'created_at', start, end, granularity=granularity
+    ):
+        day = bucket.date()
         data.append({
-            'day': days_fr[day.weekday()],
-            'tasks': count,
+            'day': days_fr[day.weekday()] if granularity == 'day' else day.isoformat(),
+            'tasks': counts['count'],
             'date': day.isoformat()
         })
     
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    Conversation.objects.update(
+        last_message_ref=Subquery(latest.values('id')[:1]),
+        last_message_preview=Coalesce(
+            Subquery(latest.annotate(preview=Substr('content', 1, 1000)).values('preview')[:1]),
+            Value('')
+        ),
+        last_message_sender=Subquery(latest.values('sender_id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        total_messages=Coalesce(
+            Subquery(
+                Message.objects.filter(conversation=OuterRef('pk')).order_by()
+                .values('conversation').annotate(n=Count('id')).values('n')
+            ),
+            Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_conversation_deleted_at_by_client_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', help_text='نص آخر رسالة', max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_ref',
+            field=models.ForeignKey(blank=True, help_text='آخر رسالة', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, help_text='مرسل آخر رسالة', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from users.models import User
+from .unread import increment_unread, invalidate_unread
 
 
 class Conversation(models.Model):
@@ -53,6 +54,30 @@ class Conversation(models.Model):
         help_text="وقت آخر رسالة"
     )
     
+    # ✅ آخر رسالة (نسخة مخزنة لقائمة المحادثات - تُحدّث عند إنشاء رسالة)
+    last_message_ref = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="آخر رسالة"
+    )
+    last_message_preview = models.CharField(
+        max_length=1000,
+        blank=True,
+        default='',
+        help_text="نص آخر رسالة"
+    )
+    last_message_sender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="مرسل آخر رسالة"
+    )
+    
     # تواريخ
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -83,8 +108,25 @@ class Conversation(models.Model):
             if self.client_id == self.worker_id:
                 raise ValidationError("لا يمكن أن تكون المحادثة مع نفس المستخدم")
     
+    # تُحدّث فقط بـ update() من Message.save (لا نعيد كتابة قيم قديمة من الذاكرة)
+    MESSAGE_STATS_FIELDS = {
+        'total_messages', 'last_message_at', 'last_message_ref',
+        'last_message_preview', 'last_message_sender',
+    }
+    
+    # حالة الظهور/الحذف لكل طرف - ما تعدّله الـ views
+    VISIBILITY_FIELDS = [
+        'is_active', 'deleted_by_client', 'deleted_by_worker',
+        'deleted_at_by_client', 'deleted_at_by_worker', 'updated_at',
+    ]
+    
     def save(self, *args, **kwargs):
         self.clean()
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MESSAGE_STATS_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     @property
@@ -98,6 +140,10 @@ class Conversation(models.Model):
             is_read=False
         ).exclude(sender=user).count()
     
+    def other_participant_id(self, user_id):
+        """معرّف الطرف الآخر في المحادثة"""
+        return self.worker_id if user_id == self.client_id else self.client_id
+    
     def mark_messages_as_read(self, user):
         """تحديد رسائل المحادثة كمقروءة للمستخدم"""
         unread_messages = self.messages.filter(
@@ -109,6 +155,9 @@ class Conversation(models.Model):
             read_at=timezone.now()
         )
         
+        if updated_count:
+            invalidate_unread(user.id)
+        
         return updated_count
     
     def update_last_message_time(self):
@@ -185,9 +234,17 @@ class Message(models.Model):
         super().save(*args, **kwargs)
         
         if is_new:
-            # تحديث إحصائيات المحادثة
+            # تحديث إحصائيات المحادثة وآخر رسالة في استعلام واحد
+            Conversation.objects.filter(pk=self.conversation_id).update(
+                total_messages=models.F('total_messages') + 1,
+                last_message_at=self.created_at,
+                last_message_ref=self,
+                last_message_preview=self.content[:1000],
+                last_message_sender_id=self.sender_id
+            )
             self.conversation.total_messages += 1
-            self.conversation.update_last_message_time()
+            self.conversation.last_message_at = self.created_at
+            increment_unread(self.conversation.other_participant_id(self.sender_id))
     
     @property
     def receiver(self):
@@ -160,19 +160,22 @@ class ConversationSerializer(serializers.ModelSerializer):
         return None
     
     def get_last_message(self, obj):
-        """آخر رسالة في المحادثة"""
-        last_message = obj.last_message
-        if last_message:
+        """آخر رسالة في المحادثة (الحقول المخزنة في Conversation)"""
+        if obj.last_message_ref_id:
+            sender = obj.last_message_sender
             return {
-                'content': last_message.content,
-                'sender_name': last_message.sender.get_full_name() or last_message.sender.username,
-                'is_from_me': last_message.sender == self.context.get('request').user,
-                'created_at': last_message.created_at
+                'content': obj.last_message_preview,
+                'sender_name': (sender.get_full_name() or sender.username) if sender else '',
+                'is_from_me': obj.last_message_sender_id == self.context.get('request').user.id,
+                'created_at': obj.last_message_at
             }
         return None
     
     def get_unread_count(self, obj):
         """عدد الرسائل غير المقروءة"""
+        unread_counts = self.context.get('unread_counts')
+        if unread_counts is not None:
+            return unread_counts.get(obj.id, 0)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.get_unread_count(request.user)
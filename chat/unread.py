@@ -0,0 +1,87 @@
+# chat/unread.py
+"""
+عدد الرسائل غير المقروءة
+Unread message counts: one grouped query per user, plus an optional cached
+per-user total (settings.CHAT_UNREAD_CACHE) for badge polling.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+DEFAULT_UNREAD_CACHE = {
+    'ENABLED': False,
+    'TTL_SECONDS': 300,
+}
+
+
+def unread_cache_config():
+    return {**DEFAULT_UNREAD_CACHE, **getattr(settings, 'CHAT_UNREAD_CACHE', {})}
+
+
+def _cache_key(user_id):
+    return f"chat:unread:{user_id}"
+
+
+def user_conversations(user):
+    from .models import Conversation
+    return Conversation.objects.filter(
+        Q(client=user) | Q(worker=user),
+        is_active=True
+    )
+
+
+def unread_counts_by_conversation(user, conversations=None):
+    """
+    {conversation_id: unread_count} في استعلام واحد (GROUP BY)
+    المحادثات بدون رسائل غير مقروءة غير موجودة في القاموس
+    """
+    from .models import Message
+
+    if conversations is None:
+        conversations = user_conversations(user)
+    elif not hasattr(conversations, 'values'):
+        conversations = [conversation.id for conversation in conversations]
+
+    rows = Message.objects.filter(
+        conversation__in=conversations,
+        is_read=False
+    ).exclude(sender=user).values('conversation_id').annotate(
+        unread=Count('id')
+    ).order_by()
+    return {row['conversation_id']: row['unread'] for row in rows}
+
+
+def total_unread(user):
+    """إجمالي الرسائل غير المقروءة (من الكاش إذا كان مفعّلاً)"""
+    config = unread_cache_config()
+    if not config['ENABLED']:
+        return sum(unread_counts_by_conversation(user).values())
+
+    key = _cache_key(user.id)
+    total = cache.get(key)
+    if total is None:
+        total = sum(unread_counts_by_conversation(user).values())
+        cache.set(key, total, timeout=config['TTL_SECONDS'])
+    return total
+
+
+def increment_unread(user_id):
+    """رسالة جديدة للمستخدم - بعد الـ commit فقط"""
+    if not unread_cache_config()['ENABLED']:
+        return
+
+    def incr():
+        try:
+            cache.incr(_cache_key(user_id))
+        except ValueError:
+            # غير موجود في الكاش → يُحسب عند أول طلب
+            pass
+
+    transaction.on_commit(incr)
+
+
+def invalidate_unread(*user_ids):
+    if not unread_cache_config()['ENABLED']:
+        return
+    transaction.on_commit(lambda: cache.delete_many([_cache_key(user_id) for user_id in user_ids]))
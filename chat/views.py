@@ -9,6 +9,7 @@ from django.db import transaction
 from django.utils import timezone
 
 from .models import Conversation, Message, BlockedUser, Report
+from .unread import unread_counts_by_conversation, total_unread, invalidate_unread
 from .serializers import (
     ConversationSerializer, MessageSerializer, SendMessageSerializer,
     ReportSerializer, CreateReportSerializer, BlockUserSerializer
@@ -43,7 +44,7 @@ class ConversationListView(generics.ListAPIView):
             Q(client=user, deleted_by_client=False) | 
             Q(worker=user, deleted_by_worker=False),
             is_active=True
-        ).select_related('client', 'worker').prefetch_related('messages')
+        ).select_related('client', 'worker', 'last_message_sender')
         
         # استبعاد المحادثات مع المستخدمين المحظورين
         blocked_users = BlockedUser.objects.filter(
@@ -63,6 +64,12 @@ class ConversationListView(generics.ListAPIView):
             )
         
         return conversations
+    
+    def get_serializer_context(self):
+        # ✅ عدد غير المقروء لكل المحادثات في استعلام واحد
+        context = super().get_serializer_context()
+        context['unread_counts'] = unread_counts_by_conversation(self.request.user)
+        return context
 
 
 class ConversationMessagesView(generics.ListAPIView):
@@ -151,7 +158,7 @@ def send_message(request, conversation_id):
             conversation.deleted_by_client = False
             # ✅ نترك deleted_at_by_client كما هو (هذا السطر هو المهم!)
 
-    conversation.save()
+    conversation.save(update_fields=Conversation.VISIBILITY_FIELDS)
 
     serializer = SendMessageSerializer(data=request.data)
     
@@ -205,9 +212,10 @@ def delete_conversation(request, conversation_id):
     
     # ✅ إذا حذفها الطرفان، احذفها نهائياً
     if conversation.deleted_by_client and conversation.deleted_by_worker:
+        invalidate_unread(conversation.client_id, conversation.worker_id)
         conversation.delete()
     else:
-        conversation.save()
+        conversation.save(update_fields=Conversation.VISIBILITY_FIELDS)
     
     return Response({'message': 'Conversation supprimée avec succès'})
 
@@ -219,18 +227,7 @@ def unread_messages_count(request):
     عدد الرسائل غير المقروءة الإجمالي
     GET /api/chat/unread-count/
     """
-    user = request.user
-    
-    conversations = Conversation.objects.filter(
-        Q(client=user) | Q(worker=user),
-        is_active=True
-    )
-    
-    total_unread = 0
-    for conversation in conversations:
-        total_unread += conversation.get_unread_count(user)
-    
-    return Response({'unread_count': total_unread})
+    return Response({'unread_count': total_unread(request.user)})
 
 
 # نظام التبليغات
@@ -398,7 +395,7 @@ def start_conversation(request):
     
     if not created and not conversation.is_active:
         conversation.is_active = True
-        conversation.save()
+        conversation.save(update_fields=Conversation.VISIBILITY_FIELDS)
     
     first_message = None
     if initial_message and initial_message.strip():
@@ -0,0 +1,50 @@
+# core/background.py
+"""
+Single background thread per process for queue-backed work
+خيط خلفي واحد لكل عملية يعالج صناديق الانتظار (push outbox, webhooks...)
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    يستيقظ عند wake() (بعد commit) أو كل idle_timeout ثانية،
+    ويستدعي step() حتى تعيد قيمة فارغة (لا شيء مستحق)
+    """
+
+    def __init__(self, name, step, idle_timeout=30):
+        self.name = name
+        self.step = step
+        self.idle_timeout = idle_timeout
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """تشغيل الخيط إذا لم يكن يعمل، بدون إيقاظه (أول خطوة بعد idle_timeout)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._event.set()
+
+    def _run(self):
+        idle_timeout = self.idle_timeout() if callable(self.idle_timeout) else self.idle_timeout
+        while True:
+            self._event.wait(timeout=idle_timeout)
+            self._event.clear()
+            try:
+                while self.step():
+                    pass
+            except Exception as e:
+                logger.error(f"{self.name} error: {str(e)}")
+            finally:
+                close_old_connections()
@@ -0,0 +1,14 @@
+# core/celery.py
+"""
+Celery application (يُستخدم فقط عند USE_CELERY=True)
+celery -A core worker -B
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
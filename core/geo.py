@@ -0,0 +1,165 @@
+# core/geo.py
+"""
+Geospatial helpers shared by tasks and workers
+أدوات جغرافية مشتركة: شبكة خلايا + مربع حدودي + حساب المسافات دفعة واحدة (NumPy)
+"""
+from math import radians, cos, sin, asin, sqrt, floor
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+# حجم الخلية بالدرجات (~5.5 كم عند خط الاستواء)
+GRID_CELL_DEGREES = 0.05
+
+# أكثر من هذا العدد من الخلايا → نكتفي بفلترة المربع الحدودي
+MAX_GRID_CELLS_PER_QUERY = 400
+
+KM_PER_DEGREE_LAT = 111.32
+
+# بحث "الأقرب": نصف القطر يبدأ صغيراً ويتضاعف حتى نجد k عنصر
+NEAREST_INITIAL_RADIUS_KM = 5
+NEAREST_MAX_RADIUS_KM = 160
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometers (single pair)"""
+    lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
+    c = 2 * asin(sqrt(a))
+    return c * EARTH_RADIUS_KM
+
+
+def grid_cell(latitude, longitude):
+    """
+    Grid cell key for a coordinate, e.g. "362:-319"
+    مفتاح الخلية التي يقع فيها الإحداثي
+    """
+    if latitude is None or longitude is None:
+        return ''
+    row = floor(float(latitude) / GRID_CELL_DEGREES)
+    col = floor(float(longitude) / GRID_CELL_DEGREES)
+    return f"{row}:{col}"
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (min_lat, max_lat, min_lng, max_lng) enclosing a circle of radius_km
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(latitude)), 0.01))
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        max(longitude - lng_delta, -180.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def grid_cells_for_box(min_lat, max_lat, min_lng, max_lng):
+    """
+    All grid cell keys overlapping the box, or None when there are too many
+    to be worth an IN (...) lookup
+    """
+    row_start = floor(min_lat / GRID_CELL_DEGREES)
+    row_end = floor(max_lat / GRID_CELL_DEGREES)
+    col_start = floor(min_lng / GRID_CELL_DEGREES)
+    col_end = floor(max_lng / GRID_CELL_DEGREES)
+
+    total = (row_end - row_start + 1) * (col_end - col_start + 1)
+    if total > MAX_GRID_CELLS_PER_QUERY:
+        return None
+
+    return [
+        f"{row}:{col}"
+        for row in range(row_start, row_end + 1)
+        for col in range(col_start, col_end + 1)
+    ]
+
+
+def distances_km(latitude, longitude, latitudes, longitudes):
+    """
+    Distances from one point to many, as a NumPy array
+    حساب كل المسافات في استدعاء واحد (يقبل Decimal أو float)
+    """
+    lats = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lngs = np.radians(np.asarray(longitudes, dtype=np.float64))
+    origin_lat = radians(float(latitude))
+    origin_lng = radians(float(longitude))
+
+    a = (
+        np.sin((lats - origin_lat) / 2) ** 2
+        + cos(origin_lat) * np.cos(lats) * np.sin((lngs - origin_lng) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def rank_by_distance(latitude, longitude, items, latitudes, longitudes,
+                     radius_km=None, k=None):
+    """
+    Sort items by distance, optionally keeping only radius_km and the first k
+    يعيد قائمة (distance, item) مرتبة تصاعدياً
+    """
+    if not items or (k is not None and k <= 0):
+        return []
+
+    distances = distances_km(latitude, longitude, latitudes, longitudes)
+    indices = np.arange(len(distances))
+
+    if radius_km is not None:
+        indices = indices[distances <= radius_km]
+
+    # اختيار أقرب k دون ترتيب كل المرشحين
+    if k is not None and k < len(indices):
+        indices = indices[np.argpartition(distances[indices], k - 1)[:k]]
+
+    indices = indices[np.argsort(distances[indices], kind='stable')]
+    return [(float(distances[index]), items[index]) for index in indices]
+
+
+def _ordered_after(latitude, longitude, rows, radius_km, after, k):
+    """First k (distance, id) of rows ordered by (distance, id), strictly after the cursor"""
+    if not rows:
+        return []
+    ids, latitudes, longitudes = zip(*rows)
+    ids = np.asarray(ids)
+    distances = distances_km(latitude, longitude, latitudes, longitudes)
+
+    mask = np.ones(len(ids), dtype=bool)
+    if radius_km is not None:
+        mask &= distances <= radius_km
+    if after is not None:
+        after_distance, after_id = after
+        mask &= (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+
+    indices = np.flatnonzero(mask)
+    indices = indices[np.lexsort((ids[indices], distances[indices]))][:k]
+    return [(float(distances[index]), ids[index].item()) for index in indices]
+
+
+def expanding_nearest(latitude, longitude, fetch_rows, k, after=None,
+                      initial_radius_km=NEAREST_INITIAL_RADIUS_KM,
+                      max_radius_km=NEAREST_MAX_RADIUS_KM):
+    """
+    k nearest (distance, id) pairs ordered by (distance, id)
+    
+    fetch_rows(box) يعيد صفوف (id, lat, lng) داخل المربع الحدودي،
+    أو كل الصفوف إذا كان box = None (بعد تجاوز max_radius_km).
+    after = (distance, id) مؤشر keyset للصفحة التالية.
+    """
+    if k <= 0:
+        return []
+
+    radius = initial_radius_km
+    while True:
+        box = bounding_box(latitude, longitude, radius) if radius <= max_radius_km else None
+        nearest = _ordered_after(
+            latitude, longitude, list(fetch_rows(box)),
+            radius if box is not None else None, after, k
+        )
+        # كل صف خارج الدائرة أبعد من نصف القطر → النتيجة دقيقة
+        if len(nearest) >= k or box is None:
+            return nearest
+        radius *= 2
@@ -263,6 +263,135 @@ if USE_CELERY:
     CELERY_TASK_SERIALIZER = 'json'
     CELERY_RESULT_SERIALIZER = 'json'
     CELERY_TIMEZONE = TIME_ZONE
+    CELERY_BEAT_SCHEDULE = {
+        # إعادة محاولة الإشعارات المؤجلة والمحجوزة منذ مدة طويلة
+        'dispatch-push-outbox': {
+            'task': 'notifications.tasks.dispatch_push_outbox',
+            'schedule': 30.0,
+        },
+        # حذف الإشعارات المنتهية (بديل التنظيف داخل الطلبات)
+        'sweep-expired-notifications': {
+            'task': 'notifications.tasks.sweep_expired_notifications',
+            'schedule': 6 * 60 * 60.0,
+        },
+        # إحصائيات لوحة التحكم المجمّعة
+        'rollup-admin-metrics': {
+            'task': 'admin_api.tasks.rollup_metrics',
+            'schedule': 5 * 60.0,
+        },
+        # إعادة محاولة أحداث Moosyl المؤجلة
+        'process-moosyl-webhooks': {
+            'task': 'payments.tasks.process_moosyl_webhooks',
+            'schedule': 60.0,
+        },
+    }
+
+# ===============================================
+# Push outbox - صندوق إرسال الإشعارات الفورية
+# ===============================================
+
+# celery: مهمة Celery | thread: خيط خلفي داخل العملية | command: manage.py dispatch_push_outbox --loop
+PUSH_OUTBOX = {
+    'DISPATCH': os.getenv('PUSH_OUTBOX_DISPATCH', 'celery' if USE_CELERY else 'thread'),
+    'BATCH_SIZE': int(os.getenv('PUSH_OUTBOX_BATCH_SIZE', '500')),
+    'CHUNK_SIZE': 500,  # حد FCM لكل send_each
+    'CONCURRENCY': int(os.getenv('PUSH_OUTBOX_CONCURRENCY', '4')),
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+# مدة الاحتفاظ بالإشعارات - manage.py sweep_notifications (cron) أو Celery beat
+NOTIFICATION_RETENTION = {
+    'ADMIN_DAYS': 90,
+    'READ_DAYS': 30,
+    'UNREAD_DAYS': 60,
+    'BATCH_SIZE': 2000,
+}
+
+# ===============================================
+# Moosyl webhooks - صندوق الوارد
+# ===============================================
+
+# الـ webhook يحفظ الحدث ويرد فوراً، والمعالجة في payments/webhook_inbox.py
+# celery | thread | command: manage.py process_moosyl_webhooks --loop
+MOOSYL_WEBHOOK_INBOX = {
+    'DISPATCH': os.getenv('MOOSYL_WEBHOOK_DISPATCH', 'celery' if USE_CELERY else 'thread'),
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+# ===============================================
+# Task matching - إشعار العمال بالمهام الجديدة
+# ===============================================
+
+# المطابقة والإرسال خارج طلب إنشاء المهمة (tasks/matching.py)
+# celery | thread | sync: مباشرة بعد commit
+TASK_MATCHING = {
+    'DISPATCH': os.getenv('TASK_MATCHING_DISPATCH', 'celery' if USE_CELERY else 'thread'),
+    'RADIUS_KM': 30,
+    'MAX_NEARBY': 20,
+    'MAX_FALLBACK': 50,
+    'LOCATION_MAX_AGE_MINUTES': 30,
+    'INDEX_TTL_SECONDS': 60,
+    'WEIGHTS': {'distance': 0.6, 'rating': 0.25, 'recency': 0.15},
+}
+
+# ===============================================
+# Live worker locations - مخزن المواقع الحية
+# ===============================================
+
+# local: داخل العملية | redis: مشترك بين العمليات (REDIS_URL='local://' للبديل المحلي)
+LIVE_LOCATION_STORE = {
+    'BACKEND': os.getenv('LIVE_LOCATION_BACKEND', 'local'),
+    'REDIS_URL': os.getenv('LIVE_LOCATION_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/1')),
+    'FLUSH_INTERVAL_SECONDS': int(os.getenv('LIVE_LOCATION_FLUSH_INTERVAL', '60')),
+}
+
+# ===============================================
+# Reference data - الفئات والمناطق
+# ===============================================
+
+# JSON جاهز في ذاكرة كل عملية، يتجدد عند تعديل الفئات/المناطق (services/reference_cache.py)
+REFERENCE_CACHE = {
+    'MAX_AGE_SECONDS': 300,
+    'MAX_ENTRIES': 256,
+    'CLIENT_MAX_AGE_SECONDS': int(os.getenv('REFERENCE_CLIENT_MAX_AGE', '60')),
+}
+
+# ===============================================
+# Worker facets - فلاتر البحث وإحصائيات العمال
+# ===============================================
+
+# search/filters/ و stats/ من الكاش (workers/facets.py)، تُبطل بالـ signals
+# مع LocMemCache الإبطال محلي للعملية: العمليات الأخرى تنتظر CACHE_SECONDS كحد أقصى
+WORKER_FACETS = {
+    'CACHE_SECONDS': int(os.getenv('WORKER_FACETS_CACHE_SECONDS', '300')),
+    'PRICE_HISTOGRAM_BUCKETS': 10,
+}
+
+# ===============================================
+# Admin dashboard metrics - الإحصائيات المجمّعة
+# ===============================================
+
+# manage.py rollup_metrics (cron) أو Celery beat؛ اللقطة القديمة تُحدّث في الخلفية (DISPATCH)
+ADMIN_METRICS = {
+    'DISPATCH': os.getenv('ADMIN_METRICS_DISPATCH', 'celery' if USE_CELERY else 'thread'),
+    'SNAPSHOT_MAX_AGE_SECONDS': int(os.getenv('ADMIN_METRICS_MAX_AGE', '300')),
+    'ROLLUP_LOCK_SECONDS': 600,
+    'RECONCILE_DAYS': 2,
+    'BACKFILL_DAYS': 62,
+    'HOURLY_RETENTION_DAYS': 2,
+    'REPORT_CACHE_SECONDS': 60,
+}
+
+# عدّاد الرسائل غير المقروءة لكل مستخدم في الكاش (لطلبات الـ badge المتكررة)
+CHAT_UNREAD_CACHE = {
+    'ENABLED': os.getenv('CHAT_UNREAD_CACHE', 'False').lower() == 'true',
+    'TTL_SECONDS': 300,
+}
 
 GLOBAL_OTP_RATE_LIMIT = {
     'MAX_ATTEMPTS_PER_PHONE_PER_HOUR': 10,  # 10 محاولات كحد أقصى في الساعة
@@ -286,8 +415,8 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', f'Khidma Admin <{EMAIL_HOST
 MOOSYL_SECRET_KEY = os.environ.get('MOOSYL_SECRET_KEY', '')
 MOOSYL_PUBLISHABLE_KEY = os.environ.get('MOOSYL_PUBLISHABLE_KEY', '')
 
-# Moosyl API URL
-MOOSYL_BASE_URL = 'https://api.moosyl.com'
+# Moosyl API URL (محلياً: manage.py moosyl_stub_server)
+MOOSYL_BASE_URL = os.environ.get('MOOSYL_BASE_URL', 'https://api.moosyl.com')
 
 # Webhook URL (سيتم تحديثه للـ Production)
 MOOSYL_WEBHOOK_URL = os.environ.get(
@@ -298,6 +427,17 @@ MOOSYL_WEBHOOK_URL = os.environ.get(
 # Timeout settings
 MOOSYL_TIMEOUT = 30  # seconds
 
+# اتصال HTTP مشترك لكل العملية (keep-alive) + إعادة المحاولة + قاطع الدائرة - payments/moosyl_http.py
+MOOSYL_HTTP = {
+    'POOL_MAXSIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,             # أخطاء الاتصال دائماً، وأخطاء 5xx للطلبات الآمنة فقط (GET)
+    'BACKOFF_FACTOR': 0.3,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_SECONDS': 30,
+}
+
 # Currency
 MOOSYL_CURRENCY = 'MRU'  # Ouguiya
 
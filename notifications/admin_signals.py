@@ -4,7 +4,6 @@ from django.dispatch import receiver
 from django.utils import timezone
 from django.db.models import Q
 from users.models import User
-from .models import Notification, NotificationSettings
 
 
 def get_admin_users():
@@ -19,28 +18,18 @@ def create_admin_notification(notification_type, title, message, **kwargs):
     
     ✅ يتحقق من إعدادات الإشعارات قبل الإنشاء
     """
-    admins = get_admin_users()
-    notifications_created = []
+    from .utils import create_and_send_bulk_notifications
     
-    for admin in admins:
-        # ✅ التحقق من إعدادات الإشعارات
-        settings, _ = NotificationSettings.objects.get_or_create(
-            user=admin,
-            defaults={'notifications_enabled': True}
-        )
-        
-        # ✅ إنشاء الإشعار فقط إذا كانت الإشعارات مفعّلة
-        if settings.should_send_notification():
-            notification = Notification.objects.create(
-                recipient=admin,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                **kwargs
-            )
-            notifications_created.append(notification)
-    
-    return notifications_created
+    # ✅ الإعدادات في استعلام واحد + إنشاء الإشعارات دفعة واحدة
+    result = create_and_send_bulk_notifications(
+        get_admin_users(),
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        send_firebase=False,
+        **kwargs
+    )
+    return result['notifications']
 
 
 # ============================================
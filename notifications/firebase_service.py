@@ -52,6 +52,43 @@ class FirebaseNotificationService:
             return cls.initialize()
         return cls._initialized
     
+    @staticmethod
+    def build_message(token: str, title: str, body: str, data: Optional[Dict[str, str]] = None):
+        """
+        بناء رسالة FCM مع إعدادات Android و iOS
+        Build an FCM message with the platform configs used across the app
+        """
+        sound = settings.FIREBASE_NOTIFICATIONS.get('DEFAULT_SOUND', 'default')
+        return messaging.Message(
+            notification=messaging.Notification(title=title, body=body),
+            data=data or {},
+            token=token,
+            android=messaging.AndroidConfig(
+                priority='high',
+                notification=messaging.AndroidNotification(
+                    sound=sound,
+                    channel_id='default_channel'
+                )
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(sound=sound, badge=1)
+                )
+            )
+        )
+    
+    @staticmethod
+    def classify_error(exception) -> str:
+        """تحويل استثناء FCM إلى رمز خطأ (UNREGISTERED / INVALID_ARGUMENT / النص)"""
+        if exception is None:
+            return 'Unknown error'
+        error_message = str(exception)
+        if 'not-found' in error_message.lower() or 'unregistered' in error_message.lower():
+            return 'UNREGISTERED'
+        elif 'invalid-argument' in error_message.lower():
+            return 'INVALID_ARGUMENT'
+        return error_message
+    
     @classmethod
     def send_to_token(cls, token: str, title: str, body: str, data: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
@@ -62,39 +99,7 @@ class FirebaseNotificationService:
             return {'success': False, 'error': 'Firebase not available'}
         
         try:
-            # إعداد رسالة الإشعار
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # إعدادات Android
-            android_config = messaging.AndroidConfig(
-                priority='high',
-                notification=messaging.AndroidNotification(
-                    sound=settings.FIREBASE_NOTIFICATIONS.get('DEFAULT_SOUND', 'default'),
-                    channel_id='default_channel'
-                )
-            )
-            
-            # إعدادات iOS
-            apns_config = messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        sound=settings.FIREBASE_NOTIFICATIONS.get('DEFAULT_SOUND', 'default'),
-                        badge=1
-                    )
-                )
-            )
-            
-            # إنشاء الرسالة
-            message = messaging.Message(
-                notification=notification,
-                data=data or {},
-                token=token,
-                android=android_config,
-                apns=apns_config
-            )
+            message = cls.build_message(token, title, body, data)
             
             # إرسال الرسالة
             response = messaging.send(message)
@@ -132,42 +137,8 @@ class FirebaseNotificationService:
             return {'success': True, 'successful_tokens': [], 'failed_tokens': []}
         
         try:
-            # إعداد رسالة الإشعار
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # إعدادات Android
-            android_config = messaging.AndroidConfig(
-                priority='high',
-                notification=messaging.AndroidNotification(
-                    sound=settings.FIREBASE_NOTIFICATIONS.get('DEFAULT_SOUND', 'default'),
-                    channel_id='default_channel'
-                )
-            )
-            
-            # إعدادات iOS
-            apns_config = messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        sound=settings.FIREBASE_NOTIFICATIONS.get('DEFAULT_SOUND', 'default'),
-                        badge=1
-                    )
-                )
-            )
-            
             # ✅ إنشاء رسائل منفصلة لكل token (بدلاً من multicast)
-            messages = []
-            for token in tokens:
-                message = messaging.Message(
-                    notification=notification,
-                    data=data or {},
-                    token=token,
-                    android=android_config,
-                    apns=apns_config
-                )
-                messages.append(message)
+            messages = [cls.build_message(token, title, body, data) for token in tokens]
             
             # ✅ إرسال جميع الرسائل دفعة واحدة (FCM v1 compatible)
             response = messaging.send_each(messages)
@@ -181,19 +152,9 @@ class FirebaseNotificationService:
                 if result.success:
                     successful_tokens.append(token)
                 else:
-                    error_code = 'Unknown error'
-                    if result.exception:
-                        error_message = str(result.exception)
-                        if 'not-found' in error_message.lower() or 'unregistered' in error_message.lower():
-                            error_code = 'UNREGISTERED'
-                        elif 'invalid-argument' in error_message.lower():
-                            error_code = 'INVALID_ARGUMENT'
-                        else:
-                            error_code = error_message
-                    
                     failed_tokens.append({
                         'token': token,
-                        'error': error_code
+                        'error': cls.classify_error(result.exception)
                     })
             
             logger.info(f"Batch sent: {response.success_count}/{len(tokens)} successful")
@@ -0,0 +1,91 @@
+# notifications/management/commands/benchmark_push_outbox.py
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notifications.models import Notification, DeviceToken, PushOutbox
+from notifications.push_dispatcher import FakeFCMTransport, PushMessage, drain
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    مقارنة الإرسال المتزامن (إشعار بإشعار) مع صندوق الإرسال المجمّع
+    Compare per-notification synchronous sends with the batched outbox dispatcher,
+    using a fake FCM transport with fixed latency. كل البيانات تُحذف في النهاية.
+    """
+    help = 'Benchmark synchronous FCM sends vs the push outbox dispatcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notifications', type=int, default=1000)
+        parser.add_argument('--devices', type=int, default=2, help='Devices per recipient')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Fake FCM latency per call')
+        parser.add_argument('--sync-sample', type=int, default=100,
+                            help='Notifications timed for the synchronous path (extrapolated)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        User = get_user_model()
+        count = options['notifications']
+        devices = options['devices']
+        latency = options['latency_ms'] / 1000
+
+        # bulk_create: email فريد → نستخدم بريداً وهمياً لكل مستخدم
+        users = User.objects.bulk_create([
+            User(phone=f'+2229{index:07d}', email=f'bench{index}@benchmark.local',
+                 first_name='Benchmark', role='worker')
+            for index in range(count)
+        ])
+        DeviceToken.objects.bulk_create([
+            DeviceToken(user=user, token=f'bench-{user.id}-{device}', platform='android')
+            for user in users for device in range(devices)
+        ])
+        notifications = Notification.objects.bulk_create([
+            Notification(recipient=user, notification_type='new_task_available',
+                         title='Benchmark', message='Benchmark message')
+            for user in users
+        ])
+
+        # المسار القديم: استدعاء شبكة لكل إشعار داخل الطلب
+        transport = FakeFCMTransport(latency=latency)
+        sample = min(options['sync_sample'], count)
+        start = time.perf_counter()
+        for notification in notifications[:sample]:
+            tokens = DeviceToken.objects.filter(
+                user_id=notification.recipient_id, is_active=True
+            ).values_list('token', flat=True)
+            transport.send_each([
+                PushMessage(token, notification.title, notification.message, {}) for token in tokens
+            ])
+        sync_seconds = (time.perf_counter() - start) * count / max(sample, 1)
+
+        # المسار الجديد: صندوق الإرسال
+        PushOutbox.objects.bulk_create([
+            PushOutbox(notification=notification, recipient_id=notification.recipient_id,
+                       title=notification.title, body=notification.message)
+            for notification in notifications
+        ])
+        transport = FakeFCMTransport(latency=latency)
+        start = time.perf_counter()
+        stats = drain(transport=transport)
+        outbox_seconds = time.perf_counter() - start
+
+        self.stdout.write(
+            f'{count} notifications x {devices} devices, {options["latency_ms"]:.0f} ms per FCM call\n'
+            f'  synchronous : {sync_seconds:8.2f} s ({count} FCM calls, extrapolated from {sample})\n'
+            f'  outbox      : {outbox_seconds:8.2f} s ({transport.calls} FCM calls, '
+            f'{stats.get("deliveries", 0)} deliveries)\n'
+            f'  speedup     : x{sync_seconds / max(outbox_seconds, 1e-9):.1f}'
+        )
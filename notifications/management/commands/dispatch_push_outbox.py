@@ -0,0 +1,31 @@
+# notifications/management/commands/dispatch_push_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.push_dispatcher import drain
+
+
+class Command(BaseCommand):
+    """
+    إرسال الإشعارات المستحقة في صندوق الإرسال (PushOutbox)
+    Dispatch due push outbox rows (PUSH_OUTBOX['DISPATCH'] = 'command')
+    """
+    help = 'Send pending push notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=2.0)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain(batch_size=options['batch_size'])
+            if stats or not options['loop']:
+                self.stdout.write(
+                    f"✅ {stats.get('sent', 0)} sent, {stats.get('retried', 0)} retried, "
+                    f"{stats.get('failed', 0)} failed ({stats.get('deliveries', 0)} deliveries)"
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
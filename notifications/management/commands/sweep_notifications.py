@@ -0,0 +1,23 @@
+# notifications/management/commands/sweep_notifications.py
+from django.core.management.base import BaseCommand
+
+from notifications.retention import sweep_expired_notifications
+
+
+class Command(BaseCommand):
+    """
+    حذف الإشعارات المنتهية حسب سياسة الاحتفاظ (مهمة مجدولة - cron أو Celery beat)
+    Delete expired notifications for all users in bounded id-range batches
+    """
+    help = 'Delete expired notifications in batches (retention policy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Ids per DELETE batch')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        stats = sweep_expired_notifications(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(
+            f"✅ {stats['deleted']} notification(s) deleted in {stats['batches']} batch(es), "
+            f"{stats['seconds']}s"
+        )
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_alter_notification_notification_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'معلق'), ('processing', 'قيد المعالجة'), ('sent', 'مرسل'), ('failed', 'فشل')], default='pending', help_text='حالة الإرسال', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='عدد المحاولات')),
+                ('last_error', models.TextField(blank=True, help_text='آخر خطأ')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='موعد المحاولة التالية')),
+                ('claim_token', models.CharField(blank=True, default='', max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notification', models.ForeignKey(help_text='الإشعار الأصلي', on_delete=django.db.models.deletion.CASCADE, related_name='push_outbox', to='notifications.notification')),
+                ('recipient', models.ForeignKey(help_text='المستلم', on_delete=django.db.models.deletion.CASCADE, related_name='push_outbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Push Outbox',
+                'verbose_name_plural': 'Push Outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='notificatio_status_0eac0f_idx'), models.Index(fields=['claim_token'], name='notificatio_claim_t_5fbff5_idx')],
+            },
+        ),
+    ]
@@ -419,4 +419,66 @@ class NotificationLog(models.Model):
         self.status = 'failed'
         self.error_message = error_message
         self.retry_count += 1
-        self.save(update_fields=['status', 'error_message', 'retry_count'])
\ No newline at end of file
+        self.save(update_fields=['status', 'error_message', 'retry_count'])
+
+class PushOutbox(models.Model):
+    """
+    صندوق الإرسال الدائم للإشعارات الفورية - يُعالج في الخلفية
+    Durable outbox of pending pushes, drained by notifications.push_dispatcher
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'معلق'),
+        ('processing', 'قيد المعالجة'),
+        ('sent', 'مرسل'),
+        ('failed', 'فشل'),
+    ]
+    
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='push_outbox',
+        help_text="الإشعار الأصلي"
+    )
+    
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='push_outbox',
+        help_text="المستلم"
+    )
+    
+    # محتوى الرسالة كما سيُرسل لـ FCM
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        help_text="حالة الإرسال"
+    )
+    
+    attempts = models.PositiveIntegerField(default=0, help_text="عدد المحاولات")
+    last_error = models.TextField(blank=True, help_text="آخر خطأ")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="موعد المحاولة التالية")
+    
+    # حجز الدفعة من طرف عامل المعالجة
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Push Outbox"
+        verbose_name_plural = "Push Outbox"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['claim_token']),
+        ]
+    
+    def __str__(self):
+        return f"Push {self.notification_id} -> {self.recipient_id} ({self.status})"
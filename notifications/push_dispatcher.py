@@ -0,0 +1,360 @@
+# notifications/push_dispatcher.py
+"""
+معالجة صندوق الإرسال (PushOutbox) في الخلفية
+Background dispatcher for the push outbox: claims pending rows in batches,
+resolves device tokens in one query, sends FCM chunks with bounded concurrency
+and records every delivery in NotificationLog.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from core.background import BackgroundWorker
+
+from .models import PushOutbox, DeviceToken, NotificationLog
+
+logger = logging.getLogger('firebase_notifications')
+
+PushMessage = namedtuple('PushMessage', ['token', 'title', 'body', 'data'])
+PushResult = namedtuple('PushResult', ['success', 'message_id', 'error'])
+
+# أخطاء تعني أن الرمز لم يعد صالحاً (لا إعادة محاولة)
+INVALID_TOKEN_ERRORS = ('UNREGISTERED', 'INVALID_ARGUMENT')
+
+DEFAULT_PUSH_OUTBOX = {
+    'DISPATCH': 'thread',
+    'BATCH_SIZE': 500,
+    'CHUNK_SIZE': 500,
+    'CONCURRENCY': 4,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+
+def outbox_config():
+    return {**DEFAULT_PUSH_OUTBOX, **getattr(settings, 'PUSH_OUTBOX', {})}
+
+
+class PushTransportError(Exception):
+    """فشل إرسال دفعة كاملة (شبكة، FCM غير متاح...) - يُعاد المحاولة لاحقاً"""
+
+
+# ========================================
+# Transports
+# ========================================
+
+class FCMTransport:
+    """Firebase Cloud Messaging via messaging.send_each"""
+
+    def send_each(self, messages):
+        from firebase_admin import messaging
+        from .firebase_service import firebase_service
+
+        if not firebase_service.is_available():
+            raise PushTransportError('Firebase not available')
+
+        response = messaging.send_each([
+            firebase_service.build_message(message.token, message.title, message.body, message.data)
+            for message in messages
+        ])
+        return [
+            PushResult(True, result.message_id, '') if result.success
+            else PushResult(False, '', firebase_service.classify_error(result.exception))
+            for result in response.responses
+        ]
+
+
+class FakeFCMTransport:
+    """
+    Fake transport for tests and benchmarks - لا يتصل بالشبكة
+    latency: ثوانٍ لكل استدعاء send_each
+    invalid_tokens: رموز تُعاد كـ UNREGISTERED
+    token_errors: {token: error} لأخطاء أخرى لكل رمز (UNAVAILABLE, INTERNAL...)
+    fail_calls: عدد الاستدعاءات الأولى التي تفشل بالكامل
+    """
+
+    def __init__(self, latency=0.0, invalid_tokens=(), fail_calls=0, token_errors=None):
+        self.latency = latency
+        self.invalid_tokens = set(invalid_tokens)
+        self.token_errors = dict(token_errors or {})
+        self.fail_calls = fail_calls
+        self.calls = 0
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_each(self, messages):
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if call_number <= self.fail_calls:
+            raise PushTransportError('Fake transport failure')
+
+        results = []
+        for message in messages:
+            if message.token in self.invalid_tokens:
+                results.append(PushResult(False, '', 'UNREGISTERED'))
+            elif message.token in self.token_errors:
+                results.append(PushResult(False, '', self.token_errors[message.token]))
+            else:
+                results.append(PushResult(True, f'fake-{uuid.uuid4().hex[:12]}', ''))
+        with self._lock:
+            self.sent.extend(message for message, result in zip(messages, results) if result.success)
+        return results
+
+
+def get_transport():
+    return FCMTransport()
+
+
+# ========================================
+# Enqueue
+# ========================================
+
+def queue_push(notification, title, body, data=None):
+    """
+    إضافة إشعار فوري إلى صندوق الإرسال (داخل نفس معاملة إنشاء الإشعار)
+    والإرسال يبدأ بعد الـ commit
+    """
+    item = PushOutbox.objects.create(
+        notification=notification,
+        recipient_id=notification.recipient_id,
+        title=title[:200],
+        body=body,
+        data=data or {},
+    )
+    transaction.on_commit(schedule_dispatch)
+    return item
+
+
+def queue_push_many(pushes):
+    """
+    Bulk version of queue_push for [(notification, title, body, data), ...]
+    """
+    items = PushOutbox.objects.bulk_create([
+        PushOutbox(
+            notification=notification,
+            recipient_id=notification.recipient_id,
+            title=title[:200],
+            body=body,
+            data=data or {},
+        )
+        for notification, title, body, data in pushes
+    ], batch_size=500)
+    if items:
+        transaction.on_commit(schedule_dispatch)
+    return items
+
+
+def schedule_dispatch():
+    """Wake whichever dispatcher is configured (celery task / background thread)"""
+    mode = outbox_config()['DISPATCH']
+    if mode == 'celery':
+        from .tasks import dispatch_push_outbox
+        dispatch_push_outbox.delay()
+    elif mode == 'thread':
+        _background_dispatcher.wake()
+    # 'command': عملية منفصلة (manage.py dispatch_push_outbox --loop)
+
+
+_background_dispatcher = BackgroundWorker(
+    'push-outbox-dispatcher',
+    step=lambda: dispatch_pending()['claimed'],
+    idle_timeout=lambda: outbox_config()['RETRY_BACKOFF_SECONDS'],
+)
+
+
+# ========================================
+# Dispatch
+# ========================================
+
+def _claim_batch(batch_size, claim_timeout):
+    now = timezone.now()
+    claim_token = uuid.uuid4().hex
+    due = (
+        models.Q(status='pending', next_attempt_at__lte=now) |
+        models.Q(status='processing', claimed_at__lt=now - timedelta(seconds=claim_timeout))
+    )
+    ids = list(
+        PushOutbox.objects.filter(due).order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    # التحديث المشروط يضمن أن كل صف يُحجز من عامل واحد فقط
+    PushOutbox.objects.filter(due, id__in=ids).update(
+        status='processing', claim_token=claim_token, claimed_at=now
+    )
+    return list(PushOutbox.objects.filter(claim_token=claim_token, status='processing'))
+
+
+def _chunk_by_item(entries, chunk_size):
+    """تقسيم الرسائل لدفعات دون تقسيم رسائل إشعار واحد على دفعتين"""
+    chunks, current, current_size = [], [], 0
+    for item, item_entries in entries:
+        if current and current_size + len(item_entries) > chunk_size:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append((item, item_entries))
+        current_size += len(item_entries)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def dispatch_pending(transport=None, batch_size=None):
+    """
+    Send one batch of due outbox rows
+    يعيد إحصائيات: claimed / sent / failed / retried / deliveries
+    """
+    config = outbox_config()
+    transport = transport or get_transport()
+    batch_size = batch_size or config['BATCH_SIZE']
+
+    items = _claim_batch(batch_size, config['CLAIM_TIMEOUT_SECONDS'])
+    stats = {'claimed': len(items), 'sent': 0, 'failed': 0, 'retried': 0, 'deliveries': 0}
+    if not items:
+        return stats
+
+    # 1. كل رموز الأجهزة النشطة لكل المستلمين في استعلام واحد
+    tokens_by_user = defaultdict(list)
+    for device_id, user_id, token in DeviceToken.objects.filter(
+        user_id__in={item.recipient_id for item in items},
+        is_active=True,
+        notifications_enabled=True
+    ).values_list('id', 'user_id', 'token'):
+        tokens_by_user[user_id].append((device_id, token))
+
+    entries = []
+    for item in items:
+        data = {key: str(value) for key, value in (item.data or {}).items()}
+        entries.append((item, [
+            (device_id, PushMessage(token, item.title, item.body, data))
+            for device_id, token in tokens_by_user.get(item.recipient_id, [])
+        ]))
+
+    # 2. الإرسال بدفعات متوازية (عدد محدود من الخيوط، بدون وصول لقاعدة البيانات)
+    chunks = _chunk_by_item([entry for entry in entries if entry[1]], config['CHUNK_SIZE'])
+
+    def send_chunk(chunk):
+        messages = [message for _, item_entries in chunk for _, message in item_entries]
+        try:
+            return chunk, transport.send_each(messages), None
+        except Exception as e:
+            return chunk, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, config['CONCURRENCY'])) as executor:
+        outcomes = list(executor.map(send_chunk, chunks))
+
+    # 3. تسجيل النتائج
+    now = timezone.now()
+    logs, delivered_devices, invalid_devices = [], [], []
+    done_items, retry_items, failed_items = [], [], []
+
+    def retry_later(item, error):
+        item.last_error = error[:1000]
+        item.attempts += 1
+        if item.attempts >= config['MAX_ATTEMPTS']:
+            failed_items.append(item)
+        else:
+            item.next_attempt_at = now + timedelta(
+                seconds=config['RETRY_BACKOFF_SECONDS'] * 2 ** (item.attempts - 1)
+            )
+            retry_items.append(item)
+
+    for chunk, results, error in outcomes:
+        if error is not None:
+            for item, _ in chunk:
+                retry_later(item, error)
+            continue
+
+        results = iter(results)
+        for item, item_entries in chunk:
+            errors, delivered = [], False
+            for device_id, _ in item_entries:
+                result = next(results)
+                logs.append(NotificationLog(
+                    notification_id=item.notification_id,
+                    device_token_id=device_id,
+                    status='sent' if result.success else (
+                        'invalid_token' if result.error in INVALID_TOKEN_ERRORS else 'failed'
+                    ),
+                    firebase_message_id=(result.message_id or '')[:100],
+                    sent_at=now if result.success else None,
+                    error_message=result.error or '',
+                    retry_count=item.attempts,
+                ))
+                if result.success:
+                    delivered = True
+                    delivered_devices.append(device_id)
+                else:
+                    errors.append(result.error)
+                    if result.error in INVALID_TOKEN_ERRORS:
+                        invalid_devices.append(device_id)
+            # لم يصل لأي جهاز وبعض الأخطاء مؤقتة (UNAVAILABLE, INTERNAL...) → إعادة المحاولة
+            if not delivered and any(error not in INVALID_TOKEN_ERRORS for error in errors):
+                retry_later(item, '; '.join(errors))
+                continue
+            item.attempts += 1
+            item.last_error = '; '.join(errors)[:1000]
+            done_items.append(item)
+
+    done_items.extend(item for item, item_entries in entries if not item_entries)
+
+    with transaction.atomic():
+        NotificationLog.objects.bulk_create(logs, batch_size=500)
+        if delivered_devices:
+            DeviceToken.objects.filter(id__in=delivered_devices).update(
+                total_notifications_sent=models.F('total_notifications_sent') + 1,
+                last_notification_sent=now
+            )
+        if invalid_devices:
+            DeviceToken.objects.filter(id__in=invalid_devices).update(is_active=False)
+            logger.info(f"Deactivated {len(invalid_devices)} invalid tokens")
+
+        for item in done_items:
+            item.status = 'sent'
+            item.processed_at = now
+        for item in failed_items:
+            item.status = 'failed'
+            item.processed_at = now
+        for item in retry_items:
+            item.status = 'pending'
+        PushOutbox.objects.bulk_update(
+            done_items + failed_items + retry_items,
+            ['status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at'],
+            batch_size=500
+        )
+
+    stats.update({
+        'sent': len(done_items),
+        'failed': len(failed_items),
+        'retried': len(retry_items),
+        'deliveries': len(delivered_devices),
+    })
+    logger.info(
+        f"Push outbox batch: {stats['sent']} sent, {stats['retried']} retried, "
+        f"{stats['failed']} failed, {stats['deliveries']} deliveries"
+    )
+    return stats
+
+
+def drain(transport=None, batch_size=None):
+    """Dispatch batches until nothing is due - مجموع الإحصائيات"""
+    totals = defaultdict(int)
+    while True:
+        stats = dispatch_pending(transport=transport, batch_size=batch_size)
+        if not stats['claimed']:
+            return dict(totals)
+        for key, value in stats.items():
+            totals[key] += value
@@ -0,0 +1,87 @@
+# notifications/retention.py
+"""
+حذف الإشعارات المنتهية على دفعات (خارج مسار الطلبات)
+Chunked retention sweep over primary-key ranges, for all users at once.
+
+السياسة (settings.NOTIFICATION_RETENTION):
+- الأدمن: كل الإشعارات بعد ADMIN_DAYS
+- الباقي: المقروءة بعد READ_DAYS من القراءة، وغير المقروءة بعد UNREAD_DAYS
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Min, Max
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION = {
+    'ADMIN_DAYS': 90,
+    'READ_DAYS': 30,
+    'UNREAD_DAYS': 60,
+    'BATCH_SIZE': 2000,
+}
+
+
+def retention_config():
+    return {**DEFAULT_RETENTION, **getattr(settings, 'NOTIFICATION_RETENTION', {})}
+
+
+def expired_notifications_q(now=None, config=None):
+    """شرط الإشعارات المنتهية حسب دور المستلم"""
+    now = now or timezone.now()
+    config = config or retention_config()
+    is_admin = Q(recipient__role='admin')
+    return (
+        (is_admin & Q(created_at__lt=now - timedelta(days=config['ADMIN_DAYS']))) |
+        (~is_admin & Q(is_read=True, read_at__lt=now - timedelta(days=config['READ_DAYS']))) |
+        (~is_admin & Q(is_read=False, created_at__lt=now - timedelta(days=config['UNREAD_DAYS'])))
+    )
+
+
+def sweep_expired_notifications(batch_size=None, pause=0.0, now=None):
+    """
+    Delete expired notifications in bounded id ranges
+    كل دفعة في معاملة قصيرة خاصة بها؛ يعيد {deleted, batches, seconds}
+    """
+    config = retention_config()
+    batch_size = batch_size or config['BATCH_SIZE']
+    now = now or timezone.now()
+    started = time.monotonic()
+
+    # كل إشعار منتهٍ أُنشئ قبل أقصر مدة احتفاظ (القراءة تأتي بعد الإنشاء)
+    oldest_cutoff = now - timedelta(days=min(config['ADMIN_DAYS'], config['READ_DAYS'], config['UNREAD_DAYS']))
+    bounds = Notification.objects.filter(created_at__lt=oldest_cutoff).aggregate(
+        first_id=Min('id'), last_id=Max('id')
+    )
+
+    deleted = batches = 0
+    if bounds['first_id'] is not None:
+        expired = expired_notifications_q(now, config)
+        for range_start in range(bounds['first_id'], bounds['last_id'] + 1, batch_size):
+            with transaction.atomic():
+                count, _ = Notification.objects.filter(
+                    expired,
+                    id__gte=range_start,
+                    id__lt=range_start + batch_size
+                ).delete()
+            batches += 1
+            deleted += count
+            if pause:
+                time.sleep(pause)
+
+    stats = {
+        'deleted': deleted,
+        'batches': batches,
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    logger.info(
+        f"Notification retention sweep: {stats['deleted']} deleted "
+        f"in {stats['batches']} batches ({stats['seconds']}s)"
+    )
+    return stats
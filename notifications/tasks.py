@@ -0,0 +1,20 @@
+# notifications/tasks.py
+"""
+Celery tasks for notifications
+"""
+from celery import shared_task
+
+from .push_dispatcher import drain
+
+
+@shared_task(ignore_result=True)
+def dispatch_push_outbox():
+    """إرسال كل الإشعارات المستحقة في صندوق الإرسال"""
+    return drain()
+
+
+@shared_task(ignore_result=True)
+def sweep_expired_notifications():
+    """حذف الإشعارات المنتهية على دفعات"""
+    from .retention import sweep_expired_notifications as sweep
+    return sweep()
@@ -1,3 +1,164 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import DeviceToken, Notification, NotificationLog, PushOutbox
+from .push_dispatcher import FakeFCMTransport, dispatch_pending
+from .views import NotificationPagination
+
+PUSH_OUTBOX = {
+    'BATCH_SIZE': 100,
+    'CHUNK_SIZE': 100,
+    'CONCURRENCY': 1,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+
+@override_settings(PUSH_OUTBOX=PUSH_OUTBOX)
+class PushOutboxDispatchTests(TestCase):
+    """صندوق الإرسال مع FakeFCMTransport: الحجز، إعادة المحاولة، NotificationLog"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('22200001', 'pass1234', role='worker', first_name='Worker')
+        self.device = DeviceToken.objects.create(user=self.user, token='token-ok', platform='android')
+
+    def queue(self, **fields):
+        notification = Notification.objects.create(
+            recipient=self.user, notification_type='general', title='Titre', message='Message'
+        )
+        return PushOutbox.objects.create(
+            notification=notification, recipient=self.user, title='Titre', body='Message', **fields
+        )
+
+    def test_success_logs_delivery(self):
+        item = self.queue()
+        transport = FakeFCMTransport()
+
+        stats = dispatch_pending(transport=transport)
+
+        self.assertEqual((stats['sent'], stats['deliveries']), (1, 1))
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('sent', 1))
+        self.assertIsNotNone(item.processed_at)
+        log = NotificationLog.objects.get()
+        self.assertEqual((log.status, log.device_token_id), ('sent', self.device.id))
+        self.assertTrue(log.firebase_message_id.startswith('fake-'))
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.total_notifications_sent, 1)
+        self.assertEqual([message.token for message in transport.sent], ['token-ok'])
+
+    def test_invalid_token_deactivates_device(self):
+        bad_device = DeviceToken.objects.create(user=self.user, token='token-bad', platform='ios')
+        item = self.queue()
+
+        stats = dispatch_pending(transport=FakeFCMTransport(invalid_tokens={'token-bad'}))
+
+        self.assertEqual((stats['sent'], stats['deliveries']), (1, 1))
+        bad_device.refresh_from_db()
+        self.assertFalse(bad_device.is_active)
+        self.assertEqual(
+            NotificationLog.objects.get(device_token=bad_device).status, 'invalid_token'
+        )
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'sent')
+
+    def test_only_invalid_tokens_is_not_retried(self):
+        self.device.delete()
+        DeviceToken.objects.create(user=self.user, token='token-bad', platform='ios')
+        item = self.queue()
+
+        dispatch_pending(transport=FakeFCMTransport(invalid_tokens={'token-bad'}))
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'sent')
+
+    def test_chunk_exception_is_retried_with_backoff(self):
+        item = self.queue()
+        transport = FakeFCMTransport(fail_calls=2)
+
+        before = timezone.now()
+        stats = dispatch_pending(transport=transport)
+        self.assertEqual(stats['retried'], 1)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('pending', 1))
+        self.assertIn('Fake transport failure', item.last_error)
+        self.assertGreaterEqual(item.next_attempt_at, before + timedelta(seconds=30))
+
+        # لم يحن موعد المحاولة التالية بعد
+        self.assertEqual(dispatch_pending(transport=transport)['claimed'], 0)
+
+        PushOutbox.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+        dispatch_pending(transport=transport)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('pending', 2))
+        self.assertGreaterEqual(item.next_attempt_at, timezone.now() + timedelta(seconds=59))
+
+        PushOutbox.objects.filter(pk=item.pk).update(next_attempt_at=timezone.now())
+        stats = dispatch_pending(transport=transport)
+        self.assertEqual(stats['sent'], 1)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('sent', 3))
+
+    def test_transient_device_errors_are_retried(self):
+        item = self.queue()
+
+        stats = dispatch_pending(transport=FakeFCMTransport(token_errors={'token-ok': 'UNAVAILABLE'}))
+
+        self.assertEqual((stats['sent'], stats['retried']), (0, 1))
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts, item.last_error), ('pending', 1, 'UNAVAILABLE'))
+        self.assertEqual(NotificationLog.objects.get().status, 'failed')
+        self.device.refresh_from_db()
+        self.assertTrue(self.device.is_active)
+
+    def test_gives_up_after_max_attempts(self):
+        item = self.queue(attempts=PUSH_OUTBOX['MAX_ATTEMPTS'] - 1)
+
+        stats = dispatch_pending(transport=FakeFCMTransport(token_errors={'token-ok': 'INTERNAL'}))
+
+        self.assertEqual(stats['failed'], 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'failed')
+        self.assertIsNotNone(item.processed_at)
+
+    def test_stale_claim_is_reclaimed(self):
+        claimed_at = timezone.now() - timedelta(seconds=PUSH_OUTBOX['CLAIM_TIMEOUT_SECONDS'] + 1)
+        stale = self.queue(status='processing', claim_token='crashed-worker', claimed_at=claimed_at)
+        fresh = self.queue(status='processing', claim_token='live-worker', claimed_at=timezone.now())
+
+        stats = dispatch_pending(transport=FakeFCMTransport())
+
+        self.assertEqual((stats['claimed'], stats['sent']), (1, 1))
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, 'sent')
+        self.assertEqual((fresh.status, fresh.claim_token), ('processing', 'live-worker'))
+
+
+class NotificationListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('22200001', 'pass1234', role='client', first_name='Client')
+        self.limit = NotificationPagination.unpaginated_limit
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, notification_type='general', title=f'N{index}', message='...')
+            for index in range(self.limit + 5)
+        ])
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_unpaginated_list_is_capped(self):
+        response = self.api.get(reverse('notifications:list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), self.limit)
+
+    def test_paginated_list(self):
+        data = self.api.get(reverse('notifications:list') + '?page=2&page_size=50').json()
+        self.assertEqual(data['count'], self.limit + 5)
+        self.assertEqual(len(data['results']), 50)
@@ -4,10 +4,13 @@ Enhanced notification utilities with multilingual support
 """
 
 import logging
+from collections import namedtuple
+from string import Formatter
 from typing import Optional, Dict, Any
 from django.utils import timezone
 from .models import Notification, NotificationSettings
 from .firebase_service import firebase_service
+from .push_dispatcher import queue_push, queue_push_many
 
 logger = logging.getLogger('firebase_notifications')
 
@@ -163,35 +166,60 @@ NOTIFICATION_TRANSLATIONS = {
 }
 
 # ========================================
-# دالة الحصول على النص المترجم
+# الكتالوج المُجمّع: قوالب جاهزة لكل نوع ولغة
 # ========================================
 
+SUPPORTED_LANGUAGES = ('ar', 'fr', 'en')
+
+CompiledTranslation = namedtuple('CompiledTranslation', ['title', 'message', 'fields'])
+
+
+def compile_translations(catalogue):
+    """
+    تجميع القاموس مرة واحدة عند التحميل: {type: {lang: CompiledTranslation}}
+    fields = أسماء المتغيرات المطلوبة في القالب
+    """
+    formatter = Formatter()
+    compiled = {}
+    for notification_type, translations in catalogue.items():
+        title_dict = translations.get('title', {})
+        message_dict = translations.get('message', {})
+        compiled[notification_type] = {}
+        for language in SUPPORTED_LANGUAGES:
+            template = message_dict.get(language, message_dict.get('fr', ''))
+            compiled[notification_type][language] = CompiledTranslation(
+                title=title_dict.get(language, title_dict.get('fr', 'Notification')),
+                message=template,
+                fields=frozenset(
+                    field_name for _, field_name, _, _ in formatter.parse(template) if field_name
+                ),
+            )
+    return compiled
+
+
+COMPILED_TRANSLATIONS = compile_translations(NOTIFICATION_TRANSLATIONS)
+
+_UNKNOWN_TYPE = CompiledTranslation('Notification', '', frozenset())
+
+
 def get_translated_notification(notification_type: str, user_language: str, **kwargs) -> Dict[str, str]:
     """
     الحصول على العنوان والرسالة بلغة المستخدم
     """
-    translations = NOTIFICATION_TRANSLATIONS.get(notification_type, {})
-    
     # اللغة الافتراضية: الفرنسية
-    if user_language not in ['ar', 'fr', 'en']:
+    if user_language not in SUPPORTED_LANGUAGES:
         user_language = 'fr'
     
-    # الحصول على العنوان
-    title_dict = translations.get('title', {})
-    title = title_dict.get(user_language, title_dict.get('fr', 'Notification'))
-    
-    # الحصول على الرسالة
-    message_dict = translations.get('message', {})
-    message_template = message_dict.get(user_language, message_dict.get('fr', ''))
+    compiled = COMPILED_TRANSLATIONS.get(notification_type)
+    translation = compiled[user_language] if compiled else _UNKNOWN_TYPE
     
-    # تطبيق المتغيرات على النص
-    try:
-        message = message_template.format(**kwargs)
-    except KeyError:
-        message = message_template
+    # تطبيق المتغيرات على النص (القالب كما هو إذا نقص متغير)
+    message = translation.message
+    if translation.fields and translation.fields <= kwargs.keys():
+        message = message.format(**kwargs)
     
     return {
-        'title': title,
+        'title': translation.title,
         'message': message
     }
 
@@ -256,8 +284,9 @@ def create_and_send_notification(
         
         logger.info(f"Database notification created: {notification.id} (lang: {user_language})")
         
-        # 5. إرسال عبر Firebase
-        firebase_result = None
+        # 5. إضافة الإرسال عبر Firebase إلى صندوق الإرسال
+        # (لا اتصال بالشبكة هنا - يُرسل في الخلفية بعد الـ commit)
+        push_queued = False
         if send_firebase and firebase_service.is_available():
             data = {
                 'notification_id': str(notification.id),
@@ -273,25 +302,16 @@ def create_and_send_notification(
                     'task_title': related_task.title[:50]
                 })
             
-            firebase_result = firebase_service.send_to_user(
-                user=recipient_user,
-                title=final_title,
-                body=final_message,
-                data=data
-            )
-            
-            if firebase_result.get('success'):
-                logger.info(f"Firebase notification sent (lang: {user_language})")
-            else:
-                logger.error(f"Firebase sending failed: {firebase_result.get('error')}")
+            queue_push(notification, final_title, final_message, data)
+            push_queued = True
         
         return {
             'success': True,
             'notification_id': notification.id,
-            'firebase_sent': firebase_result.get('success', False) if firebase_result else False,
-            'firebase_result': firebase_result,
+            'firebase_sent': False,
+            'push_queued': push_queued,
             'language': user_language,
-            'message': 'Notification created and sent successfully'
+            'message': 'Notification created and queued successfully'
         }
         
     except Exception as e:
@@ -304,6 +324,116 @@ def create_and_send_notification(
         }
 
 
+def _settings_for_recipients(recipients):
+    """
+    إعدادات الإشعارات لكل المستلمين: استعلام واحد + bulk_create للمفقود
+    {user_id: NotificationSettings}
+    """
+    user_ids = [user.id for user in recipients]
+    settings_by_user = {
+        settings.user_id: settings
+        for settings in NotificationSettings.objects.filter(user_id__in=user_ids)
+    }
+    missing = [
+        NotificationSettings(user_id=user_id, notifications_enabled=True)
+        for user_id in dict.fromkeys(user_ids) if user_id not in settings_by_user
+    ]
+    if missing:
+        NotificationSettings.objects.bulk_create(missing, ignore_conflicts=True)
+        settings_by_user.update((settings.user_id, settings) for settings in missing)
+    return settings_by_user
+
+
+def create_and_send_bulk_notifications(
+    recipients,
+    notification_type: str,
+    title: str = None,
+    message: str = None,
+    related_task=None,
+    related_application=None,
+    send_firebase: bool = True,
+    **format_kwargs
+) -> Dict[str, Any]:
+    """
+    نفس create_and_send_notification لعدد كبير من المستلمين دفعة واحدة:
+    - الإعدادات في استعلام واحد
+    - الترجمة مرة واحدة لكل لغة
+    - bulk_create للإشعارات ولصندوق الإرسال (رموز الأجهزة ودفعات FCM في push_dispatcher)
+    """
+    recipients = list(recipients)
+    if not recipients:
+        return {'success': True, 'created': 0, 'push_queued': 0, 'notifications': []}
+    
+    try:
+        settings_by_user = _settings_for_recipients(recipients)
+        enabled = [
+            user for user in recipients
+            if settings_by_user[user.id].should_send_notification()
+        ]
+        
+        # الترجمة مرة واحدة لكل لغة
+        texts = {}
+        for user in enabled:
+            language = getattr(user, 'preferred_language', 'fr')
+            if language not in texts:
+                translated = get_translated_notification(notification_type, language, **format_kwargs)
+                texts[language] = (title or translated['title'], message or translated['message'])
+        
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient=user,
+                notification_type=notification_type,
+                title=texts[getattr(user, 'preferred_language', 'fr')][0],
+                message=texts[getattr(user, 'preferred_language', 'fr')][1],
+                related_task=related_task,
+                related_application=related_application
+            )
+            for user in enabled
+        ], batch_size=500)
+        
+        push_queued = 0
+        if send_firebase and notifications and firebase_service.is_available():
+            timestamp = timezone.now().isoformat()
+            pushes = []
+            for notification in notifications:
+                user = notification.recipient
+                data = {
+                    'notification_id': str(notification.id),
+                    'notification_type': notification_type,
+                    'user_role': user.role,
+                    'language': getattr(user, 'preferred_language', 'fr'),
+                    'timestamp': timestamp,
+                }
+                if related_task:
+                    data.update({
+                        'task_id': str(related_task.id),
+                        'task_title': related_task.title[:50]
+                    })
+                pushes.append((notification, notification.title, notification.message, data))
+            push_queued = len(queue_push_many(pushes))
+        
+        logger.info(
+            f"Bulk {notification_type}: {len(notifications)}/{len(recipients)} created, "
+            f"{push_queued} queued for push"
+        )
+        return {
+            'success': True,
+            'created': len(notifications),
+            'push_queued': push_queued,
+            'notifications': notifications,
+        }
+        
+    except Exception as e:
+        logger.error(f"Error creating bulk notifications: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'created': 0,
+            'push_queued': 0,
+            'notifications': [],
+        }
+
+
 # ========================================
 # دوال محددة لكل نوع إشعار - محسّنة
 # ========================================
@@ -442,19 +572,28 @@ def notify_service_cancelled(client_user, worker_user, task, reason=""):
 # ========================================
 
 def bulk_notify_workers(worker_users, task):
-    """إشعار مجموعة من العمال بمهمة جديدة"""
-    results = []
+    """إشعار مجموعة من العمال بمهمة جديدة (دفعة واحدة)"""
+    worker_users = list(worker_users)
+    result = create_and_send_bulk_notifications(
+        worker_users,
+        notification_type='new_task_available',
+        related_task=task,
+        title=task.title,
+        budget=task.budget
+    )
     
-    for worker_user in worker_users:
-        result = notify_new_task_available(worker_user, task)
-        results.append({
-            'worker_id': worker_user.id,
-            'worker_phone': worker_user.phone,
-            'success': result['success'],
-            'notification_id': result.get('notification_id'),
-            'firebase_sent': result.get('firebase_sent', False),
-            'language': result.get('language', 'fr')
-        })
+    notified = {
+        notification.recipient_id: notification
+        for notification in result['notifications']
+    }
+    results = [{
+        'worker_id': worker_user.id,
+        'worker_phone': worker_user.phone,
+        'success': result['success'],
+        'notification_id': notified[worker_user.id].id if worker_user.id in notified else None,
+        'push_queued': result['push_queued'] > 0 and worker_user.id in notified,
+        'language': getattr(worker_user, 'preferred_language', 'fr')
+    } for worker_user in worker_users]
     
     successful_notifications = len([r for r in results if r['success']])
     logger.info(f"Bulk notification sent to {successful_notifications}/{len(worker_users)} workers")
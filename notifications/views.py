@@ -3,6 +3,7 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError, PermissionDenied, NotFound
+from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count
 from django.utils import timezone
@@ -17,76 +18,73 @@ from .serializers import (
     NotificationCreateSerializer
 )
 
-# ✅ إضافة هذه الدالة بعد imports وقبل auto_cleanup_user_notifications
-def translate_notification_for_user(notification, user):
+def _display_name(user):
+    return user.get_full_name() or user.phone
+
+
+def translate_notifications(notifications, user):
     """
-    ترجمة الإشعار حسب لغة المستخدم
-    Translate notification based on user's preferred language
+    ترجمة مجموعة إشعارات (صفحة واحدة) حسب لغة المستخدم
+    related_task/assigned_worker/client يجب أن تكون محمّلة مسبقاً (select_related)
     """
     from .utils import get_translated_notification
     
     user_language = getattr(user, 'preferred_language', 'fr')
     
-    # استخراج البيانات من الإشعار
-    format_kwargs = {}
-    
-    if notification.related_task:
-        format_kwargs['title'] = notification.related_task.title
-        format_kwargs['budget'] = str(notification.related_task.budget)
+    # نفس المهمة تتكرر كثيراً في صفحة واحدة
+    kwargs_by_task = {}
+    for notification in notifications:
+        task = notification.related_task
+        format_kwargs = {}
+        if task:
+            if task.id not in kwargs_by_task:
+                task_kwargs = {'title': task.title, 'budget': str(task.budget)}
+                # إضافة اسم العامل / العميل إذا كان موجود
+                if task.assigned_worker:
+                    task_kwargs['worker_name'] = _display_name(task.assigned_worker)
+                if task.client:
+                    task_kwargs['client_name'] = _display_name(task.client)
+                kwargs_by_task[task.id] = task_kwargs
+            format_kwargs = kwargs_by_task[task.id]
         
-        # إضافة اسم العامل إذا كان موجود
-        if notification.related_task.assigned_worker:
-            worker = notification.related_task.assigned_worker
-            format_kwargs['worker_name'] = worker.get_full_name() or worker.phone
+        translated = get_translated_notification(
+            notification.notification_type,
+            user_language,
+            **format_kwargs
+        )
         
-        # إضافة اسم العميل إذا كان موجود
-        if notification.related_task.client:
-            client = notification.related_task.client
-            format_kwargs['client_name'] = client.get_full_name() or client.phone
-    
-    # الحصول على النص المترجم
-    translated = get_translated_notification(
-        notification.notification_type,
-        user_language,
-        **format_kwargs
-    )
-    
-    # تحديث النص في الإشعار (فقط للعرض، بدون حفظ)
-    notification.title = translated['title']
-    notification.message = translated['message']
+        # تحديث النص في الإشعار (فقط للعرض، بدون حفظ)
+        notification.title = translated['title']
+        notification.message = translated['message']
     
+    return notifications
+
+
+def translate_notification_for_user(notification, user):
+    """
+    ترجمة الإشعار حسب لغة المستخدم
+    Translate notification based on user's preferred language
+    """
+    translate_notifications([notification], user)
     return notification
-def auto_cleanup_user_notifications(user):
+
+
+class NotificationPagination(PageNumberPagination):
     """
-    تنظيف تلقائي لإشعارات المستخدم القديمة
-    يعمل في الخلفية بدون تأثير على الأداء
+    ترقيم الإشعارات - يُفعّل فقط عند تمرير page أو page_size
+    بدونهما تبقى الاستجابة قائمة (نفس الشكل للعملاء الحاليين)
+    لكن محدودة بأحدث unpaginated_limit إشعار بدل كل السجل
     """
-    now = timezone.now()
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    unpaginated_limit = 100
     
-    # تحديد المدد حسب دور المستخدم
-    if user.role == 'admin':
-        # إشعارات الأدمن: 90 يوم
-        cutoff_date = now - timedelta(days=90)
-        Notification.objects.filter(
-            recipient=user,
-            created_at__lt=cutoff_date
-        ).delete()
-    else:
-        # إشعارات مقروءة: 30 يوم
-        read_cutoff = now - timedelta(days=30)
-        Notification.objects.filter(
-            recipient=user,
-            is_read=True,
-            read_at__lt=read_cutoff
-        ).delete()
-        
-        # إشعارات غير مقروءة: 60 يوم
-        unread_cutoff = now - timedelta(days=60)
-        Notification.objects.filter(
-            recipient=user,
-            is_read=False,
-            created_at__lt=unread_cutoff
-        ).delete()
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params and \
+                self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
 
 
 class NotificationListView(generics.ListAPIView):
@@ -96,6 +94,7 @@ class NotificationListView(generics.ListAPIView):
     """
     serializer_class = NotificationListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['notification_type', 'is_read']
     
@@ -103,13 +102,11 @@ class NotificationListView(generics.ListAPIView):
         """الحصول على إشعارات المستخدم الحالي فقط"""
         user = self.request.user
         
-        # ✨ تنظيف تلقائي
-        auto_cleanup_user_notifications(user)
-        
         queryset = Notification.objects.filter(
             recipient=user
         ).select_related(
-            'related_task',
+            'related_task__assigned_worker',
+            'related_task__client',
             'related_application',
             'recipient'
         ).order_by('-created_at')
@@ -145,17 +142,17 @@ class NotificationListView(generics.ListAPIView):
         """
         queryset = self.filter_queryset(self.get_queryset())
         
-        # ✅ ترجمة كل إشعار حسب لغة المستخدم
-        notifications_list = list(queryset)
-        for notification in notifications_list:
-            translate_notification_for_user(notification, request.user)
-        
-        # معالجة pagination
-        page = self.paginate_queryset(notifications_list)
+        # ✅ ترجمة الصفحة الحالية فقط حسب لغة المستخدم
+        page = self.paginate_queryset(queryset)
         if page is not None:
+            translate_notifications(page, request.user)
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
+        # ✅ بدون ترقيم: أحدث الإشعارات فقط (الترتيب -created_at)
+        notifications_list = translate_notifications(
+            list(queryset[:self.paginator.unpaginated_limit]), request.user
+        )
         serializer = self.get_serializer(notifications_list, many=True)
         return Response(serializer.data)
 
@@ -170,7 +167,9 @@ class NotificationDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         """التأكد من أن المستخدم يملك الإشعار"""
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related(
+            'related_task__assigned_worker', 'related_task__client'
+        )
     
     def retrieve(self, request, *args, **kwargs):
         """عرض الإشعار وتحديده كمقروء تلقائياً"""
@@ -338,7 +337,6 @@ class NotificationStatsView(generics.RetrieveAPIView):
     def get_object(self):
         """حساب إحصائيات الإشعارات"""
         user = self.request.user
-        auto_cleanup_user_notifications(user)
         notifications = Notification.objects.filter(recipient=user)
         
         # إحصائيات عامة
@@ -0,0 +1,85 @@
+# payments/accounting.py
+"""
+احتساب المهام في العدادات (مجاني / حزمة)
+Task accounting: every increment is a conditional UPDATE with F() expressions,
+so concurrent accepts can neither lose an update nor go over a limit,
+and each task is charged exactly once (ServiceRequest.counters_charged_at).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import TaskBundle, UserTaskCounter
+from .segments import FREE_TASKS_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+def sync_active_bundle(user_id, stale=None):
+    """
+    إعادة حساب UserTaskCounter.active_bundle (الحزمة النشطة الأحدث) في UPDATE واحد
+    stale: شرط إضافي (Q) لتحديث العداد فقط إذا كان المرجع قديماً
+    """
+    counters = UserTaskCounter.objects.filter(user_id=user_id)
+    if stale is not None:
+        counters = counters.filter(stale)
+    return counters.update(active_bundle=Subquery(
+        TaskBundle.objects.active().filter(user_id=OuterRef('user_id')).values('pk')[:1]
+    ))
+
+
+def charge_user(user_id):
+    """
+    احتساب مهمة واحدة للمستخدم:
+    1. من الحزمة النشطة: UPDATE ... WHERE tasks_used < tasks_included
+    2. وإلا من المجاني: UPDATE ... WHERE free_tasks_used < 5
+    يعيد 'bundle' / 'free' / None (يحتاج اشتراك)
+    """
+    now = timezone.now()
+    bundle = TaskBundle.objects.active().filter(
+        pk__in=UserTaskCounter.objects.filter(user_id=user_id).values('active_bundle_id')
+    )
+    if bundle.filter(tasks_used__lt=F('tasks_included')).update(tasks_used=F('tasks_used') + 1):
+        # اكتملت الحزمة؟ → تعطيلها ونقل المرجع لحزمة أخرى (أو NULL)
+        if bundle.filter(tasks_used__gte=F('tasks_included')).update(is_active=False, completed_at=now):
+            sync_active_bundle(user_id)
+        return 'bundle'
+
+    counters = UserTaskCounter.objects.filter(user_id=user_id, free_tasks_used__lt=FREE_TASKS_LIMIT)
+    if counters.update(free_tasks_used=F('free_tasks_used') + 1, updated_at=now):
+        return 'free'
+
+    # أول مهمة لمستخدم بدون عداد
+    _, created = UserTaskCounter.objects.get_or_create(user_id=user_id, defaults={'free_tasks_used': 1})
+    return 'free' if created else None
+
+
+def charge_task(task):
+    """
+    احتساب مهمة مقبولة للعميل والعامل - مرة واحدة فقط لكل مهمة
+    (التحديث المشروط على counters_charged_at يلتقط انتقال المهمة إلى active مرة واحدة
+    حتى مع الحفظ المتكرر أو القبول المتزامن)
+    يعيد {'client': ..., 'worker': ...} أو None إذا احتُسبت من قبل
+    """
+    from tasks.models import ServiceRequest
+
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = ServiceRequest.objects.filter(
+            pk=task.pk, counters_charged_at__isnull=True
+        ).update(counters_charged_at=now)
+        if not claimed:
+            return None
+        task.counters_charged_at = now
+        charged = {
+            'client': charge_user(task.client_id),
+            'worker': charge_user(task.assigned_worker_id),
+        }
+
+    for role, source in charged.items():
+        if source is None:
+            logger.warning(f"Task #{task.pk}: {role} has no free tasks or bundle left")
+    logger.info(f"Task #{task.pk} charged: client={charged['client']}, worker={charged['worker']}")
+    return charged
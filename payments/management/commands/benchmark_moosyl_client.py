@@ -0,0 +1,61 @@
+# payments/management/commands/benchmark_moosyl_client.py
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from payments.moosyl_http import MoosylHTTP, http_config
+from payments.moosyl_stub import stub_server
+from payments.utils import get_moosyl_client
+
+
+class Command(BaseCommand):
+    """
+    مقارنة اتصال جديد لكل طلب (requests.post) مع الاتصال المشترك (MoosylHTTP)
+    Compare a fresh connection per call with the pooled keep-alive session,
+    against the local stub with a simulated per-connection handshake.
+    """
+    help = 'Benchmark fresh connections vs the pooled Moosyl session'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--handshake-ms', type=float, default=40.0, help='Simulated TLS handshake')
+        parser.add_argument('--latency-ms', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        payload = {'amount': 5, 'transactionId': 'bench'}
+        headers = {'Authorization': 'sk_bench'}
+
+        with stub_server(latency=options['latency_ms'] / 1000,
+                         handshake=options['handshake_ms'] / 1000) as server:
+            url = f"{server.base_url}/payment-request"
+
+            started = time.perf_counter()
+            for _ in range(count):
+                requests.post(url, json=payload, headers=headers, timeout=10)
+            fresh_seconds = time.perf_counter() - started
+            fresh_connections = server.connections
+
+            http = MoosylHTTP(http_config())
+            started = time.perf_counter()
+            for _ in range(count):
+                http.request('POST', url, 'payment-request', json=payload, headers=headers)
+            pooled_seconds = time.perf_counter() - started
+            pooled_connections = server.connections - fresh_connections
+
+            # نفس المسار عبر MoosylAPI.create_payment_request
+            with override_settings(MOOSYL_BASE_URL=server.base_url,
+                                   MOOSYL_SECRET_KEY='sk_bench', MOOSYL_PUBLISHABLE_KEY='pk_bench'):
+                result = get_moosyl_client().create_payment_request(5, 'bench-client')
+
+        self.stdout.write(
+            f"fresh connection: {fresh_seconds * 1000 / count:.1f} ms/request ({fresh_connections} connections)"
+        )
+        self.stdout.write(
+            f"pooled session:   {pooled_seconds * 1000 / count:.1f} ms/request ({pooled_connections} connections)"
+        )
+        self.stdout.write(f"speedup: {fresh_seconds / pooled_seconds:.1f}x")
+        self.stdout.write(f"latency histogram: {http.stats()['latency_ms']['payment-request']}")
+        self.stdout.write(f"MoosylAPI via stub: success={result['success']}")
@@ -0,0 +1,35 @@
+# payments/management/commands/moosyl_stub_server.py
+from django.core.management.base import BaseCommand
+
+from payments.moosyl_stub import MoosylStubServer
+
+
+class Command(BaseCommand):
+    """
+    تشغيل خادم Moosyl وهمي محلياً
+    Run the local Moosyl stub (export MOOSYL_BASE_URL=http://127.0.0.1:<port>)
+    """
+    help = 'Run a local stub of the Moosyl payment API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0.0)
+        parser.add_argument('--handshake-ms', type=float, default=0.0, help='Delay per new connection')
+        parser.add_argument('--fail-requests', type=int, default=0, help='First N requests return 503')
+
+    def handle(self, *args, **options):
+        server = MoosylStubServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency_ms'] / 1000,
+            handshake=options['handshake_ms'] / 1000,
+            fail_requests=options['fail_requests'],
+        )
+        self.stdout.write(f"✅ Moosyl stub on {server.base_url} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,31 @@
+# payments/management/commands/process_moosyl_webhooks.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhook_inbox import drain
+
+
+class Command(BaseCommand):
+    """
+    معالجة أحداث Moosyl المستحقة في صندوق الوارد (MoosylWebhookEvent)
+    Process due webhook events (MOOSYL_WEBHOOK_INBOX['DISPATCH'] = 'command')
+    """
+    help = 'Process pending Moosyl webhook events from the inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling every --interval seconds')
+        parser.add_argument('--interval', type=float, default=2.0)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain(batch_size=options['batch_size'])
+            if stats or not options['loop']:
+                self.stdout.write(
+                    f"✅ {stats.get('processed', 0)} processed, {stats.get('ignored', 0)} ignored, "
+                    f"{stats.get('retried', 0)} retried, {stats.get('failed', 0)} failed"
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
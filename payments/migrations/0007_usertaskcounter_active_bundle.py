@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_active_bundle(apps, schema_editor):
+    """الحزمة النشطة المدفوعة الأحدث لكل عداد"""
+    UserTaskCounter = apps.get_model('payments', 'UserTaskCounter')
+    TaskBundle = apps.get_model('payments', 'TaskBundle')
+    UserTaskCounter.objects.update(active_bundle=Subquery(
+        TaskBundle.objects.filter(
+            user_id=OuterRef('user_id'),
+            is_active=True,
+            moosyl_payment_status='completed'
+        ).order_by('-purchased_at').values('pk')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_migrate_old_counter_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertaskcounter',
+            name='active_bundle',
+            field=models.ForeignKey(blank=True, help_text='الحزمة النشطة المدفوعة الحالية (إن وجدت)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='payments.taskbundle'),
+        ),
+        migrations.RunPython(backfill_active_bundle, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_usertaskcounter_active_bundle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoosylWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_key', models.CharField(help_text='event_type:transaction_id', max_length=300, unique=True)),
+                ('event_type', models.CharField(max_length=50)),
+                ('transaction_id', models.CharField(help_text='معرف المعاملة من Moosyl', max_length=255)),
+                ('our_transaction_id', models.CharField(blank=True, help_text='معرفنا', max_length=255)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'معلق'), ('processing', 'قيد المعالجة'), ('processed', 'تمت المعالجة'), ('ignored', 'متجاهل'), ('failed', 'فشل')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim_token', models.CharField(blank=True, default='', max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('duplicates', models.PositiveIntegerField(default=0, help_text='عدد مرات إعادة الإرسال من Moosyl')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('bundle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhook_events', to='payments.taskbundle')),
+            ],
+            options={
+                'verbose_name': 'Moosyl webhook',
+                'verbose_name_plural': 'Moosyl webhooks',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='payments_mo_status_efeb7d_idx'), models.Index(fields=['claim_token'], name='payments_mo_claim_t_b444f7_idx')],
+            },
+        ),
+    ]
@@ -6,6 +6,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class UserTaskCounter(models.Model):
@@ -35,6 +36,16 @@ class UserTaskCounter(models.Model):
         help_text="عدد مرات شراء الحزم (للإحصائيات)"
     )
     
+    # ✅ الحزمة النشطة الحالية (denormalized - تُحدّث عند تفعيل/استنفاد الحزمة في payments/signals.py)
+    active_bundle = models.ForeignKey(
+        'TaskBundle',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="الحزمة النشطة المدفوعة الحالية (إن وجدت)"
+    )
+    
     # تواريخ
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -47,13 +58,39 @@ class UserTaskCounter(models.Model):
     def __str__(self):
         return f"{self.user.phone} - {self.free_tasks_used}/5 مجانية - {self.total_subscriptions} اشتراكات"
     
+    @classmethod
+    def for_user(cls, user):
+        """get_or_create مع الحزمة النشطة في نفس الاستعلام"""
+        counter, created = cls.objects.select_related('active_bundle').get_or_create(user=user)
+        counter.user = user  # نفس المستخدم - بدون استعلام إضافي عند counter.user
+        return counter, created
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if self.active_bundle_id is None:
+                # عداد جديد لمستخدم لديه حزمة مسبقاً
+                self.active_bundle = TaskBundle.objects.active_for(self.user_id).first()
+        elif kwargs.get('update_fields') is None:
+            # active_bundle يُكتب فقط من payments/signals.py (لا نعيد كتابة قيمة قديمة من الذاكرة)
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_bundle'
+            ]
+        super().save(*args, **kwargs)
+    
     def get_active_bundle(self):
-        """الحصول على الحزمة النشطة الحالية"""
-        return TaskBundle.objects.filter(
-            user=self.user,
-            is_active=True,
-            moosyl_payment_status='completed'
-        ).first()
+        """
+        الحصول على الحزمة النشطة الحالية
+        من المرجع active_bundle (بدون استعلام إذا جُلب بـ select_related، وإلا استعلام واحد
+        يُحفظ في الكائن) - كل الخصائص أدناه تستخدم نفس الكائن
+        """
+        if self.active_bundle_id is None:
+            return None
+        bundle = self.active_bundle
+        # الحزمة قد تُستنفد أو تُعطّل بعد تحميل العداد
+        if bundle is None or not bundle.is_usable:
+            return None
+        return bundle
     
     @property
     def current_limit(self):
@@ -101,39 +138,40 @@ class UserTaskCounter(models.Model):
     
     def increment_counter(self, task_id):
         """
-        زيادة العداد (تُستدعى من Signal)
+        زيادة العداد بتحديث ذري (payments/accounting.py)
         
         المنطق:
-        1. إذا كان في الفترة المجانية → زيادة free_tasks_used
-        2. إذا كان لديه حزمة نشطة → زيادة tasks_used في الحزمة
+        1. إذا كان لديه حزمة نشطة → زيادة tasks_used في الحزمة
+        2. إذا كان في الفترة المجانية → زيادة free_tasks_used
         """
-        active_bundle = self.get_active_bundle()
-        
-        if active_bundle and not active_bundle.is_exhausted:
-            # لديه حزمة نشطة → استخدم منها
-            success = active_bundle.increment_usage()
-            if success:
-                print(f"✅ Bundle usage increased: {self.user.phone} - Task #{task_id} - {active_bundle.tasks_used}/{active_bundle.tasks_included}")
-            return success
-        
-        elif self.free_tasks_used < 5:
-            # لا يزال في الفترة المجانية
-            self.free_tasks_used += 1
-            self.save()
-            print(f"✅ Free tasks increased: {self.user.phone} - Task #{task_id} - {self.free_tasks_used}/5")
-            return True
+        from .accounting import charge_user
         
+        source = charge_user(self.user_id)
+        self.refresh_from_db(fields=['free_tasks_used', 'active_bundle'])
+        if source:
+            print(f"✅ Counter increased ({source}): user #{self.user_id} - Task #{task_id}")
         else:
-            # لا يمكن الزيادة (يحتاج اشتراك)
-            print(f"❌ Cannot increment: {self.user.phone} needs subscription")
-            return False
+            print(f"❌ Cannot increment: user #{self.user_id} needs subscription")
+        return source is not None
+    
+
+class TaskBundleQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True, moosyl_payment_status='completed')
     
+    def active_for(self, user_id):
+        """الحزم النشطة المدفوعة للمستخدم (الأحدث أولاً)"""
+        return self.active().filter(user_id=user_id)
+
+
 class TaskBundle(models.Model):
     """
     حزمة مهام مدفوعة (8 مهام بـ 5 أوقيات)
     يتم إنشاء حزمة جديدة عند كل عملية شراء عبر Moosyl
     """
     
+    objects = TaskBundleQuerySet.as_manager()
+    
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -225,6 +263,11 @@ class TaskBundle(models.Model):
         """عدد المهام المتبقية في الحزمة"""
         return max(0, self.tasks_included - self.tasks_used)
     
+    @property
+    def is_usable(self):
+        """نشطة ومدفوعة (نفس شرط active())"""
+        return self.is_active and self.moosyl_payment_status == 'completed'
+    
     def increment_usage(self):
         """زيادة عداد الاستخدام"""
         if self.tasks_used < self.tasks_included:
@@ -305,4 +348,58 @@ class PlatformSubscription(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user.phone} - {self.amount} MRU - {self.status}"
\ No newline at end of file
+        return f"{self.user.phone} - {self.amount} MRU - {self.status}"
+
+
+class MoosylWebhookEvent(models.Model):
+    """
+    صندوق الوارد لأحداث Moosyl - يُحفظ الحدث فوراً ويُعالج في الخلفية
+    Durable webhook inbox, processed by payments.webhook_inbox
+    (event_key فريد → إعادة إرسال نفس الحدث من Moosyl لا تُعالج مرتين)
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'معلق'),
+        ('processing', 'قيد المعالجة'),
+        ('processed', 'تمت المعالجة'),
+        ('ignored', 'متجاهل'),
+        ('failed', 'فشل'),
+    ]
+    
+    event_key = models.CharField(max_length=300, unique=True, help_text="event_type:transaction_id")
+    event_type = models.CharField(max_length=50)
+    transaction_id = models.CharField(max_length=255, help_text="معرف المعاملة من Moosyl")
+    our_transaction_id = models.CharField(max_length=255, blank=True, help_text="معرفنا")
+    payload = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    
+    # حجز الدفعة من طرف عامل المعالجة
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    bundle = models.ForeignKey(
+        TaskBundle,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='webhook_events'
+    )
+    duplicates = models.PositiveIntegerField(default=0, help_text="عدد مرات إعادة الإرسال من Moosyl")
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Moosyl webhook"
+        verbose_name_plural = "Moosyl webhooks"
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['claim_token']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_key} ({self.status})"
@@ -0,0 +1,205 @@
+# payments/moosyl_http.py
+"""
+اتصال HTTP مشترك مع Moosyl
+Process-wide requests.Session for the payment gateway: pooled keep-alive
+connections (no TLS handshake per purchase), urllib3 retries with backoff,
+a circuit breaker and per-endpoint latency histograms.
+"""
+import bisect
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOOSYL_HTTP = {
+    'POOL_MAXSIZE': 10,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    'CIRCUIT_RESET_SECONDS': 30,
+}
+
+# حدود فئات المدة بالميلي ثانية
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def http_config():
+    return {**DEFAULT_MOOSYL_HTTP, **getattr(settings, 'MOOSYL_HTTP', {})}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Moosyl معطل مؤقتاً (فشل متتالٍ) - لا نرسل الطلب"""
+
+
+# ========================================
+# Circuit breaker
+# ========================================
+
+class CircuitBreaker:
+    """
+    closed → open بعد failure_threshold فشل متتالٍ
+    open → half_open بعد reset_seconds (طلب تجريبي واحد)
+    half_open → closed عند النجاح، أو open من جديد عند الفشل
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half_open' and self._trial_running):
+                raise CircuitOpenError('Moosyl circuit open - gateway temporarily unavailable')
+            if state == 'half_open':
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Moosyl circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+# ========================================
+# Latency histograms
+# ========================================
+
+class LatencyHistogram:
+    """عدد الطلبات لكل فئة مدة + المجموع (Prometheus-style buckets)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, milliseconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, milliseconds)] += 1
+            self.total_ms += milliseconds
+
+    def snapshot(self):
+        with self._lock:
+            count = sum(self.counts)
+            return {
+                'count': count,
+                'avg_ms': round(self.total_ms / count, 1) if count else 0,
+                'buckets': {
+                    **{f'le_{bound}': value for bound, value in zip(self.buckets, self.counts)},
+                    'inf': self.counts[-1],
+                },
+            }
+
+
+# ========================================
+# Client
+# ========================================
+
+class MoosylHTTP:
+    """Session + retries + circuit breaker + histograms (نسخة واحدة لكل عملية)"""
+
+    def __init__(self, config=None):
+        self.config = config or http_config()
+        self.session = self._build_session()
+        self.breaker = CircuitBreaker(
+            self.config['CIRCUIT_FAILURE_THRESHOLD'], self.config['CIRCUIT_RESET_SECONDS']
+        )
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.config['RETRIES'],
+            connect=self.config['RETRIES'],
+            read=self.config['RETRIES'],
+            status=self.config['RETRIES'],
+            backoff_factor=self.config['BACKOFF_FACTOR'],
+            status_forcelist=(502, 503, 504),
+            # أخطاء القراءة/5xx تُعاد فقط للطلبات الآمنة؛ POST يُعاد فقط إذا فشل الاتصال نفسه
+            allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.config['POOL_MAXSIZE'], max_retries=retry
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _histogram(self, endpoint):
+        with self._lock:
+            return self.histograms.setdefault(endpoint, LatencyHistogram())
+
+    def request(self, method, url, endpoint, **kwargs):
+        """
+        endpoint: اسم قصير للإحصائيات (payment-request ...)
+        يرفع CircuitOpenError أو أخطاء requests؛ 5xx تُحسب فشلاً في قاطع الدائرة
+        """
+        self.breaker.before_call()
+        kwargs.setdefault('timeout', (self.config['CONNECT_TIMEOUT'], self.config['READ_TIMEOUT']))
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._histogram(endpoint).observe((time.perf_counter() - started) * 1000)
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def stats(self):
+        return {
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'latency_ms': {endpoint: histogram.snapshot() for endpoint, histogram in self.histograms.items()},
+        }
+
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def get_http():
+    """MoosylHTTP المشترك للعملية (يُعاد بناؤه إذا تغيّر MOOSYL_HTTP)"""
+    global _http
+    config = http_config()
+    with _http_lock:
+        if _http is None or _http.config != config:
+            _http = MoosylHTTP(config)
+    return _http
@@ -0,0 +1,90 @@
+# payments/moosyl_stub.py
+"""
+خادم Moosyl وهمي محلي للاختبارات والقياس
+Local stub of the Moosyl API (POST /payment-request), HTTP/1.1 keep-alive.
+
+- latency: ثوانٍ لكل طلب
+- handshake: ثوانٍ لكل اتصال جديد (محاكاة TLS handshake)
+- fail_requests: عدد الطلبات الأولى التي تُرجع 503
+"""
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        if self.server.handshake:
+            time.sleep(self.server.handshake)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        with self.server.lock:
+            self.server.requests.append((self.path, payload))
+            request_number = len(self.server.requests)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.headers.get('Authorization'):
+            return self._send(401, {'error': 'Unauthorized'})
+        if request_number <= self.server.fail_requests:
+            return self._send(503, {'error': 'Service unavailable'})
+        if self.path.rstrip('/') != '/payment-request':
+            return self._send(404, {'error': 'Not found'})
+
+        self._send(200, {
+            'transactionId': f"stub_{uuid.uuid4().hex[:12]}",
+            'status': 'pending',
+            'amount': payload.get('amount'),
+        })
+
+
+class MoosylStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, handshake=0.0, fail_requests=0):
+        super().__init__((host, port), _StubHandler)
+        self.latency = latency
+        self.handshake = handshake
+        self.fail_requests = fail_requests
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def stub_server(**options):
+    """with stub_server(latency=0.05) as server: settings.MOOSYL_BASE_URL = server.base_url"""
+    server = MoosylStubServer(**options)
+    thread = threading.Thread(target=server.serve_forever, name='moosyl-stub', daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,56 @@
+# payments/segments.py
+"""
+تصنيف المستخدمين حسب حالة الاشتراك
+Subscription segmentation: every UserTaskCounter is classified in SQL with an
+Exists() subquery on paid active bundles (no joins on task_bundles, no Python loops).
+
+- premium:        لديه حزمة نشطة مدفوعة
+- limit_reached:  استنفد المجاني (5+) بدون حزمة
+- close_to_limit: 4 مهام مجانية بدون حزمة (مهمة واحدة متبقية)
+- free:           أقل من 4 مهام مجانية بدون حزمة
+"""
+from django.db.models import Case, CharField, Count, Exists, OuterRef, Q, Value, When
+
+from .models import TaskBundle, UserTaskCounter
+
+FREE_TASKS_LIMIT = 5
+
+SEGMENTS = ('free', 'close_to_limit', 'limit_reached', 'premium')
+
+# الشرط لكل تصنيف (على queryset مُعلّم بـ has_active_bundle)
+SEGMENT_FILTERS = {
+    'premium': Q(has_active_bundle=True),
+    'limit_reached': Q(has_active_bundle=False, free_tasks_used__gte=FREE_TASKS_LIMIT),
+    'close_to_limit': Q(has_active_bundle=False, free_tasks_used=FREE_TASKS_LIMIT - 1),
+    'free': Q(has_active_bundle=False, free_tasks_used__lt=FREE_TASKS_LIMIT - 1),
+}
+
+
+def active_bundle_exists(user_ref='user'):
+    """Exists() لحزمة نشطة مدفوعة - user_ref: مسار المستخدم في الاستعلام الخارجي"""
+    return Exists(TaskBundle.objects.active().filter(user=OuterRef(user_ref)))
+
+
+def segmented_counters(queryset=None):
+    """UserTaskCounter مع has_active_bundle و segment"""
+    queryset = UserTaskCounter.objects.all() if queryset is None else queryset
+    return queryset.annotate(
+        has_active_bundle=active_bundle_exists()
+    ).annotate(
+        segment=Case(
+            *[When(condition, then=Value(name)) for name, condition in SEGMENT_FILTERS.items()],
+            output_field=CharField(),
+        )
+    )
+
+
+def segment_counts(queryset=None, **aggregates):
+    """
+    عدد المستخدمين في كل تصنيف + أي aggregates إضافية - استعلام واحد
+    يعيد {'free': n, 'close_to_limit': n, 'limit_reached': n, 'premium': n, **aggregates}
+    """
+    queryset = UserTaskCounter.objects.all() if queryset is None else queryset
+    return queryset.annotate(has_active_bundle=active_bundle_exists()).aggregate(
+        **{name: Count('id', filter=condition) for name, condition in SEGMENT_FILTERS.items()},
+        **aggregates
+    )
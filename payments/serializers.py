@@ -299,7 +299,7 @@ class TaskBundleCreateSerializer(serializers.Serializer):
         user = self.context['request'].user
         
         # التحقق: هل يحتاج فعلاً للشراء؟
-        counter, _ = UserTaskCounter.objects.get_or_create(user=user)
+        counter, _ = UserTaskCounter.for_user(user)
         if not counter.needs_payment:
             raise serializers.ValidationError({
                 'error': 'لا تحتاج لشراء حزمة الآن',
@@ -322,7 +322,7 @@ class PurchaseBundleSerializer(serializers.Serializer):
     def validate(self, data):
         """التحقق من أن المستخدم يحتاج فعلاً للشراء"""
         user = self.context['request'].user
-        counter, _ = UserTaskCounter.objects.get_or_create(user=user)
+        counter, _ = UserTaskCounter.for_user(user)
         
         if not counter.needs_payment:
             raise serializers.ValidationError({
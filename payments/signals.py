@@ -0,0 +1,32 @@
+"""
+تحديث مرجع الحزمة النشطة في UserTaskCounter
+Keeps UserTaskCounter.active_bundle in sync when a bundle is activated
+(payment completed) or exhausted / deactivated.
+"""
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from payments.accounting import sync_active_bundle
+from payments.models import TaskBundle
+
+
+@receiver(post_save, sender=TaskBundle)
+def sync_active_bundle_on_save(sender, instance, **kwargs):
+    """
+    UPDATE واحد، يطابق صفاً فقط إذا تغيّر المرجع:
+    - حزمة صالحة غير مُشار إليها → إعادة الحساب (الأحدث)
+    - حزمة مُشار إليها لم تعد صالحة → إعادة الحساب (حزمة أخرى أو NULL)
+    """
+    if instance.is_usable:
+        stale = ~Q(active_bundle_id=instance.pk)  # يشمل NULL
+    else:
+        stale = Q(active_bundle_id=instance.pk)
+    sync_active_bundle(instance.user_id, stale)
+
+
+@receiver(post_delete, sender=TaskBundle)
+def sync_active_bundle_on_delete(sender, instance, **kwargs):
+    # FK بـ SET_NULL يفرّغ المرجع؛ نعيد الحساب في حال وجود حزمة نشطة أخرى
+    sync_active_bundle(instance.user_id, Q(active_bundle__isnull=True))
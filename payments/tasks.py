@@ -0,0 +1,13 @@
+# payments/tasks.py
+"""
+Celery tasks for payments
+"""
+from celery import shared_task
+
+from .webhook_inbox import drain
+
+
+@shared_task(ignore_result=True)
+def process_moosyl_webhooks():
+    """معالجة كل أحداث Moosyl المستحقة في صندوق الوارد"""
+    return drain()
@@ -1,3 +1,200 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import User
+from . import moosyl_http
+from .models import MoosylWebhookEvent, TaskBundle, UserTaskCounter
+from .moosyl_stub import stub_server
+from .utils import MoosylAPI
+from .webhook_inbox import process_pending, record_event
+
+MOOSYL_HTTP = {
+    'POOL_MAXSIZE': 2,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 5,
+    'RETRIES': 2,
+    'BACKOFF_FACTOR': 0,
+    'CIRCUIT_FAILURE_THRESHOLD': 3,
+    'CIRCUIT_RESET_SECONDS': 30,
+}
+
+MOOSYL_WEBHOOK_INBOX = {
+    'DISPATCH': 'command',
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+
+@override_settings(
+    MOOSYL_HTTP=MOOSYL_HTTP, MOOSYL_SECRET_KEY='sk_test', MOOSYL_PUBLISHABLE_KEY='pk_test'
+)
+class MoosylHTTPTests(TestCase):
+    """الاتصال المشترك مع خادم Moosyl الوهمي: keep-alive وقاطع الدائرة"""
+
+    def setUp(self):
+        # اتصال جديد وقاطع دائرة مغلق لكل اختبار
+        moosyl_http._http = None
+
+    def create_payments(self, server, count):
+        with self.settings(MOOSYL_BASE_URL=server.base_url):
+            api = MoosylAPI()
+            return [api.create_payment_request(5, f'bundle_{index}') for index in range(count)]
+
+    def test_connection_is_reused(self):
+        with stub_server() as server:
+            results = self.create_payments(server, 5)
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(moosyl_http.get_http().stats()['latency_ms']['payment-request']['count'], 5)
+
+    def test_503s_open_the_circuit(self):
+        threshold = MOOSYL_HTTP['CIRCUIT_FAILURE_THRESHOLD']
+        with stub_server(fail_requests=100) as server:
+            results = self.create_payments(server, threshold + 2)
+
+        # POST لا يُعاد على 503 - طلب واحد لكل عملية شراء حتى يُفتح القاطع
+        self.assertEqual(len(server.requests), threshold)
+        self.assertEqual(
+            [result['error'] for result in results],
+            ['request_failed'] * threshold + ['circuit_open'] * 2
+        )
+        self.assertEqual(moosyl_http.get_http().breaker.state, 'open')
+
+    def test_half_open_trial_closes_the_circuit(self):
+        threshold = MOOSYL_HTTP['CIRCUIT_FAILURE_THRESHOLD']
+        with stub_server(fail_requests=threshold) as server:
+            self.create_payments(server, threshold)
+            breaker = moosyl_http.get_http().breaker
+            self.assertEqual(breaker.state, 'open')
+
+            # انتهاء مهلة CIRCUIT_RESET_SECONDS → طلب تجريبي واحد
+            breaker.opened_at -= MOOSYL_HTTP['CIRCUIT_RESET_SECONDS']
+            self.assertEqual(breaker.state, 'half_open')
+            results = self.create_payments(server, 2)
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len(server.requests), threshold + 2)
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 0))
+
+    def test_failed_trial_reopens_the_circuit(self):
+        threshold = MOOSYL_HTTP['CIRCUIT_FAILURE_THRESHOLD']
+        with stub_server(fail_requests=threshold + 1) as server:
+            self.create_payments(server, threshold)
+            breaker = moosyl_http.get_http().breaker
+            breaker.opened_at -= MOOSYL_HTTP['CIRCUIT_RESET_SECONDS']
+            results = self.create_payments(server, 2)
+
+        self.assertEqual([result['error'] for result in results], ['request_failed', 'circuit_open'])
+        self.assertEqual(breaker.state, 'open')
+
+    def test_create_payment_request_circuit_open(self):
+        moosyl_http.get_http().breaker.opened_at = time.monotonic()
+
+        with stub_server() as server:
+            result = self.create_payments(server, 1)[0]
+
+        self.assertEqual(server.requests, [])
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'circuit_open')
+
+
+@override_settings(MOOSYL_WEBHOOK_INBOX=MOOSYL_WEBHOOK_INBOX)
+class WebhookInboxTests(TestCase):
+    """صندوق الوارد: إزالة التكرار، إعادة المحاولة، تفعيل الحزمة مرة واحدة"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('22200001', 'pass1234', role='client', first_name='Client')
+        self.bundle = TaskBundle.objects.create(
+            user=self.user, moosyl_transaction_id='moosyl_1', is_active=False
+        )
+
+    def total_subscriptions(self):
+        counter = UserTaskCounter.objects.filter(user=self.user).first()
+        return counter.total_subscriptions if counter else 0
+
+    def test_duplicate_event_is_stored_once(self):
+        event, created = record_event('payment-completed', 'moosyl_1', 'bundle_1', {})
+        duplicate, duplicate_created = record_event('payment-completed', 'moosyl_1', 'bundle_1', {})
+
+        self.assertTrue(created)
+        self.assertFalse(duplicate_created)
+        self.assertEqual(duplicate.pk, event.pk)
+        self.assertEqual(MoosylWebhookEvent.objects.get().duplicates, 1)
+        self.assertEqual(process_pending(), {
+            'claimed': 1, 'processed': 1, 'ignored': 0, 'retried': 0, 'failed': 0
+        })
+
+        # إعادة إرسال بعد المعالجة لا تُعالج مرة ثانية
+        record_event('payment-completed', 'moosyl_1', 'bundle_1', {})
+        self.assertEqual(process_pending()['claimed'], 0)
+        self.assertEqual(self.total_subscriptions(), 1)
+
+    def test_missing_bundle_is_retried_with_backoff(self):
+        event, _ = record_event('payment-completed', 'moosyl_2', 'bundle_2', {})
+
+        before = timezone.now()
+        self.assertEqual(process_pending()['retried'], 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertIn('No bundle for transaction moosyl_2', event.last_error)
+        self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=30))
+
+        # لم يحن موعد المحاولة التالية بعد
+        self.assertEqual(process_pending()['claimed'], 0)
+
+        MoosylWebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+        process_pending()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('pending', 2))
+        self.assertGreaterEqual(event.next_attempt_at, timezone.now() + timedelta(seconds=59))
+
+        # حُفظ معرف المعاملة في الحزمة → المحاولة التالية تنجح
+        TaskBundle.objects.filter(pk=self.bundle.pk).update(moosyl_transaction_id='moosyl_2')
+        MoosylWebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(process_pending()['processed'], 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.bundle_id), ('processed', 3, self.bundle.pk))
+
+    def test_missing_bundle_fails_after_max_attempts(self):
+        event, _ = record_event('payment-completed', 'moosyl_2', 'bundle_2', {})
+        MoosylWebhookEvent.objects.filter(pk=event.pk).update(
+            attempts=MOOSYL_WEBHOOK_INBOX['MAX_ATTEMPTS'] - 1
+        )
+
+        self.assertEqual(process_pending()['failed'], 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+        self.assertIsNotNone(event.processed_at)
+
+    def test_repeated_payment_completed_is_idempotent(self):
+        record_event('payment-completed', 'moosyl_1', 'bundle_1', {})
+        # نفس الدفع بمعرف مختلف (event_key مختلف) يصل للحزمة نفسها عبر معرفنا
+        record_event('payment-completed', 'bundle_1', 'moosyl_1', {})
+
+        stats = process_pending()
+
+        self.assertEqual((stats['processed'], stats['ignored']), (1, 1))
+        self.bundle.refresh_from_db()
+        self.assertEqual(self.bundle.moosyl_payment_status, 'completed')
+        self.assertTrue(self.bundle.is_active)
+        self.assertEqual(self.total_subscriptions(), 1)
+        self.assertEqual(
+            UserTaskCounter.objects.get(user=self.user).active_bundle_id, self.bundle.pk
+        )
+
+    def test_payment_failed_after_completed_is_ignored(self):
+        record_event('payment-completed', 'moosyl_1', 'bundle_1', {})
+        record_event('payment-failed', 'moosyl_1', 'bundle_1', {})
+
+        stats = process_pending()
+
+        self.assertEqual((stats['processed'], stats['ignored']), (1, 1))
+        self.bundle.refresh_from_db()
+        self.assertEqual(self.bundle.moosyl_payment_status, 'completed')
@@ -62,6 +62,9 @@ urlpatterns = [
     # Webhook من Moosyl
     path('moosyl/webhook/', views.moosyl_webhook, name='moosyl_webhook'),
     
+    # حالة الاتصال مع Moosyl (Admin)
+    path('moosyl/http-stats/', views.moosyl_http_stats, name='moosyl_http_stats'),
+    
     # التحقق من حالة حزمة
     path('bundle/<int:bundle_id>/status/', views.check_bundle_status, name='check_bundle_status'),
 ]
\ No newline at end of file
@@ -8,17 +8,18 @@ import hmac
 import hashlib
 from django.conf import settings
 from decimal import Decimal
-from django.conf import settings
+
+from .moosyl_http import CircuitOpenError, get_http
 
 
 class MoosylAPI:
     """
     Moosyl API Client
+    الطلبات عبر الاتصال المشترك (payments/moosyl_http.py)
     """
     
-    BASE_URL = settings.MOOSYL_BASE_URL
-    
     def __init__(self):
+        self.BASE_URL = settings.MOOSYL_BASE_URL
         self.secret_key = settings.MOOSYL_SECRET_KEY
         self.publishable_key = settings.MOOSYL_PUBLISHABLE_KEY
         
@@ -62,11 +63,12 @@ class MoosylAPI:
             payload['metadata'] = metadata
         
         try:
-            response = requests.post(
+            response = get_http().request(
+                'POST',
                 url,
+                'payment-request',
                 json=payload,
-                headers=headers,
-                timeout=10  # 10 ثواني timeout
+                headers=headers
             )
             
             response.raise_for_status()  # رفع خطأ إذا status code != 200
@@ -82,6 +84,13 @@ class MoosylAPI:
                 'raw_response': data
             }
             
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': 'circuit_open',
+                'message': str(e)
+            }
+        
         except requests.exceptions.Timeout:
             return {
                 'success': False,
@@ -128,8 +137,16 @@ class MoosylAPI:
         return hmac.compare_digest(expected_signature, signature)
 
 
+_client = None
+
+
 def get_moosyl_client():
     """
-    الحصول على instance من MoosylAPI
+    الحصول على instance من MoosylAPI (نسخة واحدة، تُعاد إذا تغيّرت الإعدادات)
     """
-    return MoosylAPI()
\ No newline at end of file
+    global _client
+    if _client is None or (_client.BASE_URL, _client.secret_key, _client.publishable_key) != (
+        settings.MOOSYL_BASE_URL, settings.MOOSYL_SECRET_KEY, settings.MOOSYL_PUBLISHABLE_KEY
+    ):
+        _client = MoosylAPI()
+    return _client
\ No newline at end of file
@@ -36,9 +36,7 @@ def check_task_limit(request):
         "bundle_info": {...}
     }
     """
-    counter, created = UserTaskCounter.objects.get_or_create(
-        user=request.user
-    )
+    counter, created = UserTaskCounter.for_user(request.user)
     
     serializer = UserTaskCounterSerializer(counter)
     
@@ -83,9 +81,7 @@ def my_task_counter(request):
     """
     ✅ عرض تفاصيل كاملة عن عداد المهام
     """
-    counter, created = UserTaskCounter.objects.get_or_create(
-        user=request.user
-    )
+    counter, created = UserTaskCounter.for_user(request.user)
     
     serializer = UserTaskCounterSerializer(counter)
     return Response(serializer.data)
@@ -110,15 +106,17 @@ def task_counter_stats(request):
     
     from django.db.models import Count, Sum, Avg
     from payments.models import TaskBundle
+    from payments.segments import SEGMENTS, segment_counts
     
-    # إحصائيات المستخدمين
-    user_stats = UserTaskCounter.objects.aggregate(
+    # إحصائيات المستخدمين + التصنيف حسب الاشتراك (استعلام واحد)
+    user_stats = segment_counts(
         total_users=Count('id'),
         users_in_free_period=Count('id', filter=models.Q(free_tasks_used__lt=5, total_subscriptions=0)),
         users_subscribed_once=Count('id', filter=models.Q(total_subscriptions=1)),
         users_subscribed_multiple=Count('id', filter=models.Q(total_subscriptions__gte=2)),
         avg_subscriptions_per_user=Avg('total_subscriptions'),
     )
+    user_stats['segments'] = {segment: user_stats.pop(segment) for segment in SEGMENTS}
     
     # إحصائيات الحزم
     bundle_stats = TaskBundle.objects.aggregate(
@@ -460,10 +458,12 @@ def moosyl_webhook(request):
     
     Security:
     - التحقق من التوقيع (x-webhook-signature)
+    
+    Processing:
+    - الحدث يُحفظ في MoosylWebhookEvent ويُعالج في الخلفية (مع إعادة المحاولة)
     """
     from payments.utils import get_moosyl_client
-    from payments.models import TaskBundle
-    from django.utils import timezone
+    from payments.webhook_inbox import record_event
     
     # 1️⃣ التحقق من التوقيع
     signature = request.headers.get('x-webhook-signature')
@@ -494,45 +494,14 @@ def moosyl_webhook(request):
             'error': 'Missing transaction data'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # 3️⃣ البحث عن Bundle
-    try:
-        bundle = TaskBundle.objects.get(
-            moosyl_transaction_id__in=[transaction_id, our_transaction_id]
-        )
-    except TaskBundle.DoesNotExist:
-        # Bundle غير موجود - نسجل ونتجاهل
-        print(f"⚠️ Webhook for unknown bundle: {transaction_id}")
-        return Response({'received': True})
-    
-    # 4️⃣ معالجة الحدث
-    if event_type == 'payment-completed':
-        # ✅ الدفع نجح!
-        bundle.moosyl_payment_status = 'completed'
-        bundle.is_active = True
-        bundle.save()
-        
-        # زيادة عداد الاشتراكات
-        counter = bundle.user.task_counter
-        counter.total_subscriptions += 1
-        counter.save()
-        
-        print(f"✅ Payment completed: Bundle #{bundle.id} for {bundle.user.phone}")
-        
-        # TODO: إرسال إشعار للمستخدم
-        
-    elif event_type == 'payment-failed':
-        # ❌ الدفع فشل
-        bundle.moosyl_payment_status = 'failed'
-        bundle.save()
-        
-        print(f"❌ Payment failed: Bundle #{bundle.id} for {bundle.user.phone}")
-        
-    elif event_type == 'payment-created':
-        # ℹ️ تم إنشاء الدفع (لا نفعل شيء)
-        print(f"ℹ️ Payment created: Bundle #{bundle.id}")
+    # 3️⃣ حفظ الحدث في صندوق الوارد (المعالجة في الخلفية - payments/webhook_inbox.py)
+    _, created = record_event(event_type, transaction_id, our_transaction_id, data)
     
-    # 5️⃣ إرجاع 200 OK
-    return Response({'received': True}, status=status.HTTP_200_OK)
+    # 4️⃣ إرجاع 200 OK فوراً (نفس الحدث مرة ثانية → لا يُعالج مجدداً)
+    return Response({
+        'received': True,
+        'duplicate': not created
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -550,4 +519,20 @@ def check_bundle_status(request, bundle_id):
         'payment_status': bundle.get_moosyl_payment_status_display(),
         'is_active': bundle.is_active,
         'can_use': bundle.is_active and not bundle.is_exhausted
-    })
\ No newline at end of file
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def moosyl_http_stats(request):
+    """
+    ✅ حالة الاتصال مع Moosyl (للـ Admin فقط): قاطع الدائرة + توزيع مدة الطلبات
+    (إحصائيات هذه العملية فقط)
+    """
+    if not request.user.is_staff and not request.user.is_superuser:
+        return Response({
+            'error': 'صلاحيات غير كافية',
+            'error_fr': 'Permissions insuffisantes'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    from payments.moosyl_http import get_http
+    return Response(get_http().stats())
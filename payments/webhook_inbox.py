@@ -0,0 +1,204 @@
+# payments/webhook_inbox.py
+"""
+صندوق الوارد لأحداث Moosyl
+Webhook inbox: the view only verifies the signature and stores the event
+(unique event_key), then acknowledges. Activation runs here in the background,
+one event per transaction, with dedupe on the bundle state and retry with backoff.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.background import BackgroundWorker
+
+from .models import MoosylWebhookEvent, TaskBundle, UserTaskCounter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOOSYL_WEBHOOK_INBOX = {
+    'DISPATCH': 'thread',
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'CLAIM_TIMEOUT_SECONDS': 300,
+}
+
+HANDLED_EVENTS = ('payment-created', 'payment-completed', 'payment-failed')
+
+
+def inbox_config():
+    return {**DEFAULT_MOOSYL_WEBHOOK_INBOX, **getattr(settings, 'MOOSYL_WEBHOOK_INBOX', {})}
+
+
+class BundleNotFound(Exception):
+    """الحدث وصل قبل حفظ معرف المعاملة في TaskBundle - يُعاد المحاولة لاحقاً"""
+
+
+# ========================================
+# Receive
+# ========================================
+
+def record_event(event_type, transaction_id, our_transaction_id, payload):
+    """
+    حفظ الحدث في صندوق الوارد - يعيد (event, created)
+    نفس الحدث مرة ثانية → created=False ويُزاد عداد duplicates فقط
+    """
+    event_key = f"{event_type}:{transaction_id}"[:300]
+    try:
+        with transaction.atomic():
+            event = MoosylWebhookEvent.objects.create(
+                event_key=event_key,
+                event_type=event_type or '',
+                transaction_id=transaction_id,
+                our_transaction_id=our_transaction_id or '',
+                payload=payload,
+            )
+    except IntegrityError:
+        MoosylWebhookEvent.objects.filter(event_key=event_key).update(duplicates=F('duplicates') + 1)
+        return MoosylWebhookEvent.objects.get(event_key=event_key), False
+
+    transaction.on_commit(schedule_processing)
+    return event, True
+
+
+def schedule_processing():
+    """Wake whichever processor is configured (celery task / background thread)"""
+    mode = inbox_config()['DISPATCH']
+    if mode == 'celery':
+        from .tasks import process_moosyl_webhooks
+        process_moosyl_webhooks.delay()
+    elif mode == 'thread':
+        _background_processor.wake()
+    # 'command': عملية منفصلة (manage.py process_moosyl_webhooks --loop)
+
+
+# ========================================
+# Process
+# ========================================
+
+def _claim_batch(batch_size, claim_timeout):
+    now = timezone.now()
+    claim_token = uuid.uuid4().hex
+    due = (
+        models.Q(status='pending', next_attempt_at__lte=now) |
+        models.Q(status='processing', claimed_at__lt=now - timedelta(seconds=claim_timeout))
+    )
+    ids = list(
+        MoosylWebhookEvent.objects.filter(due).order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    MoosylWebhookEvent.objects.filter(due, id__in=ids).update(
+        status='processing', claim_token=claim_token, claimed_at=now
+    )
+    return list(
+        MoosylWebhookEvent.objects.filter(claim_token=claim_token, status='processing').order_by('id')
+    )
+
+
+def _apply_event(event):
+    """
+    تطبيق الحدث على الحزمة - idempotent:
+    حزمة مكتملة مسبقاً لا تُفعّل ولا يُزاد total_subscriptions مرة ثانية
+    يعيد 'processed' أو 'ignored'
+    """
+    if event.event_type not in HANDLED_EVENTS:
+        return 'ignored'
+
+    bundle = TaskBundle.objects.select_for_update().filter(
+        moosyl_transaction_id__in=[event.transaction_id, event.our_transaction_id]
+    ).order_by('-purchased_at').first()
+    if bundle is None:
+        if event.event_type == 'payment-created':
+            return 'ignored'
+        raise BundleNotFound(f"No bundle for transaction {event.transaction_id}")
+    event.bundle = bundle
+
+    if event.event_type == 'payment-completed':
+        if bundle.moosyl_payment_status == 'completed':
+            logger.info(f"Bundle #{bundle.id} already completed - duplicate webhook")
+            return 'ignored'
+        # ✅ الدفع نجح! (save → signals: الحزمة النشطة + الإحصائيات)
+        bundle.moosyl_payment_status = 'completed'
+        bundle.is_active = True
+        bundle.save()
+
+        # زيادة عداد الاشتراكات
+        counter, _ = UserTaskCounter.objects.get_or_create(user_id=bundle.user_id)
+        UserTaskCounter.objects.filter(pk=counter.pk).update(
+            total_subscriptions=F('total_subscriptions') + 1, updated_at=timezone.now()
+        )
+        logger.info(f"Payment completed: Bundle #{bundle.id} for user #{bundle.user_id}")
+
+    elif event.event_type == 'payment-failed':
+        if bundle.moosyl_payment_status != 'pending':
+            return 'ignored'
+        # ❌ الدفع فشل
+        bundle.moosyl_payment_status = 'failed'
+        bundle.save()
+        logger.info(f"Payment failed: Bundle #{bundle.id} for user #{bundle.user_id}")
+
+    return 'processed'
+
+
+def process_pending(batch_size=None):
+    """
+    Process one batch of due webhook events
+    يعيد إحصائيات: claimed / processed / ignored / retried / failed
+    """
+    config = inbox_config()
+    events = _claim_batch(batch_size or config['BATCH_SIZE'], config['CLAIM_TIMEOUT_SECONDS'])
+    stats = {'claimed': len(events), 'processed': 0, 'ignored': 0, 'retried': 0, 'failed': 0}
+
+    for event in events:
+        event.attempts += 1
+        try:
+            with transaction.atomic():
+                event.status = _apply_event(event)
+                event.processed_at = timezone.now()
+                event.last_error = ''
+                event.save(update_fields=['status', 'attempts', 'processed_at', 'last_error', 'bundle'])
+        except Exception as e:
+            event.last_error = str(e)[:1000]
+            if event.attempts >= config['MAX_ATTEMPTS']:
+                event.status = 'failed'
+                event.processed_at = timezone.now()
+                logger.error(f"Moosyl webhook {event.event_key} failed: {event.last_error}")
+            else:
+                event.status = 'pending'
+                event.next_attempt_at = timezone.now() + timedelta(
+                    seconds=config['RETRY_BACKOFF_SECONDS'] * 2 ** (event.attempts - 1)
+                )
+            event.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at'])
+        stats['retried' if event.status == 'pending' else event.status] += 1
+
+    if events:
+        logger.info(
+            f"Moosyl webhooks: {stats['processed']} processed, {stats['ignored']} ignored, "
+            f"{stats['retried']} retried, {stats['failed']} failed"
+        )
+    return stats
+
+
+def drain(batch_size=None):
+    """Process batches until nothing is due - مجموع الإحصائيات"""
+    totals = {}
+    while True:
+        stats = process_pending(batch_size=batch_size)
+        if not stats['claimed']:
+            return totals
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+
+
+_background_processor = BackgroundWorker(
+    'moosyl-webhook-processor',
+    step=lambda: process_pending()['claimed'],
+    idle_timeout=lambda: inbox_config()['RETRY_BACKOFF_SECONDS'],
+)
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'services'
\ No newline at end of file
+    name = 'services'
+
+    def ready(self):
+        # ✅ إبطال كاش الفئات والمناطق
+        import services.signals
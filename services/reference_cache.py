@@ -0,0 +1,128 @@
+# services/reference_cache.py
+"""
+كاش البيانات المرجعية (الفئات والمناطق)
+Versioned reference-data cache for the public services endpoints:
+
+- رقم جيل (generation) في كاش Django يُزاد عند حفظ/حذف ServiceCategory أو NouakchottArea
+- JSON جاهز (bytes) في ذاكرة العملية لكل (endpoint, query string, generation)
+- ETag + Cache-Control: العميل يعيد التحقق ويحصل على 304 بدون قاعدة بيانات
+
+مع كاش محلي (LocMemCache) يُزاد الجيل فقط في العملية التي عدّلت البيانات،
+لذلك كل نسخة في الذاكرة تنتهي بعد MAX_AGE_SECONDS.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.renderers import JSONRenderer
+
+DEFAULT_REFERENCE_CACHE = {
+    'MAX_AGE_SECONDS': 300,
+    'MAX_ENTRIES': 256,
+    'CLIENT_MAX_AGE_SECONDS': 60,
+}
+
+GENERATION_KEY = 'services:reference:generation'
+
+
+def reference_cache_config():
+    return {**DEFAULT_REFERENCE_CACHE, **getattr(settings, 'REFERENCE_CACHE', {})}
+
+
+# ========================================
+# Generation
+# ========================================
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # بعد إعادة تشغيل الكاش: قيمة جديدة لا تطابق أي نسخة قديمة في الذاكرة
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+# ========================================
+# Rendered responses
+# ========================================
+
+_rendered = OrderedDict()
+_rendered_lock = threading.Lock()
+
+
+def _cache_key(name, request):
+    """نفس الـ endpoint بنفس المعاملات (اللغة، البحث، الفلاتر، الترتيب) بأي ترتيب"""
+    params = tuple(sorted(
+        (key, tuple(values)) for key, values in request.GET.lists()
+    ))
+    return name, params
+
+
+def get_rendered(name, request, render):
+    """
+    (content, etag) من الذاكرة، أو render() → data تُحوّل إلى JSON مرة واحدة
+    ETag = بصمة المحتوى (نفس البيانات في كل العمليات → نفس ETag)
+    """
+    config = reference_cache_config()
+    key = _cache_key(name, request)
+    generation = current_generation()
+    now = time.monotonic()
+
+    with _rendered_lock:
+        entry = _rendered.get(key)
+        if entry and entry[0] == generation and now - entry[1] < config['MAX_AGE_SECONDS']:
+            _rendered.move_to_end(key)
+            return entry[2], entry[3]
+
+    content = JSONRenderer().render(render())
+    etag = f'"{hashlib.sha1(content).hexdigest()}"'
+    with _rendered_lock:
+        _rendered[key] = (generation, now, content, etag)
+        _rendered.move_to_end(key)
+        while len(_rendered) > config['MAX_ENTRIES']:
+            _rendered.popitem(last=False)
+    return content, etag
+
+
+def clear_rendered():
+    with _rendered_lock:
+        _rendered.clear()
+
+
+def reference_response(name, request, render):
+    """
+    HttpResponse بالـ JSON الجاهز، أو 304 إذا أرسل العميل نفس ETag
+    """
+    content, etag = get_rendered(name, request, render)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=reference_cache_config()['CLIENT_MAX_AGE_SECONDS'])
+    return response
+
+
+class ReferenceCacheMixin:
+    """
+    ListAPIView → نفس الاستجابة من الذاكرة حتى يتغير الجيل
+    reference_name: اسم فريد للـ endpoint في مفتاح الكاش
+    """
+    reference_name = None
+
+    def list(self, request, *args, **kwargs):
+        return reference_response(
+            self.reference_name, request,
+            lambda: super(ReferenceCacheMixin, self).list(request, *args, **kwargs).data
+        )
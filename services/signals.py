@@ -0,0 +1,19 @@
+"""
+زيادة جيل البيانات المرجعية
+Bumps the reference-data generation (services/reference_cache.py) whenever
+a category or an area is saved or deleted (admin panel, Django admin, shell).
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.models import NouakchottArea, ServiceCategory
+from services.reference_cache import bump_generation
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_save, sender=NouakchottArea)
+@receiver(post_delete, sender=ServiceCategory)
+@receiver(post_delete, sender=NouakchottArea)
+def bump_reference_generation(sender, **kwargs):
+    bump_generation()
@@ -1,6 +1,5 @@
 # services/views.py
-from rest_framework import generics, status
-from rest_framework.response import Response
+from rest_framework import generics
 from rest_framework.permissions import AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
@@ -10,12 +9,15 @@ from .serializers import (
     NouakchottAreaSerializer,
     NouakchottAreaSimpleSerializer
 )
+from .reference_cache import ReferenceCacheMixin, reference_response
 
-class ServiceCategoryListView(generics.ListAPIView):
+class ServiceCategoryListView(ReferenceCacheMixin, generics.ListAPIView):
     """
     List all active service categories
     عرض جميع فئات الخدمات النشطة
+    ✅ JSON جاهز من الذاكرة + ETag (services/reference_cache.py)
     """
+    reference_name = 'categories'
     queryset = ServiceCategory.objects.filter(is_active=True).order_by('order', 'name')
     serializer_class = ServiceCategorySerializer
     permission_classes = [AllowAny]
@@ -36,11 +38,12 @@ class ServiceCategoryListView(generics.ListAPIView):
         return queryset
 
 
-class NouakchottAreaListView(generics.ListAPIView):
+class NouakchottAreaListView(ReferenceCacheMixin, generics.ListAPIView):
     """
     List all active Nouakchott areas
     عرض جميع مناطق نواكشوط النشطة
     """
+    reference_name = 'areas'
     queryset = NouakchottArea.objects.filter(is_active=True).order_by('order', 'name')
     serializer_class = NouakchottAreaSerializer
     permission_classes = [AllowAny]
@@ -51,11 +54,12 @@ class NouakchottAreaListView(generics.ListAPIView):
     ordering = ['order']
 
 
-class NouakchottAreaSimpleListView(generics.ListAPIView):
+class NouakchottAreaSimpleListView(ReferenceCacheMixin, generics.ListAPIView):
     """
     Simple list of areas (for dropdowns in Flutter)
     قائمة بسيطة للمناطق (للقوائم المنسدلة في Flutter)
     """
+    reference_name = 'areas_simple'
     queryset = NouakchottArea.objects.filter(is_active=True).order_by('order', 'name')
     serializer_class = NouakchottAreaSimpleSerializer
     permission_classes = [AllowAny]
@@ -104,10 +108,12 @@ def services_data_combined(request):
     Get all services data in one request (categories + areas)
     الحصول على جميع بيانات الخدمات في طلب واحد (فئات + مناطق)
     """
-    categories = ServiceCategory.objects.filter(is_active=True).order_by('order', 'name')
-    areas = NouakchottArea.objects.filter(is_active=True).order_by('order', 'name')
+    def render():
+        categories = ServiceCategory.objects.filter(is_active=True).order_by('order', 'name')
+        areas = NouakchottArea.objects.filter(is_active=True).order_by('order', 'name')
+        return {
+            'categories': ServiceCategorySerializer(categories, many=True).data,
+            'areas': NouakchottAreaSimpleSerializer(areas, many=True).data
+        }
     
-    return Response({
-        'categories': ServiceCategorySerializer(categories, many=True).data,
-        'areas': NouakchottAreaSimpleSerializer(areas, many=True).data
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    return reference_response('all_data', request, render)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# tasks/management/commands/benchmark_nearest_tasks.py
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core.geo import haversine_km, grid_cell, grid_cells_for_box, expanding_nearest
+
+
+# وسط نواكشوط
+CENTER_LAT = 18.0858
+CENTER_LNG = -15.9785
+
+
+class Command(BaseCommand):
+    """
+    مقارنة المسح الكامل (الطريقة القديمة) مع فهرس الشبكة لفرز "الأقرب"
+    Compare full-scan nearest sorting with the geo_cell grid index (in memory)
+    """
+    help = 'Benchmark full scan vs grid index for sort_by=nearest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--spread', type=float, default=0.5,
+                            help='Spread of generated tasks around the center, in degrees')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        queries = options['queries']
+        spread = options['spread']
+        rng = random.Random(42)
+
+        for size in options['sizes']:
+            rows = [
+                (task_id,
+                 CENTER_LAT + rng.uniform(-spread, spread),
+                 CENTER_LNG + rng.uniform(-spread, spread))
+                for task_id in range(size)
+            ]
+            cells = defaultdict(list)
+            for row in rows:
+                cells[grid_cell(row[1], row[2])].append(row)
+
+            origins = [
+                (CENTER_LAT + rng.uniform(-spread, spread) / 2,
+                 CENTER_LNG + rng.uniform(-spread, spread) / 2)
+                for _ in range(queries)
+            ]
+
+            start = time.perf_counter()
+            for lat, lng in origins:
+                full = self._full_scan(rows, lat, lng, limit)
+            full_ms = (time.perf_counter() - start) * 1000 / queries
+
+            start = time.perf_counter()
+            for lat, lng in origins:
+                indexed = self._grid_search(cells, rows, lat, lng, limit)
+            grid_ms = (time.perf_counter() - start) * 1000 / queries
+
+            # التأكد من تطابق المسافات (التعادل بعد التقريب قد يبدّل الترتيب)
+            lat, lng = origins[-1]
+            full = self._full_scan(rows, lat, lng, limit)
+            indexed = self._grid_search(cells, rows, lat, lng, limit)
+            same = [distance for distance, _ in full] == [distance for distance, _ in indexed]
+
+            self.stdout.write(
+                f'{size:>8} tasks | full scan {full_ms:8.2f} ms | '
+                f'grid index {grid_ms:8.2f} ms | x{full_ms / max(grid_ms, 1e-9):6.1f} | '
+                f'{"OK" if same else "MISMATCH"}'
+            )
+
+    @staticmethod
+    def _full_scan(rows, lat, lng, limit):
+        """نفس منطق AvailableTasksListView قبل الفهرس"""
+        with_distance = [
+            (round(haversine_km(lat, lng, task_lat, task_lng), 2), task_id)
+            for task_id, task_lat, task_lng in rows
+        ]
+        with_distance.sort(key=lambda x: x[0])
+        return with_distance[:limit]
+
+    @staticmethod
+    def _grid_search(cells, rows, lat, lng, limit):
+        """نفس منطق AvailableTasksListView._nearest_tasks على بيانات في الذاكرة"""
+        def fetch_rows(box):
+            if box is None:
+                return rows
+            min_lat, max_lat, min_lng, max_lng = box
+            keys = grid_cells_for_box(min_lat, max_lat, min_lng, max_lng)
+            pool = rows if keys is None else [row for key in keys for row in cells.get(key, ())]
+            return [
+                row for row in pool
+                if min_lat <= row[1] <= max_lat and min_lng <= row[2] <= max_lng
+            ]
+
+        nearest = expanding_nearest(lat, lng, fetch_rows, limit)
+        return [(round(distance, 2), task_id) for distance, task_id in nearest]
@@ -0,0 +1,79 @@
+# tasks/management/commands/benchmark_task_matching.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.geo import haversine_km
+from tasks.matching import CategoryWorkerIndex, DEFAULT_TASK_MATCHING
+
+
+# وسط نواكشوط
+CENTER_LAT = 18.0858
+CENTER_LNG = -15.9785
+
+
+class Command(BaseCommand):
+    """
+    مقارنة الحلقة القديمة (عامل بعد عامل) مع فهرس التصنيف لمطابقة مهمة جديدة
+    Compare the per-worker distance loop with CategoryWorkerIndex.rank (in memory)
+    """
+    help = 'Benchmark per-worker loop vs category index for new-task matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 50000])
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--spread', type=float, default=0.5,
+                            help='Spread of generated workers around the center, in degrees')
+
+    def handle(self, *args, **options):
+        config = DEFAULT_TASK_MATCHING
+        queries = options['queries']
+        spread = options['spread']
+        rng = random.Random(42)
+        now = time.time()
+
+        for size in options['sizes']:
+            rows = [
+                (user_id, True,
+                 CENTER_LAT + rng.uniform(-spread, spread),
+                 CENTER_LNG + rng.uniform(-spread, spread),
+                 now - rng.uniform(0, 3600),
+                 round(rng.uniform(0, 5), 2))
+                for user_id in range(size)
+            ]
+            origins = [
+                (CENTER_LAT + rng.uniform(-spread, spread) / 2,
+                 CENTER_LNG + rng.uniform(-spread, spread) / 2)
+                for _ in range(queries)
+            ]
+
+            start = time.perf_counter()
+            for lat, lng in origins:
+                self._loop(rows, lat, lng, config)
+            loop_ms = (time.perf_counter() - start) * 1000 / queries
+
+            start = time.perf_counter()
+            index = CategoryWorkerIndex(rows, built_at=now)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for lat, lng in origins:
+                index.rank(lat, lng, config['RADIUS_KM'], config['MAX_NEARBY'],
+                           config['LOCATION_MAX_AGE_MINUTES'] * 60, config['WEIGHTS'], now=now)
+            rank_ms = (time.perf_counter() - start) * 1000 / queries
+
+            self.stdout.write(
+                f'{size:>8} workers | loop {loop_ms:8.2f} ms | index {rank_ms:8.2f} ms '
+                f'(build {build_ms:7.1f} ms) | x{loop_ms / max(rank_ms, 1e-9):6.1f}'
+            )
+
+    @staticmethod
+    def _loop(rows, lat, lng, config):
+        """نفس منطق _notify_relevant_workers قبل الفهرس (أول MAX_NEARBY ضمن النطاق)"""
+        nearby = []
+        for user_id, sharing, worker_lat, worker_lng, _, _ in rows:
+            if sharing and worker_lat and worker_lng:
+                if haversine_km(worker_lat, worker_lng, lat, lng) <= config['RADIUS_KM']:
+                    nearby.append(user_id)
+        return nearby[:config['MAX_NEARBY']]
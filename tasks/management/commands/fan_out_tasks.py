@@ -0,0 +1,22 @@
+# tasks/management/commands/fan_out_tasks.py
+from django.core.management.base import BaseCommand
+
+from tasks.matching import fan_out_new_task
+
+
+class Command(BaseCommand):
+    """
+    إعادة إرسال إشعارات مهام جديدة (مثلاً بعد إيقاف عملية في وضع thread قبل الإرسال)
+    Re-run the new-task fan-out for the given task ids
+    """
+    help = 'Notify matching workers about the given new tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='+', type=int)
+        parser.add_argument('--location-method', default=None,
+                            help="'current_location' to match by distance from the task coordinates")
+
+    def handle(self, *args, **options):
+        for task_id in options['task_ids']:
+            sent = fan_out_new_task(task_id, options['location_method'])
+            self.stdout.write(f'✅ Task #{task_id}: {sent} notification(s)')
@@ -0,0 +1,20 @@
+# tasks/management/commands/recompute_worker_ratings.py
+from django.core.management.base import BaseCommand
+
+from tasks.ratings import recompute_worker_ratings
+
+
+class Command(BaseCommand):
+    """
+    إعادة حساب تقييمات كل العمال من جدول TaskReview
+    Repair rating_sum / total_reviews / average_rating on WorkerProfile
+    (one grouped query + bulk_update; only drifted profiles are written)
+    """
+    help = 'Recompute all workers\' rating aggregates from TaskReview'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = recompute_worker_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {fixed} worker profiles updated"))
@@ -0,0 +1,290 @@
+# tasks/matching.py
+"""
+محرك مطابقة المهام الجديدة مع العمال
+Task-to-worker matching for new-task fan-out:
+
+- فهرس لكل تصنيف (في ذاكرة العملية، يُعاد بناؤه كل INDEX_TTL_SECONDS):
+  استعلام واحد للعمال المؤهلين + مصفوفات NumPy مجمّعة حسب خلايا الشبكة (core.geo)
+- ترتيب المرشحين في تمريرة واحدة: المسافة + التقييم + حداثة الموقع
+- الإرسال في الخلفية (celery / thread / sync) عبر bulk_notify_workers
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core.background import BackgroundWorker
+from core.geo import bounding_box, distances_km, grid_cell, grid_cells_for_box
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_MATCHING = {
+    'DISPATCH': 'thread',
+    'RADIUS_KM': 30,
+    'MAX_NEARBY': 20,
+    'MAX_FALLBACK': 50,
+    # موقع أقدم من هذا لا يُعتبر "حالياً" (نفس WorkerProfile.is_location_fresh)
+    'LOCATION_MAX_AGE_MINUTES': 30,
+    'INDEX_TTL_SECONDS': 60,
+    'WEIGHTS': {'distance': 0.6, 'rating': 0.25, 'recency': 0.15},
+}
+
+
+def matching_config():
+    return {**DEFAULT_TASK_MATCHING, **getattr(settings, 'TASK_MATCHING', {})}
+
+
+# ========================================
+# Index
+# ========================================
+
+class CategoryWorkerIndex:
+    """
+    العمال المؤهلون لتصنيف واحد (موثّقون، أكملوا التسجيل، متاحون)
+    كل الأعمدة مصفوفات متوازية؛ العمال الذين يشاركون موقعهم مرتبون حسب الخلية
+    """
+
+    def __init__(self, rows, built_at=None):
+        """rows: (user_id, sharing, latitude, longitude, location_ts, rating)"""
+        self.built_at = built_at if built_at is not None else time.time()
+        located = [row for row in rows if row[1] and row[2] is not None and row[3] is not None]
+        located.sort(key=lambda row: grid_cell(row[2], row[3]))
+
+        self.user_ids = np.asarray([row[0] for row in located], dtype=np.int64)
+        self.latitudes = np.asarray([row[2] for row in located], dtype=np.float64)
+        self.longitudes = np.asarray([row[3] for row in located], dtype=np.float64)
+        self.location_ts = np.asarray(
+            [row[4] if row[4] is not None else 0.0 for row in located], dtype=np.float64
+        )
+        self.ratings = np.asarray([row[5] for row in located], dtype=np.float64)
+
+        # خلية → (بداية, نهاية) في المصفوفات
+        self.cells = {}
+        for position, row in enumerate(located):
+            cell = grid_cell(row[2], row[3])
+            start, _ = self.cells.get(cell, (position, position))
+            self.cells[cell] = (start, position + 1)
+
+        # بدون موقع: للمهام التي لا تستخدم الموقع الحالي (الأعلى تقييماً أولاً)
+        self.fallback_ids = [
+            row[0] for row in sorted(rows, key=lambda row: (-row[5], row[0]))
+        ]
+
+    def __len__(self):
+        return len(self.fallback_ids)
+
+    def candidates_near(self, latitude, longitude, radius_km):
+        """مواضع العمال في الخلايا التي تغطي الدائرة (أو الكل إذا كانت الخلايا كثيرة)"""
+        keys = grid_cells_for_box(*bounding_box(latitude, longitude, radius_km))
+        if keys is None:
+            return np.arange(len(self.user_ids))
+        slices = [np.arange(*self.cells[key]) for key in keys if key in self.cells]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def rank(self, latitude, longitude, radius_km, k, max_age_seconds, weights, now=None):
+        """
+        أفضل k عامل ضمن radius_km بموقع حديث - [(user_id, distance_km, score)]
+        score = distance * (1 - d/radius) + rating * (rating/5) + recency * (1 - age/max_age)
+        """
+        if k <= 0:
+            return []
+        now = now if now is not None else time.time()
+        positions = self.candidates_near(latitude, longitude, radius_km)
+        if not len(positions):
+            return []
+
+        distances = distances_km(latitude, longitude, self.latitudes[positions], self.longitudes[positions])
+        ages = now - self.location_ts[positions]
+        mask = (distances <= radius_km) & (ages <= max_age_seconds)
+        positions, distances, ages = positions[mask], distances[mask], ages[mask]
+        if not len(positions):
+            return []
+
+        scores = (
+            weights.get('distance', 0) * (1 - distances / radius_km)
+            + weights.get('rating', 0) * (self.ratings[positions] / 5)
+            + weights.get('recency', 0) * (1 - np.clip(ages, 0, None) / max(max_age_seconds, 1))
+        )
+        order = np.arange(len(positions))
+        if k < len(order):
+            order = np.argpartition(-scores, k - 1)[:k]
+        user_ids = self.user_ids[positions]
+        order = order[np.lexsort((user_ids[order], -scores[order]))]
+        return [
+            (user_ids[index].item(), float(distances[index]), float(scores[index]))
+            for index in order
+        ]
+
+
+def _load_rows(category_name):
+    """
+    استعلام واحد لكل عمال التصنيف المؤهلين + المواقع الحية الأحدث من قاعدة البيانات
+    WorkerProfile.service_category يخزن اسم الفئة
+    """
+    from users.models import WorkerProfile
+    from workers.location_store import get_location_store
+
+    rows = [
+        [
+            user_id, sharing,
+            float(latitude) if latitude is not None else None,
+            float(longitude) if longitude is not None else None,
+            updated_at.timestamp() if updated_at else None,
+            float(rating or 0),
+        ]
+        for user_id, sharing, latitude, longitude, updated_at, rating in WorkerProfile.objects.filter(
+            service_category=category_name,
+            is_available=True,
+            user__role='worker',
+            user__is_verified=True,
+            user__onboarding_completed=True,
+        ).values_list(
+            'user_id', 'location_sharing_enabled', 'current_latitude', 'current_longitude',
+            'location_last_updated', 'average_rating'
+        ).order_by()
+    ]
+
+    live = get_location_store().get_many([row[0] for row in rows if row[1]])
+    for row in rows:
+        position = live.get(row[0])
+        if position and (row[4] is None or position['recorded_at'] > row[4]):
+            row[2], row[3], row[4] = position['latitude'], position['longitude'], position['recorded_at']
+    return rows
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_category_index(category_name, max_age=None):
+    """فهرس التصنيف من ذاكرة العملية، يُعاد بناؤه بعد INDEX_TTL_SECONDS"""
+    max_age = matching_config()['INDEX_TTL_SECONDS'] if max_age is None else max_age
+    index = _indexes.get(category_name)
+    if index is None or time.time() - index.built_at > max_age:
+        index = CategoryWorkerIndex(_load_rows(category_name))
+        with _indexes_lock:
+            _indexes[category_name] = index
+    return index
+
+
+def invalidate_index(category_name=None):
+    with _indexes_lock:
+        if category_name is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(category_name, None)
+
+
+# ========================================
+# Matching
+# ========================================
+
+def match_workers(task, location_method=None, config=None):
+    """
+    معرفات العمال الذين يجب إشعارهم بالمهمة، بالترتيب
+    - current_location + إحداثيات: الأقرب ضمن RADIUS_KM بموقع حديث (MAX_NEARBY)
+    - غير ذلك: الأعلى تقييماً في التصنيف (MAX_FALLBACK)
+    """
+    if not task.service_category_id:
+        return []
+    config = config or matching_config()
+    index = get_category_index(task.service_category.name, config['INDEX_TTL_SECONDS'])
+
+    if task.latitude and task.longitude and location_method == 'current_location':
+        ranked = index.rank(
+            float(task.latitude), float(task.longitude),
+            radius_km=config['RADIUS_KM'],
+            k=config['MAX_NEARBY'],
+            max_age_seconds=config['LOCATION_MAX_AGE_MINUTES'] * 60,
+            weights=config['WEIGHTS'],
+        )
+        return [user_id for user_id, _, _ in ranked]
+
+    return index.fallback_ids[:config['MAX_FALLBACK']]
+
+
+def fan_out_new_task(task_id, location_method=None):
+    """
+    مطابقة + إشعار دفعة واحدة (bulk_create + صندوق الإرسال)
+    يعيد عدد الإشعارات المنشأة
+    """
+    from users.models import User
+    from notifications.utils import bulk_notify_workers
+    from .models import ServiceRequest
+
+    task = ServiceRequest.objects.select_related('service_category').filter(pk=task_id).first()
+    if task is None:
+        return 0
+    worker_ids = match_workers(task, location_method)
+    if not worker_ids:
+        return 0
+
+    workers = User.objects.in_bulk(worker_ids)
+    result = bulk_notify_workers([workers[user_id] for user_id in worker_ids if user_id in workers], task)
+    logger.info(
+        f"📢 Task #{task.id}: notified {result['successful_notifications']}/{result['total_workers']} workers"
+    )
+    return result['successful_notifications']
+
+
+# ========================================
+# Dispatch
+# ========================================
+
+# وضع thread: الطابور في ذاكرة العملية فقط (غير دائم، بخلاف صندوق الإرسال)
+_pending = deque()
+
+
+@atexit.register
+def _report_pending():
+    """المهام التي لم تُرسل إشعاراتها قبل إيقاف العملية تُسجّل لإعادة إرسالها يدوياً"""
+    by_method = {}
+    for task_id, location_method in list(_pending):
+        by_method.setdefault(location_method, []).append(str(task_id))
+    for location_method, task_ids in by_method.items():
+        option = f' --location-method {location_method}' if location_method else ''
+        logger.warning(
+            f"Process exiting with {len(task_ids)} task fan-out(s) not sent "
+            f"(manage.py fan_out_tasks {' '.join(task_ids)}{option})"
+        )
+
+
+def _process_next():
+    try:
+        task_id, location_method = _pending.popleft()
+    except IndexError:
+        return False
+    try:
+        fan_out_new_task(task_id, location_method)
+    except Exception as e:
+        logger.error(f"Task #{task_id} fan-out failed: {str(e)}")
+    return True
+
+
+_background_matcher = BackgroundWorker('task-matcher', step=_process_next, idle_timeout=60)
+
+
+def schedule_fan_out(task, location_method=None):
+    """
+    Hand the new task to the configured dispatcher after commit
+    celery: مهمة Celery | thread: خيط خلفي داخل العملية | sync: مباشرة بعد commit
+    thread يفقد ما في الطابور عند إعادة التشغيل (يُسجّل في السجل) - celery للإرسال المضمون
+    """
+    mode = matching_config()['DISPATCH']
+
+    def dispatch():
+        if mode == 'celery':
+            from .tasks import fan_out_new_task as fan_out_task
+            fan_out_task.delay(task.id, location_method)
+        elif mode == 'thread':
+            _pending.append((task.id, location_method))
+            _background_matcher.wake()
+        else:
+            fan_out_new_task(task.id, location_method)
+
+    transaction.on_commit(dispatch)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_geo_cell(apps, schema_editor):
+    from core.geo import grid_cell
+
+    ServiceRequest = apps.get_model('tasks', 'ServiceRequest')
+    tasks = ServiceRequest.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+    for task in tasks.iterator(chunk_size=2000):
+        task.geo_cell = grid_cell(task.latitude, task.longitude)
+        task.save(update_fields=['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+        ('tasks', '0006_remove_servicerequest_completed_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='geo_cell',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Grid cell of (latitude, longitude), maintained on save', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', 'geo_cell'], name='tasks_servi_status_9556b9_idx'),
+        ),
+        migrations.RunPython(backfill_geo_cell, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:29
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters_charged_at(apps, schema_editor):
+    """المهام التي قُبل فيها عامل سابقاً احتُسبت في العدادات"""
+    ServiceRequest = apps.get_model('tasks', 'ServiceRequest')
+    ServiceRequest.objects.filter(assigned_worker__isnull=False).update(
+        counters_charged_at=Coalesce('accepted_at', 'updated_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_servicerequest_geo_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='counters_charged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_counters_charged_at, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,33 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
 from services.models import ServiceCategory
+from core.geo import grid_cell
+
+
+class ServiceRequestQuerySet(models.QuerySet):
+    def annotate_applications_count(self):
+        """
+        عدد الطلبات النشطة في نفس الاستعلام (بدل COUNT لكل مهمة)
+        يُقرأ تلقائياً من ServiceRequest.applications_count
+        """
+        return self.annotate(
+            active_applications_count=models.Count(
+                'applications', filter=models.Q(applications__is_active=True)
+            )
+        )
+    
+    def annotate_worker_application(self, worker):
+        """
+        حالة الطلب النشط لهذا العامل على كل مهمة (None إذا لم يتقدم) في نفس الاستعلام
+        يُقرأ في AvailableTaskSerializer (has_applied / application_status)
+        """
+        return self.annotate(
+            worker_application_status=models.Subquery(
+                TaskApplication.objects.filter(
+                    service_request=models.OuterRef('pk'), worker=worker, is_active=True
+                ).values('application_status')[:1]
+            )
+        )
 
 
 class ServiceRequest(models.Model):
@@ -10,6 +37,9 @@ class ServiceRequest(models.Model):
     Task/Service request posted by client
     طلب الخدمة/المهمة من العميل
     """
+    
+    objects = ServiceRequestQuerySet.as_manager()
+    
     # Basic info - علاقة مباشرة مع User
     client = models.ForeignKey(
         User,
@@ -58,6 +88,15 @@ class ServiceRequest(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     longitude = models.DecimalField(max_digits=11, decimal_places=7, null=True, blank=True)
     
+    # ✅ خلية الشبكة الجغرافية - تُحسب تلقائياً عند الحفظ (لفلترة "الأقرب")
+    geo_cell = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Grid cell of (latitude, longitude), maintained on save"
+    )
+    
     # ✅ Status management - مبسط (3 حالات فقط)
     STATUS_CHOICES = [
         ('published', 'Publiée'),      # منشورة - العمال يتقدمون
@@ -87,6 +126,8 @@ class ServiceRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     accepted_at = models.DateTimeField(null=True, blank=True)  # وقت قبول العامل
     cancelled_at = models.DateTimeField(null=True, blank=True)
+    # ✅ وقت احتساب المهمة في عدادات الطرفين (مرة واحدة فقط - payments/accounting.py)
+    counters_charged_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     
     # Additional info
@@ -97,13 +138,32 @@ class ServiceRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = "Service Request"
         verbose_name_plural = "Service Requests"
+        indexes = [
+            models.Index(fields=['status', 'geo_cell']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.client.get_full_name() or self.client.phone} ({self.get_status_display()})"
     
+    def save(self, *args, **kwargs):
+        """Keep geo_cell in sync with the coordinates"""
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
+        elif update_fields is None and not self._state.adding:
+            # counters_charged_at يُكتب فقط بتحديث مشروط (لا نعيد كتابة قيمة قديمة من الذاكرة)
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'counters_charged_at'
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def applications_count(self):
-        """Number of workers who applied"""
+        """Number of workers who applied (annotated value when available)"""
+        if hasattr(self, 'active_applications_count'):
+            return self.active_applications_count
         return self.applications.filter(is_active=True).count()
     
     @property 
@@ -251,27 +311,35 @@ class TaskReview(models.Model):
     def __str__(self):
         return f"Review: {self.service_request.title} - {self.rating}⭐"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الحالة المحمّلة - لحساب الفرق عند الحفظ بدون إعادة قراءة التقييمات
+        if {'worker_id', 'rating', 'is_public'}.issubset(field_names):
+            instance._rating_contribution = instance._current_rating_contribution()
+        return instance
+    
+    def _current_rating_contribution(self):
+        from .ratings import rating_contribution
+        return rating_contribution(self.worker_id, self.rating, self.is_public)
+    
     def save(self, *args, **kwargs):
-        """Update worker's average rating when review is saved"""
-        super().save(*args, **kwargs)
+        """Update worker's rating aggregates incrementally when review is saved"""
+        from django.db import transaction
+        from .ratings import rating_contribution, review_changed
         
-        # Recalculate worker's average rating
-        if hasattr(self.worker, 'worker_profile'):
-            from django.db.models import Avg
-            
-            avg_rating = TaskReview.objects.filter(
-                worker=self.worker,
-                is_public=True
-            ).aggregate(avg_rating=Avg('rating'))['avg_rating']
-            
-            if avg_rating:
-                worker_profile = self.worker.worker_profile
-                worker_profile.average_rating = round(avg_rating, 2)
-                worker_profile.total_reviews = TaskReview.objects.filter(
-                    worker=self.worker,
-                    is_public=True
-                ).count()
-                worker_profile.save(update_fields=['average_rating', 'total_reviews'])
+        if self._state.adding:
+            previous = None
+        elif hasattr(self, '_rating_contribution'):
+            previous = self._rating_contribution
+        else:
+            loaded = TaskReview.objects.filter(pk=self.pk).values('worker_id', 'rating', 'is_public').first()
+            previous = loaded and rating_contribution(**loaded)
+        current = self._current_rating_contribution()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            review_changed(previous, current)
+        self._rating_contribution = current
 
 
 class TaskNotification(models.Model):
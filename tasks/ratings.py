@@ -0,0 +1,98 @@
+# tasks/ratings.py
+"""
+تقييمات العمال المجمّعة
+Worker rating aggregates kept incrementally on WorkerProfile
+(rating_sum / total_reviews / average_rating) with one atomic UPDATE per review
+change, plus a grouped full recompute for repair (manage.py recompute_worker_ratings).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from users.models import WorkerProfile
+from workers.facets import invalidate_facets
+
+
+def rating_contribution(worker_id, rating, is_public):
+    """ما يضيفه التقييم لمجموع العامل: (worker_id, rating) أو None إذا لم يكن عاماً"""
+    if worker_id is None or not is_public:
+        return None
+    return worker_id, rating
+
+
+def apply_rating_delta(worker_id, rating_delta, count_delta):
+    """
+    UPDATE واحد بـ F() - بدون قراءة التقييمات
+    average_rating أولاً: يُحسب من القيم القديمة + الفرق، فيبقى صحيحاً سواء قيّمت قاعدة
+    البيانات SET من القيم القديمة (PostgreSQL/SQLite) أو بالترتيب (MySQL)
+    """
+    if not rating_delta and not count_delta:
+        return 0
+    new_sum = F('rating_sum') + rating_delta
+    new_count = F('total_reviews') + count_delta
+    updated = WorkerProfile.objects.filter(user_id=worker_id).update(
+        average_rating=Coalesce(Round(Cast(new_sum, FloatField()) / NullIf(new_count, 0), 2), 0.0),
+        rating_sum=new_sum,
+        total_reviews=new_count,
+    )
+    # update() لا يرسل post_save → إحصائيات العمال (average_rating) تُبطل هنا
+    transaction.on_commit(invalidate_facets)
+    return updated
+
+
+def review_changed(previous, current):
+    """
+    previous / current: نتيجة rating_contribution قبل وبعد الحفظ/الحذف
+    """
+    if previous == current:
+        return
+    if previous and current and previous[0] == current[0]:
+        apply_rating_delta(current[0], current[1] - previous[1], 0)
+        return
+    if previous:
+        apply_rating_delta(previous[0], -previous[1], -1)
+    if current:
+        apply_rating_delta(current[0], current[1], 1)
+
+
+def recompute_worker_ratings(batch_size=1000):
+    """
+    إعادة حساب كل التقييمات من جدول TaskReview (استعلام مجمّع واحد)
+    يعيد عدد ملفات العمال التي تم تصحيحها
+    """
+    from tasks.models import TaskReview
+
+    public_reviews = TaskReview.objects.filter(is_public=True)
+    totals = {
+        row['worker_id']: (row['rating_sum'], row['total_reviews'])
+        for row in public_reviews.values('worker_id').annotate(
+            rating_sum=Sum('rating'), total_reviews=Count('id')
+        ).order_by()
+    }
+
+    changed = []
+    profiles = WorkerProfile.objects.filter(user_id__in=list(totals)).only(
+        'id', 'user_id', 'rating_sum', 'total_reviews', 'average_rating'
+    )
+    for profile in profiles.iterator(chunk_size=batch_size):
+        rating_sum, total_reviews = totals[profile.user_id]
+        average = (Decimal(rating_sum) / total_reviews).quantize(Decimal('0.01'))
+        if (profile.rating_sum, profile.total_reviews, profile.average_rating) != (rating_sum, total_reviews, average):
+            profile.rating_sum, profile.total_reviews, profile.average_rating = rating_sum, total_reviews, average
+            changed.append(profile)
+    WorkerProfile.objects.bulk_update(
+        changed, ['rating_sum', 'total_reviews', 'average_rating'], batch_size=batch_size
+    )
+
+    # عمال بدون أي تقييم عام
+    reset = WorkerProfile.objects.exclude(
+        user_id__in=public_reviews.values('worker_id')
+    ).exclude(
+        rating_sum=0, total_reviews=0, average_rating=0
+    ).update(rating_sum=0, total_reviews=0, average_rating=0)
+
+    if changed or reset:
+        transaction.on_commit(invalidate_facets)
+    return len(changed) + reset
@@ -5,7 +5,6 @@ from django.utils import timezone
 from .models import ServiceRequest, TaskApplication, TaskReview, TaskNotification
 from users.models import User
 from services.serializers import ServiceCategorySerializer
-from notifications.utils import notify_new_task_available
 
 # --------------------------------------------------
 # معلومات أساسية للمستخدم
@@ -385,51 +384,15 @@ class ServiceRequestCreateSerializer(serializers.ModelSerializer):
     def _notify_relevant_workers(self, task, location_method):
         """
         إشعار العمال المناسبين بمهمة جديدة
+        ✅ المطابقة والإرسال في الخلفية بعد commit (tasks/matching.py)
         """
-        from users.models import User
-        from notifications.utils import notify_new_task_available
+        from .matching import schedule_fan_out
         
         # ✅ فقط إذا كان هناك تصنيف
-        if not task.service_category:
-            return 0
+        if not task.service_category_id:
+            return
         
-        relevant_workers = User.objects.filter(
-            role='worker',
-            is_verified=True,
-            onboarding_completed=True,
-            worker_profile__service_category=task.service_category
-        ).distinct()
-        
-        if task.latitude and task.longitude and location_method == 'current_location':
-            nearby_workers = []
-            for worker in relevant_workers:
-                if hasattr(worker, 'worker_profile') and \
-                worker.worker_profile.location_sharing_enabled and \
-                worker.worker_profile.current_latitude and \
-                worker.worker_profile.current_longitude:
-                    distance = worker.worker_profile.calculate_distance_to(
-                        float(task.latitude), float(task.longitude)
-                    )
-                    if distance and distance <= 30:
-                        nearby_workers.append(worker)
-            workers_to_notify = nearby_workers[:20]
-        else:
-            workers_to_notify = list(relevant_workers[:50])
-
-        notifications_sent = 0
-        for worker in workers_to_notify:
-            try:
-                result = notify_new_task_available(
-                    worker_user=worker,
-                    task=task
-                )
-                if result.get('success'):
-                    notifications_sent += 1
-            except Exception as e:
-                print(f"❌ Failed to notify worker {worker.id}: {e}")
-        
-        print(f"📢 Notified {notifications_sent}/{len(workers_to_notify)} workers")
-        return notifications_sent
+        schedule_fan_out(task, location_method)
 
 # --------------------------------------------------
 # محول المهام المتاحة للعمال
@@ -496,6 +459,8 @@ class AvailableTaskSerializer(serializers.ModelSerializer):
         return None
 
     def get_has_applied(self, obj):
+        if hasattr(obj, 'worker_application_status'):
+            return obj.worker_application_status is not None
         request = self.context.get('request')
         if request:
             worker = request.user
@@ -503,6 +468,8 @@ class AvailableTaskSerializer(serializers.ModelSerializer):
         return False
 
     def get_application_status(self, obj):
+        if hasattr(obj, 'worker_application_status'):
+            return obj.worker_application_status
         request = self.context.get('request')
         if request:
             worker = request.user
@@ -598,6 +565,9 @@ class TaskMapDataSerializer(serializers.ModelSerializer):
         return "help_outline"  # أيقونة افتراضية
 
     def get_distance_km(self, obj):
+        # ✅ محسوبة مسبقاً دفعة واحدة في tasks_map_data (rank_by_distance)
+        if getattr(obj, 'calculated_distance', None) is not None:
+            return round(obj.calculated_distance, 1)
         request = self.context.get('request')
         if not request or request.user.role != 'worker':
             return None
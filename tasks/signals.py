@@ -3,10 +3,11 @@ Signal لزيادة عداد المهام تلقائياً
 النظام الجديد: يدعم المهام المجانية + حزم المهام المدفوعة
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from tasks.models import ServiceRequest
-from payments.models import UserTaskCounter
+from tasks.models import ServiceRequest, TaskReview
+from tasks.ratings import rating_contribution, review_changed
+from payments.accounting import charge_task
 
 
 @receiver(post_save, sender=ServiceRequest)
@@ -17,35 +18,24 @@ def increment_task_counter_on_accept(sender, instance, created, **kwargs):
     الشروط:
     1. حالة المهمة = 'active'
     2. يوجد عامل مقبول (assigned_worker)
+    3. لم تُحتسب المهمة من قبل (counters_charged_at)
     
     يزيد العداد للطرفين:
     - العميل (client)
     - العامل المقبول (assigned_worker)
     
-    المنطق الجديد:
-    - إذا المستخدم في الفترة المجانية → يزيد free_tasks_used
+    المنطق الجديد (payments/accounting.py):
     - إذا المستخدم لديه حزمة نشطة → يزيد tasks_used في الحزمة
+    - إذا المستخدم في الفترة المجانية → يزيد free_tasks_used
+    - كل زيادة تحديث مشروط بـ F() داخل معاملة واحدة
     """
     
-    # ✅ فقط إذا المهمة نشطة وعامل مقبول
-    if instance.status == 'active' and instance.assigned_worker:
-        
-        task_id = instance.id  # ID المهمة الفريد
-        
-        # ================================
-        # 1️⃣ زيادة عداد العميل
-        # ================================
-        client_counter, _ = UserTaskCounter.objects.get_or_create(
-            user=instance.client
-        )
-        
-        client_counter.increment_counter(task_id)
-        
-        # ================================
-        # 2️⃣ زيادة عداد العامل
-        # ================================
-        worker_counter, _ = UserTaskCounter.objects.get_or_create(
-            user=instance.assigned_worker
-        )
-        
-        worker_counter.increment_counter(task_id)
\ No newline at end of file
+    # ✅ فقط عند الانتقال إلى active مع عامل مقبول (مرة واحدة لكل مهمة)
+    if instance.status == 'active' and instance.assigned_worker_id and instance.counters_charged_at is None:
+        charge_task(instance)
+
+
+@receiver(post_delete, sender=TaskReview)
+def remove_review_from_worker_rating(sender, instance, **kwargs):
+    """طرح التقييم المحذوف من مجموع العامل (نفس UPDATE التزايدي في tasks/ratings.py)"""
+    review_changed(rating_contribution(instance.worker_id, instance.rating, instance.is_public), None)
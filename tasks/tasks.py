@@ -0,0 +1,13 @@
+# tasks/tasks.py
+"""
+Celery tasks for tasks
+"""
+from celery import shared_task
+
+from .matching import fan_out_new_task as fan_out
+
+
+@shared_task(ignore_result=True)
+def fan_out_new_task(task_id, location_method=None):
+    """مطابقة العمال مع المهمة الجديدة وإشعارهم"""
+    return fan_out(task_id, location_method)
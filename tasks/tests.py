@@ -1,3 +1,109 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from services.models import ServiceCategory
+from users.models import User, WorkerProfile
+from .models import ServiceRequest, TaskApplication
+
+
+# وسط نواكشوط
+LAT = 18.0858
+LNG = -15.9785
+
+
+class TaskListQueryCountTests(TestCase):
+    """
+    عدد الاستعلامات لا يتغير مع عدد المهام في القائمة (بدون N+1)
+    Each endpoint is measured with 1 task, then with several, and must run the same queries
+    """
+
+    def setUp(self):
+        self.category = ServiceCategory.objects.create(name='Plomberie', name_ar='سباكة')
+        self.client_user = User.objects.create_user(
+            '22200001', 'pass1234', role='client', first_name='Client'
+        )
+        self.worker = User.objects.create_user(
+            '22200002', 'pass1234', role='worker', first_name='Worker', is_verified=True
+        )
+        WorkerProfile.objects.create(
+            user=self.worker, service_category=self.category.name,
+            location_sharing_enabled=True, location_status='active',
+            current_latitude=LAT, current_longitude=LNG
+        )
+        self.applicants = [
+            User.objects.create_user(f'2221000{index}', 'pass1234', role='worker', first_name='Applicant')
+            for index in range(3)
+        ]
+        self.tasks_created = 0
+
+    def add_tasks(self, count):
+        for _ in range(count):
+            index = self.tasks_created
+            task = ServiceRequest.objects.create(
+                client=self.client_user, service_category=self.category,
+                title=f'Task {index}', description='...', budget=1000 + index,
+                location='Tevragh Zeina',
+                latitude=LAT + index * 0.001, longitude=LNG
+            )
+            for applicant in self.applicants[:index % 3 + 1]:
+                TaskApplication.objects.create(service_request=task, worker=applicant)
+            TaskApplication.objects.create(service_request=task, worker=self.worker, is_active=index % 2 == 0)
+            self.tasks_created += 1
+
+    def count_queries(self, user, url):
+        api = APIClient()
+        api.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = api.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, user, url):
+        self.add_tasks(1)
+        single = self.count_queries(user, url)
+        self.add_tasks(5)
+        several = self.count_queries(user, url)
+        self.assertEqual(single, several, f'{url}: {single} queries for 1 task, {several} for 6')
+
+    def test_client_tasks_list(self):
+        self.assertConstantQueries(self.client_user, reverse('my-tasks'))
+
+    def test_available_tasks_db_ordering(self):
+        # بدون موقع للعامل → ترتيب قاعدة البيانات
+        WorkerProfile.objects.filter(user=self.worker).update(current_latitude=None, current_longitude=None)
+        self.assertConstantQueries(self.worker, reverse('available-tasks') + '?sort_by=budget_high')
+
+    def test_available_tasks_sorted_by_distance(self):
+        self.assertConstantQueries(self.worker, reverse('available-tasks') + f'?lat={LAT}&lng={LNG}')
+
+    def test_available_tasks_nearest_with_limit(self):
+        self.assertConstantQueries(
+            self.worker, reverse('available-tasks') + f'?lat={LAT}&lng={LNG}&sort_by=nearest&limit=10'
+        )
+
+    def test_tasks_map_data(self):
+        self.assertConstantQueries(self.worker, reverse('tasks-map-data'))
+
+    def test_tasks_map_data_distances(self):
+        self.add_tasks(2)
+        api = APIClient()
+        api.force_authenticate(self.worker)
+        tasks = api.get(reverse('tasks-map-data')).json()['tasks']
+        self.assertEqual([task['distance_km'] for task in tasks], [0.0, 0.1])
+
+    def test_available_tasks_application_fields(self):
+        self.add_tasks(2)
+        api = APIClient()
+        api.force_authenticate(self.worker)
+        results = api.get(reverse('available-tasks') + f'?lat={LAT}&lng={LNG}').json()['results']
+        by_title = {task['title']: task for task in results}
+
+        self.assertEqual(by_title['Task 0']['applicantsCount'], 2)
+        self.assertTrue(by_title['Task 0']['has_applied'])
+        self.assertEqual(by_title['Task 0']['application_status'], 'pending')
+        self.assertEqual(by_title['Task 1']['applicantsCount'], 2)
+        self.assertFalse(by_title['Task 1']['has_applied'])
+        self.assertIsNone(by_title['Task 1']['application_status'])
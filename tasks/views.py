@@ -8,7 +8,6 @@ from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 import random
-from math import radians, cos, sin, asin, sqrt
 from rest_framework.permissions import IsAuthenticated
 
 from .models import ServiceRequest, TaskApplication, TaskReview, TaskNotification
@@ -26,6 +25,8 @@ from .serializers import (
 )
 from users.models import User
 from services.models import ServiceCategory
+from workers.location_store import apply_live_location
+from core.geo import grid_cells_for_box, expanding_nearest, distances_km, rank_by_distance
 
 
 class ServiceRequestCreateView(generics.CreateAPIView):
@@ -105,12 +106,12 @@ class ClientTasksListView(generics.ListAPIView):
         if user.role == 'client':
             return ServiceRequest.objects.filter(
                 client=user
-            ).select_related('service_category', 'assigned_worker')
+            ).select_related('service_category', 'client', 'assigned_worker').annotate_applications_count()
         
         elif user.role == 'worker':
             return ServiceRequest.objects.filter(
                 assigned_worker=user
-            ).select_related('service_category', 'client')
+            ).select_related('service_category', 'client', 'assigned_worker').annotate_applications_count()
         
         return ServiceRequest.objects.none()
 
@@ -122,12 +123,12 @@ class ServiceRequestDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'client':
-            return ServiceRequest.objects.filter(client=user)
+            return ServiceRequest.objects.filter(client=user).annotate_applications_count()
         elif user.role == 'worker':
             return ServiceRequest.objects.filter(
                 Q(status='published') |
                 Q(assigned_worker=user)
-            )
+            ).annotate_applications_count()
         return ServiceRequest.objects.none()
 
 
@@ -169,7 +170,7 @@ class AvailableTasksListView(generics.ListAPIView):
         
         queryset = ServiceRequest.objects.filter(
             status='published'
-        ).select_related('client', 'service_category')
+        ).select_related('client', 'service_category').annotate_worker_application(self.request.user)
         
         # ✅ فلترة التصنيف (مع السماح بـ "Non classifié")
         category = self.request.query_params.get('category')
@@ -203,7 +204,7 @@ class AvailableTasksListView(generics.ListAPIView):
         # ✅ إذا لم يرسل الفرونت الموقع، جرب جلبه من آخر موقع محفوظ
         if not worker_lat or not worker_lng:
             try:
-                worker_profile = request.user.worker_profile
+                worker_profile = apply_live_location(request.user.worker_profile)
                 if worker_profile.current_latitude and worker_profile.current_longitude:
                     worker_lat = float(worker_profile.current_latitude)
                     worker_lng = float(worker_profile.current_longitude)
@@ -215,18 +216,31 @@ class AvailableTasksListView(generics.ListAPIView):
                 worker_lat = float(worker_lat)
                 worker_lng = float(worker_lng)
                 
-                tasks_with_distance = []
-                for task in queryset:
-                    if task.latitude and task.longitude:
-                        distance = self._calculate_distance(
-                            worker_lat, worker_lng,
-                            float(task.latitude), float(task.longitude)
-                        )
-                        task.calculated_distance = distance
-                    else:
-                        task.calculated_distance = None  # ✅ للمهام بدون موقع
-                    
-                    tasks_with_distance.append(task)
+                # ✅ الأقرب مع limit: فهرس الشبكة بدل مسح كل المهام
+                if sort_by == 'nearest' and limit:
+                    nearest_tasks = self._nearest_tasks(queryset, worker_lat, worker_lng, int(limit))
+                    serializer = self.get_serializer(nearest_tasks, many=True)
+                    return Response({
+                        'count': len(nearest_tasks),
+                        'results': serializer.data
+                    })
+                
+                tasks_with_distance = list(queryset.annotate_applications_count())
+                located_tasks = []
+                for task in tasks_with_distance:
+                    task.calculated_distance = None  # ✅ للمهام بدون موقع
+                    if task.latitude is not None and task.longitude is not None:
+                        located_tasks.append(task)
+                
+                # ✅ حساب كل المسافات دفعة واحدة
+                if located_tasks:
+                    distances = distances_km(
+                        worker_lat, worker_lng,
+                        [task.latitude for task in located_tasks],
+                        [task.longitude for task in located_tasks]
+                    )
+                    for task, distance in zip(located_tasks, distances):
+                        task.calculated_distance = round(float(distance), 2)
                 
                 if sort_by == 'nearest':
                     tasks_with_distance.sort(
@@ -263,6 +277,7 @@ class AvailableTasksListView(generics.ListAPIView):
         else:
             queryset = queryset.order_by('-created_at')
         
+        queryset = queryset.annotate_applications_count()
         if limit:
             queryset = queryset[:int(limit)]
         
@@ -272,15 +287,52 @@ class AvailableTasksListView(generics.ListAPIView):
             'results': serializer.data
         })
         
-    @staticmethod
-    def _calculate_distance(lat1, lng1, lat2, lng2):
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371
-        return round(c * r, 2)
+    def _nearest_tasks(self, queryset, worker_lat, worker_lng, limit):
+        """
+        Top-k nearest tasks using geo_cell + bounding box prefilter
+        
+        يبحث داخل مربع حدودي يتضاعف حجمه حتى يجد limit مهمة ضمن نصف القطر،
+        ثم يجلب كائنات المهام المختارة فقط. المهام بدون موقع تأتي في النهاية.
+        """
+        if limit <= 0:
+            return []
+        
+        located = queryset.filter(latitude__isnull=False, longitude__isnull=False)
+        
+        def fetch_rows(box):
+            candidates = located
+            if box is not None:
+                min_lat, max_lat, min_lng, max_lng = box
+                candidates = candidates.filter(
+                    latitude__range=(min_lat, max_lat),
+                    longitude__range=(min_lng, max_lng)
+                )
+                cells = grid_cells_for_box(min_lat, max_lat, min_lng, max_lng)
+                if cells is not None:
+                    candidates = candidates.filter(geo_cell__in=cells)
+            return candidates.order_by().values_list('id', 'latitude', 'longitude')
+        
+        nearest = expanding_nearest(worker_lat, worker_lng, fetch_rows, limit)
+        
+        tasks_by_id = queryset.annotate_applications_count().in_bulk([task_id for _, task_id in nearest])
+        
+        nearest_tasks = []
+        for distance, task_id in nearest:
+            task = tasks_by_id.get(task_id)
+            if task is not None:
+                task.calculated_distance = round(distance, 2)
+                nearest_tasks.append(task)
+        
+        remaining = limit - len(nearest_tasks)
+        if remaining > 0:
+            unlocated = queryset.filter(
+                Q(latitude__isnull=True) | Q(longitude__isnull=True)
+            ).annotate_applications_count().order_by('-created_at')[:remaining]
+            for task in unlocated:
+                task.calculated_distance = None
+                nearest_tasks.append(task)
+        
+        return nearest_tasks
 
 
 
@@ -328,7 +380,7 @@ class TaskApplicationCreateView(generics.CreateAPIView):
         # ================================
         from payments.models import UserTaskCounter
         
-        worker_counter, _ = UserTaskCounter.objects.get_or_create(user=request.user)
+        worker_counter, _ = UserTaskCounter.for_user(request.user)
         
         if worker_counter.needs_payment:  # ✅ صحيح
             from payments.serializers import UserTaskCounterSerializer
@@ -452,7 +504,7 @@ def accept_worker(request, pk):
     # ================================
     from payments.models import UserTaskCounter
     
-    client_counter, _ = UserTaskCounter.objects.get_or_create(user=request.user)
+    client_counter, _ = UserTaskCounter.for_user(request.user)
     
     if client_counter.needs_payment:
         return Response({
@@ -472,7 +524,7 @@ def accept_worker(request, pk):
     # 4️⃣ التحقق من حد العامل - النظام الجديد
     # ================================
     worker = application.worker
-    worker_counter, _ = UserTaskCounter.objects.get_or_create(user=worker)
+    worker_counter, _ = UserTaskCounter.for_user(worker)
     
     if worker_counter.needs_payment:
         return Response({
@@ -714,7 +766,7 @@ def tasks_map_data(request):
             'tasks': []
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    worker_profile = request.user.worker_profile
+    worker_profile = apply_live_location(request.user.worker_profile)
     
     if not worker_profile.location_sharing_enabled or not worker_profile.current_latitude:
         return Response({
@@ -760,20 +812,24 @@ def tasks_map_data(request):
     worker_lat = float(worker_profile.current_latitude)
     worker_lng = float(worker_profile.current_longitude)
     
+    max_tasks = int(request.query_params.get('max_tasks', 50))
+    
+    # ✅ ترتيب الإحداثيات فقط ثم جلب المهام المختارة
+    rows = list(queryset.order_by().values_list('id', 'latitude', 'longitude'))
+    ranked = rank_by_distance(
+        worker_lat, worker_lng,
+        [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows],
+        radius_km=distance_max, k=max_tasks
+    )
+    tasks_by_id = queryset.in_bulk([task_id for _, task_id in ranked])
+    
     nearby_tasks = []
-    for task in queryset:
-        distance = worker_profile.calculate_distance_to(
-            float(task.latitude), float(task.longitude)
-        )
-        if distance and distance <= distance_max:
+    for distance, task_id in ranked:
+        task = tasks_by_id.get(task_id)
+        if task is not None:
             task.calculated_distance = distance
             nearby_tasks.append(task)
     
-    nearby_tasks.sort(key=lambda x: x.calculated_distance)
-    
-    max_tasks = int(request.query_params.get('max_tasks', 50))
-    nearby_tasks = nearby_tasks[:max_tasks]
-    
     serializer = TaskMapDataSerializer(nearby_tasks, many=True, context={'request': request})
     
     stats = {
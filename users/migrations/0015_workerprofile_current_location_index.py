@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_user_preferred_language'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(fields=['current_latitude', 'current_longitude'], name='users_worke_current_c5527d_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:52
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_sum(apps, schema_editor):
+    """مجموع التقييمات العامة لكل عامل (استعلام مجمّع واحد)"""
+    TaskReview = apps.get_model('tasks', 'TaskReview')
+    WorkerProfile = apps.get_model('users', 'WorkerProfile')
+    totals = TaskReview.objects.filter(is_public=True).values('worker_id').annotate(
+        rating_sum=Sum('rating'), total_reviews=Count('id')
+    ).order_by()
+    for row in totals:
+        WorkerProfile.objects.filter(user_id=row['worker_id']).update(
+            rating_sum=row['rating_sum'], total_reviews=row['total_reviews']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_workerprofile_current_location_index'),
+        ('tasks', '0008_servicerequest_counters_charged_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_sum, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from math import radians, cos, sin, asin, sqrt
+from core.geo import haversine_km
 from .managers import UserManager
 
 
@@ -362,6 +362,8 @@ class WorkerProfile(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(5.0)]
     )
     total_reviews = models.PositiveIntegerField(default=0)
+    # مجموع التقييمات العامة (average_rating = rating_sum / total_reviews) - tasks/ratings.py
+    rating_sum = models.PositiveIntegerField(default=0)
     
     # الحالة
     is_verified = models.BooleanField(default=False)
@@ -377,30 +379,59 @@ class WorkerProfile(models.Model):
         verbose_name = "Worker Profile"
         verbose_name_plural = "Worker Profiles"
         ordering = ['-created_at']
+        indexes = [
+            # ✅ فلترة المربع الحدودي لبحث "الأقرب"
+            models.Index(fields=['current_latitude', 'current_longitude']),
+        ]
     
     def __str__(self):
         return f"Worker: {self.user.get_full_name()} - {self.service_category}"
     
+    # تُكتب فقط بتحديث ذري من tasks/ratings.py (لا نعيد كتابة قيم قديمة من الذاكرة)
+    RATING_FIELDS = {'rating_sum', 'total_reviews', 'average_rating'}
+    
     def save(self, *args, **kwargs):
         if not self.pk:
             self.user.onboarding_completed = True
             self.user.save(update_fields=['onboarding_completed'])
+        elif kwargs.get('update_fields') is None and not self._state.adding:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     # ====== Methods الخاصة بنظام المواقع ======
     def update_current_location(self, latitude, longitude, accuracy=None):
+        """
+        تحديث الموقع الحالي عبر مخزن المواقع الحية
+        أول موقع (أو بعد انقطاع) يُكتب مباشرة، والباقي يُجمع ويُكتب دورياً
+        """
         if not self.location_sharing_enabled:
             return False
+        from workers.location_store import get_location_store, start_flusher
+        
+        write_through = self.current_latitude is None or self.location_status != 'active'
+        
         self.current_latitude = latitude
         self.current_longitude = longitude
         self.location_last_updated = timezone.now()
         if accuracy is not None:
             self.location_accuracy = accuracy
         self.location_status = 'active'
-        self.save(update_fields=[
-            'current_latitude', 'current_longitude',
-            'location_last_updated', 'location_accuracy', 'location_status'
-        ])
+        
+        store = get_location_store()
+        store.record(
+            self.user_id, latitude, longitude, accuracy,
+            recorded_at=self.location_last_updated.timestamp(),
+            dirty=not write_through
+        )
+        if write_through:
+            self.save(update_fields=[
+                'current_latitude', 'current_longitude',
+                'location_last_updated', 'location_accuracy', 'location_status'
+            ])
+        start_flusher()
         return True
     
     def toggle_location_sharing(self, enabled):
@@ -410,6 +441,8 @@ class WorkerProfile(models.Model):
             self.location_status = 'active' if self.current_latitude else 'disabled'
         else:
             self.location_status = 'disabled'
+            from workers.location_store import get_location_store
+            get_location_store().remove(self.user_id)
         self.save(update_fields=[
             'location_sharing_enabled', 'location_sharing_updated_at', 'location_status'
         ])
@@ -433,21 +466,11 @@ class WorkerProfile(models.Model):
     def calculate_distance_to(self, target_latitude, target_longitude):
         if not self.current_latitude or not self.current_longitude:
             return None
-        return self._haversine_distance(
+        return haversine_km(
             float(self.current_latitude), float(self.current_longitude),
             float(target_latitude), float(target_longitude)
         )
     
-    @staticmethod
-    def _haversine_distance(lat1, lng1, lat2, lng2):
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371
-        return c * r
-    
     @property
     def is_currently_available_with_location(self):
         return (
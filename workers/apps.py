@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class WorkersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'workers'
\ No newline at end of file
+    name = 'workers'
+
+    def ready(self):
+        # ✅ إبطال كاش الفلاتر والإحصائيات
+        import workers.signals
@@ -0,0 +1,214 @@
+# workers/facets.py
+"""
+فلاتر البحث وإحصائيات العمال المخزنة مؤقتاً
+Cached facet catalogue for the public worker endpoints (search/filters/, stats/):
+computed with grouped queries on a cache miss, kept for CACHE_SECONDS and
+dropped by workers/signals.py when workers, services or categories change
+(and by tasks/ratings.py, whose update() calls send no post_save).
+Each entry carries an ETag and Last-Modified so unchanged facets return 304.
+
+الإبطال يحذف المفتاح من الكاش المُعدّ في CACHES: مع LocMemCache (الافتراضي) يُحذف فقط
+من العملية التي عدّلت البيانات، والعمليات الأخرى تعرض النسخة القديمة حتى CACHE_SECONDS.
+كاش مشترك (Redis/Memcached) يجعل الإبطال فورياً في كل العمليات.
+"""
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+DEFAULT_WORKER_FACETS = {
+    'CACHE_SECONDS': 300,
+    'PRICE_HISTOGRAM_BUCKETS': 10,
+}
+
+FACET_NAMES = ('search_filters', 'worker_stats')
+
+SORT_OPTIONS = ['nearest', 'price_asc', 'price_desc', 'rating']
+
+
+def facets_config():
+    return {**DEFAULT_WORKER_FACETS, **getattr(settings, 'WORKER_FACETS', {})}
+
+
+def _cache_key(name):
+    return f'workers:facets:{name}'
+
+
+# ========================================
+# Compute
+# ========================================
+
+def normalize_area(area):
+    """'  Tevragh  Zeina , Nouakchott' → 'Tevragh Zeina' (المنطقة الرئيسية فقط)"""
+    return re.sub(r'\s+', ' ', (area or '').split(',')[0]).strip()
+
+
+def normalized_areas(raw_areas):
+    """مناطق فريدة بدون تمييز حالة الأحرف، مرتبة أبجدياً (أول كتابة تبقى)"""
+    areas = {}
+    for area in raw_areas:
+        area = normalize_area(area)
+        if area:
+            areas.setdefault(area.casefold(), area)
+    return sorted(areas.values(), key=str.casefold)
+
+
+def price_histogram(services, min_price, max_price, buckets):
+    """
+    [{min, max, count}] بفئات متساوية العرض - استعلام مجمّع واحد
+    """
+    if min_price is None or max_price is None:
+        return []
+    min_price, max_price = int(min_price), int(max_price)
+    width = max((max_price - min_price + buckets) // buckets, 1)
+    edges = [min_price + width * index for index in range(buckets + 1)]
+    edges[-1] = max(edges[-1], max_price + 1)
+
+    counts = services.aggregate(**{
+        f'bucket_{index}': Count('id', filter=Q(base_price__gte=low, base_price__lt=high))
+        for index, (low, high) in enumerate(zip(edges, edges[1:]))
+    })
+    return [
+        {'min': low, 'max': high, 'count': counts[f'bucket_{index}']}
+        for index, (low, high) in enumerate(zip(edges, edges[1:]))
+    ]
+
+
+def compute_search_filters():
+    from services.models import ServiceCategory
+    from users.models import WorkerProfile
+    from .models import WorkerService
+
+    categories = list(ServiceCategory.objects.filter(
+        is_active=True,
+        workerservice__isnull=False
+    ).distinct().values('name', 'name_ar').order_by('name'))
+
+    areas = normalized_areas(WorkerProfile.objects.filter(
+        user__role='worker',
+        user__is_verified=True,
+        user__onboarding_completed=True,
+        is_available=True,
+        service_area__isnull=False
+    ).order_by().values_list('service_area', flat=True).distinct())
+
+    services = WorkerService.objects.filter(
+        is_active=True,
+        worker__role='worker',
+        worker__is_verified=True
+    )
+    price_stats = services.aggregate(
+        min_price=Min('base_price'),
+        max_price=Max('base_price'),
+        avg_price=Avg('base_price')
+    )
+
+    return {
+        'categories': ['Toutes Catégories'] + [cat['name'] for cat in categories],
+        'nouakchottAreas': ['Toutes Zones'] + areas,
+        'allServices': [
+            {
+                'icon': 'cleaning_services',
+                'name': cat['name'],
+                'category': cat['name']
+            } for cat in categories
+        ],
+        'price_range': {
+            'min': int(price_stats['min_price']) if price_stats['min_price'] else 500,
+            'max': int(price_stats['max_price']) if price_stats['max_price'] else 10000,
+            'average': int(price_stats['avg_price']) if price_stats['avg_price'] else 2500
+        },
+        'price_histogram': price_histogram(
+            services, price_stats['min_price'], price_stats['max_price'],
+            facets_config()['PRICE_HISTOGRAM_BUCKETS']
+        ),
+        'sort_options': SORT_OPTIONS,
+    }
+
+
+def compute_worker_stats():
+    from services.models import ServiceCategory
+    from users.models import WorkerProfile
+
+    # ✅ كل العدادات في استعلام واحد
+    stats = WorkerProfile.objects.filter(
+        user__role='worker',
+        user__is_verified=True,
+        user__onboarding_completed=True,
+        is_available=True
+    ).aggregate(
+        total_workers=Count('id'),
+        online_workers=Count('id', filter=Q(is_online=True)),
+        verified_workers=Count('id', filter=Q(is_verified=True)),
+        avg_rating=Avg('average_rating', filter=Q(average_rating__gt=0)),
+        total_jobs=Sum('total_jobs_completed'),
+    )
+
+    top_categories = ServiceCategory.objects.filter(
+        workerservice__is_active=True,
+        workerservice__worker__role='worker',
+        workerservice__worker__is_verified=True,
+        workerservice__worker__onboarding_completed=True
+    ).annotate(
+        worker_count=Count('workerservice__worker', distinct=True)
+    ).order_by('-worker_count')[:5].values('name', 'worker_count')
+
+    return {
+        'total_workers': stats['total_workers'],
+        'online_workers': stats['online_workers'],
+        'verified_workers': stats['verified_workers'],
+        'average_rating': round(float(stats['avg_rating']), 1) if stats['avg_rating'] else 0,
+        'total_jobs_completed': stats['total_jobs'] or 0,
+        'top_categories': list(top_categories)
+    }
+
+
+COMPUTE = {
+    'search_filters': compute_search_filters,
+    'worker_stats': compute_worker_stats,
+}
+
+
+# ========================================
+# Cache
+# ========================================
+
+def get_facet(name):
+    """
+    {'data', 'etag', 'last_modified'} من الكاش، أو يُحسب ويُخزن
+    ETag = بصمة المحتوى: إعادة الحساب بنفس النتيجة لا تُبطل نسخة العميل
+    """
+    entry = cache.get(_cache_key(name))
+    if entry is None:
+        data = COMPUTE[name]()
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+        # نفس المحتوى → نفس Last-Modified (البصمة السابقة لا تُحذف عند الإبطال)
+        stamp_key = f'{_cache_key(name)}:stamp'
+        stamp = cache.get(stamp_key)
+        if stamp is None or stamp[0] != etag:
+            stamp = (etag, timezone.now().replace(microsecond=0))
+            cache.set(stamp_key, stamp, None)
+
+        entry = {'data': data, 'etag': etag, 'last_modified': stamp[1]}
+        cache.set(_cache_key(name), entry, facets_config()['CACHE_SECONDS'])
+    return entry
+
+
+def invalidate_facets():
+    cache.delete_many([_cache_key(name) for name in FACET_NAMES])
+
+
+def facet_etag(name):
+    """etag_func / last_modified_func لـ django.views.decorators.http.condition"""
+    return lambda request, *args, **kwargs: get_facet(name)['etag']
+
+
+def facet_last_modified(name):
+    return lambda request, *args, **kwargs: get_facet(name)['last_modified']
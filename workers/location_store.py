@@ -0,0 +1,384 @@
+# workers/location_store.py
+"""
+Live worker location store
+مخزن المواقع الحية للعمال: يمتص تحديثات GPS المتكررة في الذاكرة
+ويكتب آخر موقع لكل عامل في WorkerProfile دورياً (دفعة واحدة)
+
+Backends (settings.LIVE_LOCATION_STORE['BACKEND']):
+- 'local': قاموس داخل العملية (افتراضي)
+- 'redis': أي عميل يدعم أوامر hash/set الأساسية (redis-py أو LocalRedis)
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+
+from core.background import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL_SECONDS = 60
+
+
+def _position(latitude, longitude, accuracy, recorded_at):
+    return {
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'accuracy': accuracy,
+        'recorded_at': recorded_at if recorded_at is not None else time.time(),
+    }
+
+
+class LocationStore:
+    """Common interface + box lookup for all backends"""
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+
+    def record(self, worker_id, latitude, longitude, accuracy=None, recorded_at=None, dirty=True):
+        raise NotImplementedError
+
+    def get(self, worker_id):
+        raise NotImplementedError
+
+    def get_many(self, worker_ids):
+        raise NotImplementedError
+
+    def all(self):
+        raise NotImplementedError
+
+    def remove(self, worker_id):
+        raise NotImplementedError
+
+    def pop_dirty(self):
+        """Coalesced positions not yet written to the DB: {worker_id: position}"""
+        raise NotImplementedError
+
+    def within_box(self, box):
+        """{worker_id: position} inside (min_lat, max_lat, min_lng, max_lng), or all when box is None"""
+        positions = self.all()
+        if box is None:
+            return positions
+        min_lat, max_lat, min_lng, max_lng = box
+        return {
+            worker_id: position for worker_id, position in positions.items()
+            if min_lat <= position['latitude'] <= max_lat and min_lng <= position['longitude'] <= max_lng
+        }
+
+
+class LocalLocationStore(LocationStore):
+    """In-process backend - كل عملية لها نسختها الخاصة"""
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS):
+        super().__init__(flush_interval)
+        self._positions = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def record(self, worker_id, latitude, longitude, accuracy=None, recorded_at=None, dirty=True):
+        with self._lock:
+            self._positions[worker_id] = _position(latitude, longitude, accuracy, recorded_at)
+            if dirty:
+                self._dirty.add(worker_id)
+
+    def get(self, worker_id):
+        return self._positions.get(worker_id)
+
+    def get_many(self, worker_ids):
+        positions = self._positions
+        return {worker_id: positions[worker_id] for worker_id in worker_ids if worker_id in positions}
+
+    def all(self):
+        with self._lock:
+            return dict(self._positions)
+
+    def remove(self, worker_id):
+        with self._lock:
+            self._positions.pop(worker_id, None)
+            self._dirty.discard(worker_id)
+
+    def pop_dirty(self):
+        with self._lock:
+            pending = {worker_id: self._positions[worker_id] for worker_id in self._dirty}
+            self._dirty.clear()
+        return pending
+
+
+class RedisLocationStore(LocationStore):
+    """
+    Shared backend over a Redis-compatible client
+    يستخدم فقط: hset / hget / hmget / hgetall / hdel / sadd / srem / smembers
+    """
+
+    def __init__(self, client, prefix='khidma:live_locations',
+                 flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS):
+        super().__init__(flush_interval)
+        self.client = client
+        self.positions_key = prefix
+        self.dirty_key = f"{prefix}:dirty"
+
+    def record(self, worker_id, latitude, longitude, accuracy=None, recorded_at=None, dirty=True):
+        position = _position(latitude, longitude, accuracy, recorded_at)
+        self.client.hset(self.positions_key, worker_id, json.dumps(position))
+        if dirty:
+            self.client.sadd(self.dirty_key, worker_id)
+
+    def get(self, worker_id):
+        raw = self.client.hget(self.positions_key, worker_id)
+        return json.loads(raw) if raw else None
+
+    def get_many(self, worker_ids):
+        worker_ids = list(worker_ids)
+        if not worker_ids:
+            return {}
+        values = self.client.hmget(self.positions_key, worker_ids)
+        return {
+            worker_id: json.loads(raw)
+            for worker_id, raw in zip(worker_ids, values) if raw
+        }
+
+    def all(self):
+        return {
+            int(worker_id): json.loads(raw)
+            for worker_id, raw in self.client.hgetall(self.positions_key).items()
+        }
+
+    def remove(self, worker_id):
+        self.client.hdel(self.positions_key, worker_id)
+        self.client.srem(self.dirty_key, worker_id)
+
+    def pop_dirty(self):
+        # srem قبل hmget: أي تحديث لاحق يعيد العامل لمجموعة dirty
+        worker_ids = [int(worker_id) for worker_id in self.client.smembers(self.dirty_key)]
+        if not worker_ids:
+            return {}
+        self.client.srem(self.dirty_key, *worker_ids)
+        return self.get_many(worker_ids)
+
+
+class LocalRedis:
+    """
+    Minimal in-process stand-in for the Redis commands RedisLocationStore uses
+    بديل محلي لـ Redis (للتطوير والاختبارات) - REDIS_URL = 'local://'
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def hset(self, key, field, value):
+        with self._lock:
+            self._hashes.setdefault(key, {})[self._encode(field)] = self._encode(value)
+        return 1
+
+    def hget(self, key, field):
+        return self._hashes.get(key, {}).get(self._encode(field))
+
+    def hmget(self, key, fields):
+        values = self._hashes.get(key, {})
+        return [values.get(self._encode(field)) for field in fields]
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            values = self._hashes.get(key, {})
+            return sum(1 for field in fields if values.pop(self._encode(field), None) is not None)
+
+    def sadd(self, key, *members):
+        with self._lock:
+            self._sets.setdefault(key, set()).update(self._encode(member) for member in members)
+        return len(members)
+
+    def srem(self, key, *members):
+        with self._lock:
+            values = self._sets.get(key, set())
+            removed = 0
+            for member in members:
+                member = self._encode(member)
+                if member in values:
+                    values.discard(member)
+                    removed += 1
+            return removed
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._sets.get(key, set()))
+
+
+def _build_store():
+    config = getattr(settings, 'LIVE_LOCATION_STORE', {})
+    backend = config.get('BACKEND', 'local')
+    flush_interval = config.get('FLUSH_INTERVAL_SECONDS', DEFAULT_FLUSH_INTERVAL_SECONDS)
+
+    if backend == 'redis':
+        url = config.get('REDIS_URL', 'local://')
+        if url.startswith('local://'):
+            client = LocalRedis()
+        else:
+            import redis
+            client = redis.Redis.from_url(url)
+        return RedisLocationStore(client, flush_interval=flush_interval)
+
+    return LocalLocationStore(flush_interval=flush_interval)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_location_store():
+    """Process-wide store configured from settings"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _build_store()
+    return _store
+
+
+def flush_locations(store=None):
+    """
+    Write coalesced positions to WorkerProfile in one bulk_update
+    كتابة آخر موقع لكل عامل في قاعدة البيانات
+    """
+    from users.models import WorkerProfile
+
+    store = store or get_location_store()
+    pending = store.pop_dirty()
+    if not pending:
+        return 0
+
+    profiles = list(WorkerProfile.objects.filter(
+        user_id__in=list(pending),
+        location_sharing_enabled=True
+    ).only('id', 'user_id'))
+
+    for profile in profiles:
+        position = pending[profile.user_id]
+        profile.current_latitude = Decimal(str(round(position['latitude'], 6)))
+        profile.current_longitude = Decimal(str(round(position['longitude'], 6)))
+        profile.location_last_updated = datetime.fromtimestamp(position['recorded_at'], tz=dt_timezone.utc)
+        if position['accuracy'] is not None:
+            profile.location_accuracy = position['accuracy']
+        profile.location_status = 'active'
+
+    WorkerProfile.objects.bulk_update(profiles, [
+        'current_latitude', 'current_longitude',
+        'location_last_updated', 'location_accuracy', 'location_status'
+    ], batch_size=500)
+
+    logger.info("Flushed %s live worker locations", len(profiles))
+    return len(profiles)
+
+
+def _flush_tick():
+    # دفعة واحدة لكل دورة: الخيط ينام flush_interval ثم يكتب ما تجمّع
+    flush_locations()
+    return False
+
+
+_background_flusher = BackgroundWorker(
+    'live-location-flusher',
+    step=_flush_tick,
+    idle_timeout=lambda: get_location_store().flush_interval,
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    """آخر المواقع في ذاكرة العملية تُكتب قبل الإيقاف (إعادة التشغيل / النشر)"""
+    if _store is None:
+        return
+    try:
+        flush_locations(_store)
+    except Exception as e:
+        logger.error(f"Live location flush at exit failed: {str(e)}")
+
+
+def start_flusher():
+    """
+    Periodic flush thread for this process (started on the first ping)
+    آخر المواقع تُكتب حتى لو توقف العامل عن الإرسال
+    """
+    _background_flusher.start()
+
+
+def _is_current(position, db_updated_at):
+    return db_updated_at is None or position['recorded_at'] >= db_updated_at.timestamp()
+
+
+def located_worker_rows(queryset, box=None, store=None):
+    """
+    (user_id, lat, lng) for the workers of a User queryset inside box (None = everywhere)
+    - الموقع الحي من المخزن أولاً، حتى لو كان صف WorkerProfile قديماً أو خارج المربع
+    - إحداثيات قاعدة البيانات فقط للعمال غير الموجودين في المخزن (أو إذا كانت أحدث)
+    استعلامان: أهلية العمال الموجودين في المخزن + صفوف قاعدة البيانات داخل المربع
+    """
+    store = store or get_location_store()
+    live = store.within_box(box)
+
+    rows = []
+    if live:
+        eligible = queryset.filter(id__in=list(live)).order_by().values_list(
+            'id', 'worker_profile__location_last_updated'
+        ).distinct()
+        rows = [
+            (worker_id, live[worker_id]['latitude'], live[worker_id]['longitude'])
+            for worker_id, updated_at in eligible
+            if _is_current(live[worker_id], updated_at)
+        ]
+
+    db_rows = queryset
+    if box is not None:
+        min_lat, max_lat, min_lng, max_lng = box
+        db_rows = db_rows.filter(
+            worker_profile__current_latitude__range=(min_lat, max_lat),
+            worker_profile__current_longitude__range=(min_lng, max_lng)
+        )
+    db_rows = list(db_rows.order_by().values_list(
+        'id', 'worker_profile__current_latitude', 'worker_profile__current_longitude',
+        'worker_profile__location_last_updated'
+    ).distinct())
+
+    # العمال الذين تحركوا خارج المربع: موقعهم الحي أحدث من صف قاعدة البيانات
+    stored = store.get_many([row[0] for row in db_rows if row[0] not in live])
+    stored.update(live)
+    rows.extend(
+        (worker_id, latitude, longitude)
+        for worker_id, latitude, longitude, updated_at in db_rows
+        if worker_id not in stored or not _is_current(stored[worker_id], updated_at)
+    )
+    return rows
+
+
+def apply_live_location(worker_profile):
+    """
+    Overlay the in-memory position on a WorkerProfile instance (no DB write)
+    """
+    position = get_location_store().get(worker_profile.user_id)
+    if not position or not worker_profile.location_sharing_enabled:
+        return worker_profile
+
+    recorded_at = datetime.fromtimestamp(position['recorded_at'], tz=dt_timezone.utc)
+    if worker_profile.location_last_updated and worker_profile.location_last_updated >= recorded_at:
+        return worker_profile
+
+    worker_profile.current_latitude = Decimal(str(round(position['latitude'], 6)))
+    worker_profile.current_longitude = Decimal(str(round(position['longitude'], 6)))
+    worker_profile.location_last_updated = recorded_at
+    if position['accuracy'] is not None:
+        worker_profile.location_accuracy = position['accuracy']
+    return worker_profile
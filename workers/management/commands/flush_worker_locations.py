@@ -0,0 +1,35 @@
+# workers/management/commands/flush_worker_locations.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workers.location_store import LocalLocationStore, flush_locations, get_location_store
+
+
+class Command(BaseCommand):
+    """
+    كتابة المواقع الحية المجمّعة في WorkerProfile
+    Flush coalesced live worker positions to the database (redis backend only)
+    مع الـ backend المحلي كل عملية تكتب مواقعها عبر خيط live-location-flusher
+    """
+    help = 'Flush live worker locations from the location store to WorkerProfile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing every --interval seconds')
+        parser.add_argument('--interval', type=int, default=None)
+
+    def handle(self, *args, **options):
+        store = get_location_store()
+        if isinstance(store, LocalLocationStore):
+            raise CommandError(
+                "LIVE_LOCATION_STORE['BACKEND'] is 'local': positions live in each web process "
+                "and are flushed by its own background thread, not by this command"
+            )
+        interval = options['interval'] or store.flush_interval
+
+        while True:
+            flushed = flush_locations(store)
+            self.stdout.write(f'✅ {flushed} worker location(s) flushed')
+            if not options['loop']:
+                return
+            time.sleep(interval)
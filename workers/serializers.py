@@ -1,6 +1,7 @@
 # workers/serializers.py - النسخة المحدثة مع حقول الموقع
 from rest_framework import serializers
 from decimal import Decimal, InvalidOperation
+from django.db.models import Prefetch
 from .models import WorkerService, WorkerGallery, WorkerSettings
 from users.models import User
 from services.serializers import ServiceCategorySerializer
@@ -124,6 +125,27 @@ class LocationToggleSerializer(serializers.Serializer):
 # تحديث WorkerProfileListSerializer
 # ============================
 
+def active_services_prefetch():
+    """
+    الخدمات النشطة مع التصنيف في استعلام واحد لكل الصفحة
+    تُقرأ في WorkerProfileListSerializer.get_services من obj.active_services
+    """
+    return Prefetch(
+        'worker_services',
+        queryset=WorkerService.objects.filter(is_active=True).select_related('category'),
+        to_attr='active_services'
+    )
+
+
+def favorite_worker_ids(request):
+    """معرفات العمال المفضلين للعميل الحالي (استعلام واحد) - set فارغ لغير العملاء"""
+    user = getattr(request, 'user', None)
+    if not (user and user.is_authenticated and user.role == 'client'):
+        return set()
+    from clients.models import FavoriteWorker
+    return set(FavoriteWorker.objects.filter(client=user).values_list('worker_id', flat=True))
+
+
 class WorkerProfileListSerializer(serializers.ModelSerializer):
     """
     Flutter-compatible serializer for worker list/search
@@ -291,25 +313,21 @@ class WorkerProfileListSerializer(serializers.ModelSerializer):
 
     def get_isFavorite(self, obj):
         """تحقق من حالة المفضلة"""
-        request = self.context.get('request')
-        
-        # التحقق من وجود user مسجل الدخول
-        if request and request.user and request.user.is_authenticated and request.user.role == 'client':
-            from clients.models import FavoriteWorker
-            is_favorite = FavoriteWorker.objects.filter(
-                client=request.user,
-                worker=obj
-            ).exists()
-            return is_favorite
-        
-        # في حالة عدم وجود user أو لم يكن مسجل دخول
-        return False
+        # ✅ مجموعة المفضلين تُحمّل مرة واحدة لكل طلب (context مشترك بين عناصر القائمة)
+        favorite_ids = self.context.get('favorite_worker_ids')
+        if favorite_ids is None:
+            favorite_ids = self.context['favorite_worker_ids'] = favorite_worker_ids(
+                self.context.get('request')
+            )
+        return obj.id in favorite_ids
 
     def get_services(self, obj):
         """احصل على قائمة الخدمات"""
-        if hasattr(obj, 'worker_services') and obj.worker_services.exists():
-            return [service.category.name for service in obj.worker_services.filter(is_active=True)]
-        return []
+        # ✅ من active_services_prefetch() إن وُجد
+        services = getattr(obj, 'active_services', None)
+        if services is None:
+            services = obj.worker_services.filter(is_active=True).select_related('category')
+        return [service.category.name for service in services]
 # ============================
 # تحديث WorkerProfileSerializer
 # ============================
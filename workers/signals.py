@@ -0,0 +1,36 @@
+"""
+إبطال كاش فلاتر البحث وإحصائيات العمال
+Drops the cached facets (workers/facets.py) when a worker profile, a worker
+service or a service category changes.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.models import ServiceCategory
+from users.models import WorkerProfile
+from workers.facets import invalidate_facets
+from workers.models import WorkerService
+
+# حقول WorkerProfile التي تظهر في الفلاتر/الإحصائيات
+# (تحديثات الموقع و last_seen لا تُبطل الكاش)
+FACET_PROFILE_FIELDS = {
+    'service_area', 'service_category', 'is_available', 'is_online',
+    'is_verified', 'average_rating', 'total_jobs_completed',
+}
+
+
+@receiver(post_save, sender=WorkerProfile)
+def invalidate_facets_on_profile_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not FACET_PROFILE_FIELDS & set(update_fields):
+        return
+    invalidate_facets()
+
+
+@receiver(post_save, sender=WorkerService)
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=WorkerProfile)
+@receiver(post_delete, sender=WorkerService)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_facets_on_change(sender, **kwargs):
+    invalidate_facets()
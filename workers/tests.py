@@ -1,3 +1,72 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from services.models import ServiceCategory
+from tasks.models import ServiceRequest, TaskApplication
+from users.models import User, WorkerProfile
+
+
+# وسط نواكشوط
+LAT = 18.0858
+LNG = -15.9785
+
+
+class NearbyTasksQueryCountTests(TestCase):
+    """get_nearby_tasks: نفس عدد الاستعلامات لمهمة واحدة أو لعدة مهام"""
+
+    def setUp(self):
+        self.category = ServiceCategory.objects.create(name='Plomberie', name_ar='سباكة')
+        self.client_user = User.objects.create_user(
+            '22200001', 'pass1234', role='client', first_name='Client'
+        )
+        self.worker = User.objects.create_user(
+            '22200002', 'pass1234', role='worker', first_name='Worker', is_verified=True
+        )
+        WorkerProfile.objects.create(
+            user=self.worker, service_category=self.category.name,
+            location_sharing_enabled=True, location_status='active',
+            current_latitude=LAT, current_longitude=LNG
+        )
+        self.applicant = User.objects.create_user(
+            '22210000', 'pass1234', role='worker', first_name='Applicant'
+        )
+        self.tasks_created = 0
+
+    def add_tasks(self, count):
+        for _ in range(count):
+            index = self.tasks_created
+            task = ServiceRequest.objects.create(
+                client=self.client_user, service_category=self.category,
+                title=f'Task {index}', description='...', budget=1000 + index,
+                location='Tevragh Zeina',
+                latitude=LAT + index * 0.001, longitude=LNG
+            )
+            TaskApplication.objects.create(service_request=task, worker=self.applicant)
+            if index % 2 == 0:
+                TaskApplication.objects.create(service_request=task, worker=self.worker)
+            self.tasks_created += 1
+
+    def count_queries(self):
+        api = APIClient()
+        api.force_authenticate(self.worker)
+        with CaptureQueriesContext(connection) as context:
+            response = api.get(reverse('get-nearby-tasks'))
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries), response.json()['data']['tasks']
+
+    def test_nearby_tasks_query_count(self):
+        self.add_tasks(1)
+        single, _ = self.count_queries()
+        self.add_tasks(5)
+        several, tasks = self.count_queries()
+
+        self.assertEqual(single, several, f'{single} queries for 1 task, {several} for 6')
+        self.assertEqual(len(tasks), 6)
+        by_title = {task['title']: task for task in tasks}
+        self.assertEqual(by_title['Task 0']['applicantsCount'], 2)
+        self.assertTrue(by_title['Task 0']['has_applied'])
+        self.assertEqual(by_title['Task 1']['applicantsCount'], 1)
+        self.assertFalse(by_title['Task 1']['has_applied'])
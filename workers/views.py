@@ -6,9 +6,10 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg, Min, Max, Sum, Count
-from math import radians, cos, sin, asin, sqrt
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from datetime import timedelta
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
@@ -24,12 +25,16 @@ from .serializers import (
     WorkerServiceSerializer,
     WorkerSettingsSerializer,
     WorkerLocationSerializer,
-    LocationToggleSerializer
+    LocationToggleSerializer,
+    active_services_prefetch,
+    favorite_worker_ids
 )
 from users.models import User
-from services.models import ServiceCategory
 from tasks.models import ServiceRequest
 from tasks.serializers import AvailableTaskSerializer
+from core.geo import bounding_box, rank_by_distance, expanding_nearest
+from .location_store import apply_live_location, located_worker_rows
+from .facets import facet_etag, facet_last_modified, get_facet
 
 # ==================== النسخة الأصلية ====================
 
@@ -41,7 +46,9 @@ class WorkerListView(generics.ListAPIView):
         is_suspended=False
     ).exclude(
         is_active=False
-    ).select_related('worker_profile').prefetch_related('worker_services__category')
+    ).select_related('worker_profile').prefetch_related(
+        'worker_services__category', active_services_prefetch()
+    )
     
     serializer_class = WorkerProfileListSerializer
     permission_classes = [AllowAny]
@@ -58,6 +65,12 @@ class WorkerListView(generics.ListAPIView):
     ordering_fields = ['worker_profile__average_rating', 'worker_profile__total_jobs_completed', 'worker_profile__last_seen']
     ordering = ['-worker_profile__is_online', '-worker_profile__average_rating']
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # ✅ مفضلة العميل مرة واحدة لكل الصفحة
+        context['favorite_worker_ids'] = favorite_worker_ids(self.request)
+        return context
+
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -127,71 +140,22 @@ class WorkerListView(generics.ListAPIView):
             client_lat = request.query_params.get('lat')
             client_lng = request.query_params.get('lng')
             
-            if client_lat and client_lng:
-                try:
-                    client_lat = float(client_lat)
-                    client_lng = float(client_lng)
-                    
-                    # فلترة العمال المتاحين + موقع نشط
-                    queryset = queryset.filter(
-                        worker_profile__is_available=True,
-                        worker_profile__current_latitude__isnull=False,
-                        worker_profile__current_longitude__isnull=False,
-                        worker_profile__location_sharing_enabled=True,
-                        worker_profile__location_status='active'
-                    )
-                    
-                    if not queryset.exists():
-                        return Response({
-                            'count': 0,
-                            'results': [],
-                            'message': 'No workers with active location sharing in your area'
-                        })
-                    
-                    workers_with_distance = []
-                    for worker in queryset:
-                        try:
-                            distance = self.calculate_distance(
-                                client_lat, client_lng,
-                                float(worker.worker_profile.current_latitude),
-                                float(worker.worker_profile.current_longitude)
-                            )
-                            workers_with_distance.append((worker, distance))
-                        except (ValueError, TypeError):
-                            workers_with_distance.append((worker, 999))
-                    
-                    workers_with_distance.sort(key=lambda x: x[1])
-                    queryset = [worker for worker, distance in workers_with_distance]
-                    
-                except (ValueError, TypeError):
-                    return Response({
-                        'error': 'Invalid coordinates',
-                        'message': 'lat and lng must be valid numbers'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            else:
+            if not (client_lat and client_lng):
                 return Response({
                     'error': 'Missing coordinates',
                     'message': 'lat and lng parameters are required for nearest sorting'
                 }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # معالجة النتائج المرتبة حسب المسافة
-        if sort_by == 'nearest' and isinstance(queryset, list):
-            page_size = api_settings.PAGE_SIZE or 10
-            page_number = request.query_params.get('page', 1)
-            try:
-                page_number = int(page_number)
-            except ValueError:
-                page_number = 1
             
-            start = (page_number - 1) * page_size
-            end = start + page_size
-            page_queryset = queryset[start:end]
+            try:
+                client_lat = float(client_lat)
+                client_lng = float(client_lng)
+            except (ValueError, TypeError):
+                return Response({
+                    'error': 'Invalid coordinates',
+                    'message': 'lat and lng must be valid numbers'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            serializer = self.get_serializer(page_queryset, many=True)
-            return Response({
-                'count': len(queryset),
-                'results': serializer.data
-            })
+            return self._list_nearest(request, queryset, client_lat, client_lng)
         
         # معالجة QuerySet العادية
         page = self.paginate_queryset(queryset)
@@ -205,18 +169,83 @@ class WorkerListView(generics.ListAPIView):
             'results': serializer.data
         })
 
-    def calculate_distance(self, lat1, lng1, lat2, lng2):
-        """حساب المسافة بين نقطتين باستخدام Haversine formula"""
-        try:
-            lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-            dlat = lat2 - lat1
-            dlng = lng2 - lng1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-            c = 2 * asin(sqrt(a))
-            r = 6371
-            return c * r
-        except Exception as e:
-            return 999
+    def _list_nearest(self, request, queryset, client_lat, client_lng):
+        """
+        Nearest workers with keyset pagination by (distance, id)
+        
+        يجلب الإحداثيات فقط داخل مربع حدودي متزايد، يختار أقرب عمال الصفحة،
+        ثم يجلب هؤلاء العمال فقط مع worker_profile والخدمات.
+        الصفحة التالية: ?cursor=<next_cursor> (أو page=N للتوافق)
+        count يُرسل فقط في الصفحة الأولى/page=N (بدون cursor)
+        """
+        page_size = api_settings.PAGE_SIZE or 10
+        
+        # فلترة العمال المتاحين + موقع نشط
+        located = queryset.filter(
+            worker_profile__is_available=True,
+            worker_profile__current_latitude__isnull=False,
+            worker_profile__current_longitude__isnull=False,
+            worker_profile__location_sharing_enabled=True,
+            worker_profile__location_status='active'
+        )
+        
+        after = None
+        offset = 0
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                after_distance, after_id = cursor.split(':')
+                after = (float(after_distance), int(after_id))
+            except ValueError:
+                return Response({
+                    'error': 'Invalid cursor',
+                    'message': 'cursor must be the next_cursor value of the previous page'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            try:
+                offset = (max(int(request.query_params.get('page', 1)), 1) - 1) * page_size
+            except ValueError:
+                offset = 0
+        
+        # ✅ العدد الكلي فقط بدون cursor: صفحات keyset لا تدفع COUNT كامل
+        total_count = None
+        if after is None:
+            total_count = located.count()
+            if total_count == 0:
+                return Response({
+                    'count': 0,
+                    'next_cursor': None,
+                    'results': [],
+                    'message': 'No workers with active location sharing in your area'
+                })
+        
+        # ✅ المواقع الحية من الذاكرة، وقاعدة البيانات فقط للعمال غير الموجودين في المخزن
+        nearest = expanding_nearest(
+            client_lat, client_lng, lambda box: located_worker_rows(located, box),
+            offset + page_size, after=after
+        )[offset:]
+        
+        workers_by_id = User.objects.select_related('worker_profile').prefetch_related(
+            'worker_services__category', active_services_prefetch()
+        ).in_bulk([worker_id for _, worker_id in nearest])
+        page_workers = [
+            workers_by_id[worker_id] for _, worker_id in nearest if worker_id in workers_by_id
+        ]
+        
+        next_cursor = None
+        if len(nearest) == page_size:
+            last_distance, last_id = nearest[-1]
+            next_cursor = f"{last_distance!r}:{last_id}"
+        
+        serializer = self.get_serializer(page_workers, many=True)
+        data = {
+            'next_cursor': next_cursor,
+            'results': serializer.data
+        }
+        if total_count is not None:
+            data = {'count': total_count, **data}
+        return Response(data)
+
 
 class WorkerDetailView(generics.RetrieveAPIView):
     queryset = User.objects.filter(
@@ -294,127 +323,27 @@ class WorkerSettingsView(generics.RetrieveUpdateAPIView):
         return settings
 
 
+@condition(etag_func=facet_etag('search_filters'), last_modified_func=facet_last_modified('search_filters'))
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def worker_search_filters(request):
-    categories = ServiceCategory.objects.filter(
-        is_active=True,
-        workerservice__isnull=False
-    ).distinct().values('name', 'name_ar').order_by('name')
-    
-    flutter_categories = ['Toutes Catégories'] + [cat['name'] for cat in categories]
-    
-    areas = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True,
-        worker_profile__service_area__isnull=False
-    ).values_list('worker_profile__service_area', flat=True).distinct()
-    
-    unique_areas = []
-    for area in areas:
-        if area:
-            main_area = area.split(',')[0].strip()
-            if main_area and main_area not in unique_areas:
-                unique_areas.append(main_area)
-    
-    flutter_areas = ['Toutes Zones'] + sorted(unique_areas)
-    
-    price_stats = WorkerService.objects.filter(
-        is_active=True,
-        worker__role='worker',
-        worker__is_verified=True
-    ).aggregate(
-        min_price=Min('base_price'),
-        max_price=Max('base_price'),
-        avg_price=Avg('base_price')
-    )
-    
-    sort_options = [
-        'nearest',
-        'price_asc',
-        'price_desc',
-        'rating'
-    ]
-    
-    return Response({
-        'categories': flutter_categories,
-        'nouakchottAreas': flutter_areas,
-        'allServices': [
-            {
-                'icon': 'cleaning_services',
-                'name': cat['name'],
-                'category': cat['name']
-            } for cat in categories
-        ],
-        'price_range': {
-            'min': int(price_stats['min_price']) if price_stats['min_price'] else 500,
-            'max': int(price_stats['max_price']) if price_stats['max_price'] else 10000,
-            'average': int(price_stats['avg_price']) if price_stats['avg_price'] else 2500
-        },
-        'sort_options': sort_options
-    })
+    # ✅ من الكاش (workers/facets.py) - 304 إذا لم يتغير شيء
+    return _facet_response('search_filters')
 
 
+@condition(etag_func=facet_etag('worker_stats'), last_modified_func=facet_last_modified('worker_stats'))
 @api_view(['GET']) 
 @permission_classes([AllowAny])
 def worker_stats(request):
-    total_workers = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True
-    ).count()
-    
-    online_workers = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True,
-        worker_profile__is_online=True
-    ).count()
-    
-    verified_workers = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True,
-        worker_profile__is_verified=True
-    ).count()
-    
-    avg_rating = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True,
-        worker_profile__average_rating__gt=0
-    ).aggregate(avg_rating=Avg('worker_profile__average_rating'))['avg_rating']
-    
-    total_jobs = User.objects.filter(
-        role='worker',
-        is_verified=True,
-        onboarding_completed=True,
-        worker_profile__is_available=True
-    ).aggregate(total_jobs=Sum('worker_profile__total_jobs_completed'))['total_jobs']
-    
-    top_categories = ServiceCategory.objects.filter(
-        workerservice__is_active=True,
-        workerservice__worker__role='worker',
-        workerservice__worker__is_verified=True,
-        workerservice__worker__onboarding_completed=True
-    ).annotate(
-        worker_count=Count('workerservice__worker', distinct=True)
-    ).order_by('-worker_count')[:5].values('name', 'worker_count')
-    
-    return Response({
-        'total_workers': total_workers,
-        'online_workers': online_workers, 
-        'verified_workers': verified_workers,
-        'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-        'total_jobs_completed': total_jobs or 0,
-        'top_categories': list(top_categories)
-    })
+    return _facet_response('worker_stats')
+
+
+def _facet_response(name):
+    entry = get_facet(name)
+    response = Response(entry['data'])
+    # العميل يعيد التحقق في كل مرة (If-None-Match / If-Modified-Since)
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
 
 # ==================== APIs الموقع الجديدة ====================
 
@@ -518,7 +447,7 @@ def get_location_status(request):
     if not hasattr(request.user, 'worker_profile'):
         return Response({'error': 'ملف العامل غير مكتمل'}, status=status.HTTP_400_BAD_REQUEST)
     
-    worker_profile = request.user.worker_profile
+    worker_profile = apply_live_location(request.user.worker_profile)
     worker_profile.update_location_status()
     
     return Response({
@@ -546,33 +475,44 @@ def get_nearby_tasks(request):
     if not hasattr(request.user, 'worker_profile'):
         return Response({'error': 'ملف العامل غير مكتمل'}, status=status.HTTP_400_BAD_REQUEST)
     
-    worker_profile = request.user.worker_profile
+    worker_profile = apply_live_location(request.user.worker_profile)
     if not worker_profile.location_sharing_enabled or not worker_profile.current_latitude:
         return Response({'error': 'الموقع غير متاح','message': 'يجب تفعيل مشاركة الموقع وتحديث موقعك الحالي'}, status=status.HTTP_400_BAD_REQUEST)
     
     distance_max = float(request.query_params.get('distance_max', 30))
     
-    tasks_queryset = ServiceRequest.objects.filter(status='published').select_related('client', 'service_category')
+    tasks_queryset = ServiceRequest.objects.filter(status='published').select_related(
+        'client', 'service_category'
+    ).annotate_worker_application(request.user)
     tasks_with_location = tasks_queryset.filter(latitude__isnull=False, longitude__isnull=False)
     
-    nearby_tasks = []
     worker_lat = float(worker_profile.current_latitude)
     worker_lng = float(worker_profile.current_longitude)
     
-    for task in tasks_with_location:
-        distance = worker_profile.calculate_distance_to(float(task.latitude), float(task.longitude))
-        if distance and distance <= distance_max:
-            task.calculated_distance = distance
-            nearby_tasks.append(task)
-    
-    nearby_tasks.sort(key=lambda x: x.calculated_distance)
+    # ✅ ترتيب الإحداثيات فقط دفعة واحدة، ثم جلب مهام الصفحة الحالية
+    rows = list(tasks_with_location.order_by().values_list('id', 'latitude', 'longitude'))
+    nearby_tasks = rank_by_distance(
+        worker_lat, worker_lng,
+        [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows],
+        radius_km=distance_max
+    )
     
     from django.core.paginator import Paginator
     paginator = Paginator(nearby_tasks, 20)
     page_number = request.query_params.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
-    serializer = AvailableTaskSerializer(page_obj.object_list, many=True, context={'request': request})
+    tasks_by_id = tasks_queryset.annotate_applications_count().in_bulk(
+        [task_id for _, task_id in page_obj.object_list]
+    )
+    page_tasks = []
+    for distance, task_id in page_obj.object_list:
+        task = tasks_by_id.get(task_id)
+        if task is not None:
+            task.calculated_distance = distance
+            page_tasks.append(task)
+    
+    serializer = AvailableTaskSerializer(page_tasks, many=True, context={'request': request})
     
     return Response({
         'success': True,
@@ -635,21 +575,30 @@ def get_nearby_workers(request):
         except (ValueError, TypeError):
             pass
     
-    nearby_workers = []
-    for worker in workers_queryset:
-        distance = worker.worker_profile.calculate_distance_to(client_lat, client_lng)
-        if distance and distance <= distance_max:
-            worker.calculated_distance = distance
-            nearby_workers.append(worker)
-    
-    nearby_workers.sort(key=lambda x: x.calculated_distance)
+    # ✅ ترتيب الإحداثيات فقط دفعة واحدة (المواقع الحية أولاً)، ثم جلب عمال الصفحة الحالية
+    rows = located_worker_rows(workers_queryset, bounding_box(client_lat, client_lng, distance_max))
+    nearby_workers = rank_by_distance(
+        client_lat, client_lng,
+        [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows],
+        radius_km=distance_max
+    )
     
     from django.core.paginator import Paginator
     paginator = Paginator(nearby_workers, 20)
     page_number = request.query_params.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
-    serializer = WorkerProfileListSerializer(page_obj.object_list, many=True, context={'request': request})
+    workers_by_id = User.objects.select_related('worker_profile').prefetch_related(
+        'worker_services__category', active_services_prefetch()
+    ).in_bulk([worker_id for _, worker_id in page_obj.object_list])
+    page_workers = []
+    for distance, worker_id in page_obj.object_list:
+        worker = workers_by_id.get(worker_id)
+        if worker is not None:
+            worker.calculated_distance = distance
+            page_workers.append(worker)
+    
+    serializer = WorkerProfileListSerializer(page_workers, many=True, context={'request': request})
     
     return Response({
         'success': True,